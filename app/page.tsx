@@ -20,6 +20,7 @@ interface ApiResponse {
   data: any[]
   count: number
   note?: string
+  session_id?: string
 }
 
 export default function AnalysisPlatform() {
@@ -178,7 +179,8 @@ export default function AnalysisPlatform() {
       // Call backend API for BuiltWith analysis
       const requestData = {
         websites: [domain, ...competitors],
-        userId: userId
+        userId: userId,
+        session_id: apiResponse?.session_id
       }
 
       console.log("🚀 Frontend: Sending BuiltWith analysis request")
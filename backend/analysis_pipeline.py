@@ -0,0 +1,94 @@
+"""
+Full website analysis as one pipeline
+
+    similarweb ──┐
+                 ├─> enrichment ─┬─> llm_context
+    builtwith ───┘               └─> persistence
+
+SimilarWeb and BuiltWith lookups are independent, so they run concurrently.
+The joined ApifyResults go straight to the comparison precompute and the
+database write without a round trip through the stored session.
+
+Optional ctx flags: persist (default True), compare (default True) and
+allow_mock (default True; False returns only real SimilarWeb data). Mock
+rows are appended after the real ones, flagged `mock`, and never receive
+BuiltWith data, which is joined by normalized domain only.
+"""
+
+import logging
+from typing import Any, Dict, List
+
+from domain_utils import normalize_domain
+from metrics_engine import metrics_engine
+from mock_data import get_mock_data
+from models import ApifyResult, BuiltWithResult
+from pipeline import Pipeline, Stage
+
+logger = logging.getLogger(__name__)
+
+
+def build_analysis_pipeline(apify_client, tech_stack_cache, snapshot_cache, db) -> Pipeline:
+    """Wire the analysis stages to the shared clients and caches"""
+
+    async def similarweb(ctx: Dict[str, Any]) -> List[ApifyResult]:
+        websites = ctx["websites"]
+        found, missing = snapshot_cache.get_many(websites)
+        results = [found[website] for website in websites if website in found]
+        if not missing:
+            return results
+
+        if apify_client:
+            try:
+                fetched = await apify_client.analyze_domains(missing)
+                snapshot_cache.put_many(fetched)
+                return results + fetched
+            except Exception as e:
+                ctx["notes"].append(f"SimilarWeb lookup failed: {e}")
+        else:
+            ctx["notes"].append("No Apify API token")
+
+        if not ctx.get("allow_mock", True):
+            # Offline jobs want real data or nothing
+            return results
+        ctx["notes"].append(f"SimilarWeb data for {len(missing)} domains is mock data")
+        mock_data = get_mock_data()
+        for item in mock_data:
+            item.builtwith_result = None
+        return results + mock_data
+
+    async def builtwith(ctx: Dict[str, Any]) -> Dict[str, BuiltWithResult]:
+        return await tech_stack_cache.analyze_domains(ctx["websites"])
+
+    async def enrichment(
+        ctx: Dict[str, Any],
+        similarweb: List[ApifyResult],
+        builtwith: Dict[str, BuiltWithResult]
+    ) -> List[ApifyResult]:
+        # Only rows named after a requested domain get its BuiltWith data; mock rows get none
+        by_domain = {normalize_domain(website): result for website, result in builtwith.items()}
+        for result in similarweb:
+            result.builtwith_result = by_domain.get(normalize_domain(result.name))
+        return similarweb
+
+    async def llm_context(ctx: Dict[str, Any], enrichment: List[ApifyResult]) -> Dict[str, Any]:
+        if len(enrichment) < 2 or not ctx.get("compare", True):
+            return None
+        return metrics_engine.compare(enrichment)
+
+    async def persistence(ctx: Dict[str, Any], enrichment: List[ApifyResult]) -> str:
+        if not ctx.get("persist", True):
+            return None
+        return await db.save_analysis_session(
+            user_id=ctx["user_id"],
+            domains=ctx["websites"],
+            similarweb_data=enrichment,
+            builtwith_data=enrichment
+        )
+
+    return Pipeline([
+        Stage("similarweb", similarweb),
+        Stage("builtwith", builtwith),
+        Stage("enrichment", enrichment, inputs=["similarweb", "builtwith"]),
+        Stage("llm_context", llm_context, inputs=["enrichment"], optional=True),
+        Stage("persistence", persistence, inputs=["enrichment"], optional=True),
+    ])
@@ -0,0 +1,313 @@
+"""
+Offline batch analysis of a domain list file
+
+Runs the same analysis pipeline as /api/analyze-full (snapshot cache,
+batched BuiltWith lookups, concurrency-limited Apify runs) outside the web
+workers, for nightly enrichment jobs. Parsing and normalizing the input,
+and flattening results into table rows, run in a process pool so the event
+loop only waits on the network. Results are written as the domains,
+traffic_sources, technologies and keywords tables of history_export
+(same columns, with the batch run as session_id) in gzip NDJSON or, with
+pyarrow installed, Parquet, plus a summary.json with aggregate counts.
+
+Usage:
+    python batch_analyze.py domains.txt [--out DIR] [--format ndjson|parquet]
+        [--batch-size N] [--concurrency N] [--workers N] [--max-domains N]
+"""
+
+import argparse
+import asyncio
+import csv
+import gzip
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from domain_utils import normalize_domain
+from history_export import TABLES as EXPORT_TABLES, _ArrowEncoder, flatten_item
+
+TABLES = ("domains", "traffic_sources", "technologies", "keywords")
+READ_CHUNK_LINES = 5000
+TECHNOLOGY_COLUMNS = [name for name, _ in EXPORT_TABLES["technologies"]]
+
+
+def normalize_lines(task: Tuple[List[str], str]) -> List[str]:
+    """Worker: raw lines (txt/csv first column or NDJSON) to normalized domains, invalid ones dropped"""
+    from bulk_analysis import _domain_from_record
+
+    lines, fmt = task
+    domains = []
+    for line in lines:
+        if fmt == "ndjson":
+            try:
+                value = _domain_from_record(json.loads(line))
+            except json.JSONDecodeError:
+                value = line
+        else:
+            row = next(csv.reader([line]), [])
+            value = row[0] if row else ""
+        domain = normalize_domain(value)
+        if domain and "." in domain and " " not in domain:
+            domains.append(domain)
+    return domains
+
+
+def flatten_batch(
+    items: List[Dict[str, Any]],
+    run: Tuple[str, str]
+) -> Tuple[Dict[str, List[tuple]], Dict[str, Counter]]:
+    """
+    Worker: turn analyzed domains into rows of the history export tables plus partial aggregates.
+    Each item is {"domain", "similarweb": ApifyResult dict or None, "builtwith": BuiltWithResult dict or None};
+    run is the (session_id, created_at) every row is stamped with.
+    """
+    tables: Dict[str, List[tuple]] = {name: [] for name in TABLES}
+    aggregates = {"tags": Counter(), "technologies": Counter(), "top_countries": Counter()}
+
+    for item in items:
+        sw = item.get("similarweb")
+        start = len(tables["technologies"])
+        flatten_item(tables, run[0], run[1], item["domain"], dict(sw or {}, builtwith_result=item.get("builtwith")))
+
+        countries = (sw or {}).get("topCountries") or []
+        if countries:
+            top = max(countries, key=lambda c: c.get("visitsShare") or 0.0)
+            aggregates["top_countries"][top["countryAlpha2Code"]] += 1
+        for row in tables["technologies"][start:]:
+            tech = dict(zip(TECHNOLOGY_COLUMNS, row))
+            aggregates["technologies"][tech["technology"]] += 1
+            aggregates["tags"][tech["tag"] or "Other"] += 1
+
+    return tables, aggregates
+
+
+class NDJSONTableWriter:
+    """One gzip NDJSON file per table"""
+
+    extension = "ndjson.gz"
+
+    def __init__(self, out_dir: str):
+        self.files = {name: gzip.open(os.path.join(out_dir, f"{name}.{self.extension}"), "wt", encoding="utf-8") for name in TABLES}
+
+    def write(self, tables: Dict[str, List[tuple]]):
+        for name, rows in tables.items():
+            columns = [column for column, _ in EXPORT_TABLES[name]]
+            if rows:
+                self.files[name].write("".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows))
+
+    def close(self):
+        for handle in self.files.values():
+            handle.close()
+
+
+class ParquetTableWriter:
+    """One Parquet file per table, one row group per written batch, with the history export schema"""
+
+    extension = "parquet"
+
+    def __init__(self, out_dir: str):
+        import pyarrow  # noqa: F401
+
+        self.files = {name: open(os.path.join(out_dir, f"{name}.{self.extension}"), "wb") for name in TABLES}
+        self.encoders = {name: _ArrowEncoder(name, "parquet") for name in TABLES}
+
+    def write(self, tables: Dict[str, List[tuple]]):
+        for name, rows in tables.items():
+            if rows:
+                self.files[name].write(self.encoders[name].write(rows))
+
+    def close(self):
+        for name, handle in self.files.items():
+            handle.write(self.encoders[name].close())
+            handle.close()
+
+
+def open_writer(fmt: str, out_dir: str):
+    os.makedirs(out_dir, exist_ok=True)
+    if fmt == "parquet":
+        try:
+            return ParquetTableWriter(out_dir)
+        except ImportError:
+            raise SystemExit("[BATCH] --format parquet needs pyarrow (pip install pyarrow); use --format ndjson")
+    return NDJSONTableWriter(out_dir)
+
+
+def read_domains(path: str, pool: ProcessPoolExecutor, max_domains: Optional[int]) -> Tuple[List[str], Dict[str, int]]:
+    """Read the list file in line chunks, normalize in the pool, dedupe keeping file order"""
+    fmt = "ndjson" if path.lower().endswith((".ndjson", ".jsonl")) else "csv"
+    chunks: List[List[str]] = []
+    stats = {"rows": 0, "invalid": 0, "duplicates": 0, "truncated": 0}
+    with open(path, encoding="utf-8-sig", errors="replace") as handle:
+        chunk: List[str] = []
+        for line in handle:
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            stats["rows"] += 1
+            chunk.append(line)
+            if len(chunk) >= READ_CHUNK_LINES:
+                chunks.append(chunk)
+                chunk = []
+        if chunk:
+            chunks.append(chunk)
+
+    domains: List[str] = []
+    seen = set()
+    for normalized in pool.map(normalize_lines, [(chunk, fmt) for chunk in chunks]):
+        for domain in normalized:
+            if domain in seen:
+                stats["duplicates"] += 1
+            elif max_domains and len(domains) >= max_domains:
+                stats["truncated"] += 1
+            else:
+                seen.add(domain)
+                domains.append(domain)
+    # A CSV header row ("domain", "url", ...) has no dot and counts as invalid
+    stats["invalid"] = stats["rows"] - stats["duplicates"] - stats["truncated"] - len(domains)
+    return domains, stats
+
+
+def build_pipeline(batch_size: int):
+    """Same clients and caches as the web app, without a database"""
+    from analysis_pipeline import build_analysis_pipeline
+    from clients import ApifyClient
+    from clients.builtwith_client_fixed import BuiltWithClientFixed
+    from config import config
+    from response_archive import ResponseArchive
+    from snapshot_cache import SnapshotCache
+    from tech_stack_cache import TechStackCache
+
+    archive = ResponseArchive(config.raw_archive_dir, full_body=config.raw_archive_full_body) if config.raw_archive_enabled else None
+    apify_client = ApifyClient(config.apify_token, archive=archive) if config.apify_token else None
+    if apify_client is None:
+        print("[BATCH] No Apify API token: SimilarWeb columns will be empty")
+    if not config.builtwith_key:
+        print("[BATCH] No BuiltWith API key: technology columns will be empty")
+    builtwith_client = BuiltWithClientFixed(config.builtwith_key, archive=archive, batch_size=config.builtwith_batch_size)
+    tech_stack_cache = TechStackCache(builtwith_client, ttl_seconds=config.builtwith_cache_ttl)
+    snapshot_cache = SnapshotCache(ttl_seconds=config.snapshot_ttl, max_entries=max(config.snapshot_max_entries, batch_size))
+    return build_analysis_pipeline(apify_client, tech_stack_cache, snapshot_cache, db=None)
+
+
+async def run_batches(
+    domains: List[str],
+    pipeline,
+    pool: ProcessPoolExecutor,
+    writer,
+    batch_size: int,
+    concurrency: int,
+    run: Tuple[str, str]
+) -> Dict[str, Any]:
+    """
+    Analyze the domains in a bounded window of batches and stream rows to the writer.
+    Mock technology stacks (no BuiltWith key, or a failed lookup for that domain) are dropped.
+    """
+    loop = asyncio.get_running_loop()
+    stats = {"batches": 0, "failed_batches": 0, "with_similarweb": 0, "with_technologies": 0, "rows": Counter()}
+    aggregates = {"tags": Counter(), "technologies": Counter(), "top_countries": Counter()}
+
+    async def run_batch(batch: List[str]) -> List[Dict[str, Any]]:
+        ctx = {"websites": batch, "user_id": "batch", "notes": [], "persist": False, "compare": False, "allow_mock": False}
+        try:
+            run = await pipeline.run(ctx)
+        except Exception as e:
+            print(f"[BATCH] Batch failed ({len(batch)} domains): {e}")
+            stats["failed_batches"] += 1
+            return [{"domain": domain, "similarweb": None, "builtwith": None} for domain in batch]
+
+        snapshots = {normalize_domain(item.name): item for item in run["results"]["similarweb"]}
+        builtwith = run["results"]["builtwith"]
+        items = []
+        for domain in batch:
+            snapshot = snapshots.get(domain)
+            tech = builtwith.get(domain)
+            items.append({
+                "domain": domain,
+                "similarweb": snapshot.model_dump(exclude={"builtwith_result"}) if snapshot else None,
+                "builtwith": tech.model_dump() if tech and tech.technologies and not tech.mock else None,
+            })
+        return items
+
+    async def flush(task: asyncio.Task):
+        items = task.result()
+        stats["with_similarweb"] += sum(1 for item in items if item["similarweb"])
+        stats["with_technologies"] += sum(1 for item in items if item["builtwith"])
+        tables, partial = await loop.run_in_executor(pool, flatten_batch, items, run)
+        writer.write(tables)
+        for name, rows in tables.items():
+            stats["rows"][name] += len(rows)
+        for name, counter in partial.items():
+            aggregates[name].update(counter)
+
+    pending = set()
+    for start in range(0, len(domains), batch_size):
+        pending.add(asyncio.create_task(run_batch(domains[start:start + batch_size])))
+        stats["batches"] += 1
+        while len(pending) >= concurrency:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                await flush(task)
+        if stats["batches"] % 50 == 0:
+            print(f"[BATCH] {min(start + batch_size, len(domains))}/{len(domains)} domains dispatched")
+
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            await flush(task)
+
+    stats["rows"] = dict(stats["rows"])
+    return {"stats": stats, "aggregates": aggregates}
+
+
+def main():
+    from config import config
+
+    parser = argparse.ArgumentParser(description="Analyze a domain list offline and write columnar result files")
+    parser.add_argument("input", help="Domain list: one per line, CSV (first column) or NDJSON")
+    parser.add_argument("--out", default="batch_output", help="Output directory")
+    parser.add_argument("--format", choices=["ndjson", "parquet"], default="ndjson")
+    parser.add_argument("--batch-size", type=int, default=config.bulk_batch_size)
+    parser.add_argument("--concurrency", type=int, default=config.bulk_concurrency, help="Batches in flight")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2, help="Post-processing processes")
+    parser.add_argument("--max-domains", type=int, default=0, help="Stop after N unique domains (0 = no limit)")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    now = datetime.now(timezone.utc)
+    run = (f"batch-{now:%Y%m%dT%H%M%SZ}", now.isoformat())
+    writer = open_writer(args.format, args.out)
+    with ProcessPoolExecutor(max_workers=max(1, args.workers)) as pool:
+        domains, input_stats = read_domains(args.input, pool, args.max_domains or None)
+        print(f"[BATCH] {len(domains)} unique domains from {input_stats['rows']} rows, {args.workers} workers")
+
+        pipeline = build_pipeline(args.batch_size)
+        try:
+            result = asyncio.run(run_batches(
+                domains, pipeline, pool, writer, max(1, args.batch_size), max(1, args.concurrency), run
+            ))
+        finally:
+            writer.close()
+
+    aggregates = result["aggregates"]
+    summary = {
+        "run": run[0],
+        "input": dict(input_stats, domains=len(domains)),
+        **result["stats"],
+        "format": args.format,
+        "files": [f"{name}.{writer.extension}" for name in TABLES if os.path.exists(os.path.join(args.out, f"{name}.{writer.extension}"))],
+        "tags": dict(aggregates["tags"].most_common()),
+        "top_technologies": dict(aggregates["technologies"].most_common(100)),
+        "top_countries": dict(aggregates["top_countries"].most_common()),
+        "elapsed_seconds": round(time.perf_counter() - started, 3),
+    }
+    with open(os.path.join(args.out, "summary.json"), "w", encoding="utf-8") as handle:
+        json.dump(summary, handle, indent=2)
+    print(f"[BATCH] Done in {summary['elapsed_seconds']}s: {result['stats']} -> {args.out}")
+
+
+if __name__ == "__main__":
+    main()
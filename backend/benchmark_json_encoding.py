@@ -0,0 +1,99 @@
+"""
+Microbenchmark: FastAPI's default response encoding vs the orjson fast path
+
+Builds AnalysisResponse payloads of 100 and 1000 domains (SimilarWeb plus
+BuiltWith data) and compares, per response:
+  - response_model path: FastAPI re-validates the model, then encodes with the stdlib
+  - dict path: jsonable_encoder + stdlib, as for the history/session endpoints
+  - FastJSONResponse: pydantic-core / orjson, no re-validation
+Encode time is the best of several runs; allocations are the tracemalloc
+peak of one encode.
+
+Usage: python benchmark_json_encoding.py [iterations]
+"""
+
+import asyncio
+import sys
+import time
+import tracemalloc
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+
+from fast_json import FastJSONResponse
+from mock_data import get_mock_data
+from models import AnalysisResponse, BuiltWithResult, Technology
+
+SIZES = (100, 1000)
+
+
+def build_response(domains: int) -> AnalysisResponse:
+    template = get_mock_data()[0]
+    technologies = [
+        Technology(name=f"Technology {i}", tag=("Analytics", "Frameworks", "CDN", "Hosting")[i % 4], popularity=50 + i)
+        for i in range(30)
+    ]
+    results = []
+    for i in range(domains):
+        item = template.model_copy(deep=True)
+        item.name = f"site{i}.example.com"
+        item.builtwith_result = BuiltWithResult(domain=item.name, technologies=technologies)
+        results.append(item)
+    return AnalysisResponse(success=True, data=results, count=len(results), note="benchmark")
+
+
+def encode_response_model(response: AnalysisResponse, field) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=response))
+    return JSONResponse(content).body
+
+
+def encode_dict(payload: dict) -> bytes:
+    return JSONResponse(jsonable_encoder(payload)).body
+
+
+def encode_fast(content) -> bytes:
+    return FastJSONResponse(content).body
+
+
+def best_time(func, iterations: int) -> float:
+    best = float("inf")
+    for _ in range(iterations):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def peak_allocations(func) -> int:
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    field = create_response_field(name="Response_analyze", type_=AnalysisResponse)
+
+    for size in SIZES:
+        response = build_response(size)
+        payload = {"success": True, "data": [item.model_dump() for item in response.data], "count": size}
+        cases = [
+            ("response_model + stdlib", lambda: encode_response_model(response, field)),
+            ("FastJSONResponse (model)", lambda: encode_fast(response)),
+            ("jsonable_encoder + stdlib", lambda: encode_dict(payload)),
+            ("FastJSONResponse (dict)", lambda: encode_fast(payload)),
+        ]
+        body = encode_fast(response)
+        print(f"\n{size} domains, {len(body) / 1024:.0f} KB of JSON")
+        for name, func in cases:
+            seconds = best_time(func, iterations)
+            peak = peak_allocations(func)
+            print(f"   {name:<27} {seconds * 1000:8.2f} ms   peak {peak / 1024 / 1024:7.2f} MB")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""
+Microbenchmark: precompiled technology classifier vs the old substring scans
+
+Runs both implementations over a corpus of real BuiltWith technology names,
+checks they agree on every name, and prints the per-technology cost.
+
+Usage: python benchmark_tech_classifier.py [iterations]
+"""
+
+import os
+import sys
+import time
+
+from clients.tech_classifier import tech_classifier
+
+CORPUS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "builtwith_tech_names.txt")
+
+
+# --- Previous implementation, kept here as the reference -------------------
+
+def legacy_clean_technology_name(name: str) -> str:
+    if not name:
+        return ""
+    name = name.strip()
+    skip_terms = [
+        "top", "dataset", "inferred", "support", "compatible", "link", "embed",
+        "conversion tracking", "certified", "metrics", "tracking", "schema",
+        "banner", "opt-out", "challenge", "automatic", "none", "year", "signal",
+        "mechanism", "default", "history", "discovery", "clips", "profiles",
+        "site accelerator", "scaleable", "crawl", "directory", "revenue",
+        "indexed", "lookup", "trust", "attributes", "meta", "ping", "standard"
+    ]
+    name_lower = name.lower()
+    for skip_term in skip_terms:
+        if skip_term in name_lower:
+            return ""
+    if len(name) < 3:
+        return ""
+    important_short_terms = ["ssl", "php", "api", "cdn", "spf", "dns", "aws", "css", "html", "js", "seo"]
+    if len(name) <= 3 and name.lower() not in important_short_terms:
+        return ""
+    if "analytics" in name_lower:
+        return "Google Analytics" if "google" in name_lower else "Analytics"
+    elif "jquery" in name_lower:
+        return "jQuery"
+    elif "bootstrap" in name_lower:
+        return "Bootstrap"
+    elif "cloudflare" in name_lower:
+        return "Cloudflare"
+    elif "wordpress" in name_lower:
+        return "WordPress"
+    elif "laravel" in name_lower:
+        return "Laravel"
+    elif "facebook" in name_lower:
+        return "Facebook"
+    elif "nginx" in name_lower:
+        return "Nginx"
+    elif "apache" in name_lower:
+        return "Apache"
+    elif "php" in name_lower:
+        return "PHP"
+    elif "mysql" in name_lower:
+        return "MySQL"
+    clean_name = name.split(" ")[0]
+    if clean_name.isdigit():
+        return ""
+    return clean_name
+
+
+def legacy_categorize_technology(tech_name: str) -> str:
+    name_lower = tech_name.lower()
+    if any(x in name_lower for x in ['jquery', 'react', 'angular', 'vue', 'bootstrap', 'javascript']):
+        return "JavaScript Frameworks & Libraries"
+    elif any(x in name_lower for x in ['analytics', 'tracking', 'metrics', 'tag manager']):
+        return "Analytics & Tracking"
+    elif any(x in name_lower for x in ['cloudflare', 'cdn', 'fastly', 'cloudfront']):
+        return "Content Delivery Network"
+    elif any(x in name_lower for x in ['nginx', 'apache', 'iis', 'server']):
+        return "Web Servers"
+    elif any(x in name_lower for x in ['php', 'python', 'java', 'node', 'ruby', 'perl']):
+        return "Programming Languages"
+    elif any(x in name_lower for x in ['mysql', 'postgres', 'mongodb', 'database']):
+        return "Databases"
+    elif any(x in name_lower for x in ['wordpress', 'drupal', 'cms', 'content']):
+        return "Content Management"
+    elif any(x in name_lower for x in ['ssl', 'https', 'security', 'certificate']):
+        return "Security"
+    elif any(x in name_lower for x in ['facebook', 'twitter', 'linkedin', 'social']):
+        return "Social Media"
+    elif any(x in name_lower for x in ['mail', 'email', 'smtp']):
+        return "Email Services"
+    elif any(x in name_lower for x in ['aws', 'azure', 'cloud', 'hosting']):
+        return "Cloud Services"
+    else:
+        return "Web Technologies"
+
+
+def legacy_calculate_popularity(tech_name: str) -> int:
+    popular_techs = {
+        "javascript": 95, "html": 98, "css": 95, "php": 78, "mysql": 75,
+        "jquery": 65, "bootstrap": 70, "nginx": 85, "apache": 60, "cloudflare": 80,
+        "google analytics": 95, "wordpress": 80, "laravel": 65, "react": 88,
+        "node": 82, "python": 85, "java": 70, "ruby": 60, "angular": 72,
+        "vue": 58, "mongodb": 68, "postgresql": 75, "redis": 65, "docker": 75,
+        "kubernetes": 60, "aws": 75, "azure": 65, "github": 85, "gitlab": 60
+    }
+    return popular_techs.get(tech_name.lower(), 50)
+
+
+# --- Benchmark --------------------------------------------------------------
+
+def legacy_classify(name: str):
+    cleaned = legacy_clean_technology_name(name)
+    if not cleaned:
+        return None
+    return cleaned, legacy_categorize_technology(cleaned), legacy_calculate_popularity(cleaned)
+
+
+def compiled_classify(name: str):
+    cleaned = tech_classifier.clean_name(name)
+    if not cleaned:
+        return None
+    return cleaned, tech_classifier.categorize(cleaned), tech_classifier.popularity(cleaned)
+
+
+def load_corpus():
+    with open(CORPUS_PATH, encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith("#")]
+
+
+def time_per_item(func, corpus, iterations):
+    started = time.perf_counter()
+    for _ in range(iterations):
+        for name in corpus:
+            func(name)
+    return (time.perf_counter() - started) / (iterations * len(corpus))
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    corpus = load_corpus()
+
+    mismatches = [(n, legacy_classify(n), compiled_classify(n)) for n in corpus if legacy_classify(n) != compiled_classify(n)]
+    print(f"Corpus: {len(corpus)} BuiltWith technology names, taxonomy v{tech_classifier.version}")
+    print(f"Mismatches between implementations: {len(mismatches)}")
+    for name, old, new in mismatches[:10]:
+        print(f"   {name!r}: legacy={old} compiled={new}")
+
+    legacy = time_per_item(legacy_classify, corpus, iterations)
+    compiled = time_per_item(compiled_classify, corpus, iterations)
+    print(f"Legacy substring scans: {legacy * 1e6:.2f} us per technology")
+    print(f"Compiled taxonomy:      {compiled * 1e6:.2f} us per technology")
+    print(f"Speedup:                {legacy / compiled:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
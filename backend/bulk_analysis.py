@@ -0,0 +1,233 @@
+"""
+Bulk domain analysis for uploaded CSV / NDJSON lists
+
+The upload is read in fixed-size chunks and parsed record by record (one
+CSV reader for the whole file, so quoted fields may span lines). Domains
+are normalized and deduplicated, then fed through the analysis pipeline in
+bounded batches with a cap on batches in flight. Each finished domain is
+streamed back as one NDJSON line. Only the current chunk, the in-flight
+batches and the set of domains already seen are kept in memory, whatever
+the file size.
+"""
+
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import time
+from collections import deque
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from domain_utils import normalize_domain
+from fast_json import dumps
+from pipeline import Pipeline
+
+logger = logging.getLogger(__name__)
+
+DOMAIN_FIELDS = ("domain", "website", "url", "site", "host")
+READ_CHUNK_BYTES = 64 * 1024
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str], requested: Optional[str] = None) -> str:
+    """"csv" or "ndjson" from an explicit choice, the file extension or the content type"""
+    if requested:
+        return requested.lower()
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or "ndjson" in (content_type or ""):
+        return "ndjson"
+    return "csv"
+
+
+def _domain_from_record(record: Any) -> str:
+    if isinstance(record, str):
+        return record
+    if isinstance(record, dict):
+        for key, value in record.items():
+            if key and key.strip().lower() in DOMAIN_FIELDS and isinstance(value, str):
+                return value
+    return ""
+
+
+async def iter_upload_lines(upload, chunk_size: int = READ_CHUNK_BYTES) -> AsyncIterator[str]:
+    """Decode an UploadFile incrementally and yield complete lines, line endings included"""
+    decoder = codecs.getincrementaldecoder("utf-8-sig")(errors="replace")
+    pending = ""
+    while True:
+        chunk = await upload.read(chunk_size)
+        if not chunk:
+            break
+        pending += decoder.decode(chunk)
+        lines = pending.splitlines(keepends=True)
+        # The last piece may be a partial line; carry it into the next chunk
+        pending = lines.pop() if lines and not lines[-1].endswith(("\n", "\r")) else ""
+        for line in lines:
+            yield line
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+class _LineFeed:
+    """Input of the upload's single csv.reader; lines are pushed once a whole record has arrived"""
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def iter_csv_rows(lines: AsyncIterator[str]) -> AsyncIterator[List[str]]:
+    """
+    Parse CSV lines with one csv.reader. A record is handed to the reader only when its
+    quotes balance, so a quoted field spanning lines (or chunks) is parsed as one field.
+    """
+    feed = _LineFeed()
+    reader = csv.reader(feed)
+    in_quotes = False
+    async for line in lines:
+        if not in_quotes and not line.strip():
+            continue
+        feed.lines.append(line)
+        if line.count('"') % 2:
+            in_quotes = not in_quotes
+        if not in_quotes:
+            yield next(reader, [])
+    if feed.lines:
+        yield next(reader, [])  # Unterminated quote at the end of the file
+
+
+async def iter_upload_domains(upload, fmt: str, stats: Dict[str, int]) -> AsyncIterator[str]:
+    """Raw domain values from a CSV (domain/url column or first column) or NDJSON upload"""
+    if fmt == "ndjson":
+        async for line in iter_upload_lines(upload):
+            if not line.strip():
+                continue
+            stats["rows"] += 1
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                record = line.strip()
+            yield _domain_from_record(record)
+        return
+
+    column: Optional[int] = None
+    first = True
+    async for row in iter_csv_rows(iter_upload_lines(upload)):
+        stats["rows"] += 1
+        if first:
+            first = False
+            header = [cell.strip().lower() for cell in row]
+            column = next((i for i, cell in enumerate(header) if cell in DOMAIN_FIELDS), None)
+            if column is not None:
+                stats["rows"] -= 1  # Header row
+                continue
+            column = 0
+        yield row[column] if column < len(row) else ""
+
+
+async def iter_unique_domains(values: AsyncIterator[str], stats: Dict[str, int], max_domains: int) -> AsyncIterator[str]:
+    """Normalize, drop invalid and duplicate domains, stop at max_domains"""
+    seen = set()
+    async for value in values:
+        domain = normalize_domain(value)
+        if not domain or "." not in domain or " " in domain:
+            stats["invalid"] += 1
+            continue
+        if domain in seen:
+            stats["duplicates"] += 1
+            continue
+        if len(seen) >= max_domains:
+            stats["truncated"] += 1
+            continue
+        seen.add(domain)
+        yield domain
+
+
+async def stream_bulk_analysis(
+    upload,
+    fmt: str,
+    pipeline: Pipeline,
+    user_id: str,
+    batch_size: int = 10,
+    concurrency: int = 2,
+    max_domains: int = 10000,
+    persist: bool = False
+) -> AsyncIterator[bytes]:
+    """Yield NDJSON lines: one "result" per domain as batches finish, then a "summary" """
+    started = time.perf_counter()
+    stats = {"rows": 0, "invalid": 0, "duplicates": 0, "truncated": 0, "domains": 0,
+             "analyzed": 0, "failed": 0, "batches": 0}
+
+    async def run_batch(batch: List[str]) -> List[Dict[str, Any]]:
+        # Mock SimilarWeb rows cannot be attributed to uploaded domains; report them as not found
+        ctx = {"websites": batch, "user_id": user_id, "notes": [], "persist": persist, "allow_mock": False}
+        try:
+            run = await pipeline.run(ctx)
+        except Exception as e:
+            logger.error(f"[BULK] Batch failed ({len(batch)} domains): {e}")
+            return [{"type": "result", "domain": d, "status": "error", "error": str(e)} for d in batch]
+
+        session_id = run["results"].get("persistence")
+        lines = []
+        by_domain = {normalize_domain(item.name): item for item in run["results"]["enrichment"]}
+        for domain in batch:
+            item = by_domain.get(domain)
+            if item is None:
+                lines.append({"type": "result", "domain": domain, "status": "not_found", "notes": ctx["notes"] or None})
+                continue
+            lines.append({
+                "type": "result",
+                "domain": domain,
+                "status": "ok",
+                "session_id": session_id,
+                "data": item,
+                "notes": ctx["notes"] or None
+            })
+        return lines
+
+    def encode(lines: List[Dict[str, Any]]) -> bytes:
+        for line in lines:
+            stats["analyzed" if line["status"] == "ok" else "failed"] += 1
+        return b"".join(dumps(line) + b"\n" for line in lines)
+
+    pending = set()
+    batch: List[str] = []
+    domains = iter_unique_domains(iter_upload_domains(upload, fmt, stats), stats, max_domains)
+
+    try:
+        async for domain in domains:
+            stats["domains"] += 1
+            batch.append(domain)
+            if len(batch) < batch_size:
+                continue
+            pending.add(asyncio.create_task(run_batch(batch)))
+            stats["batches"] += 1
+            batch = []
+            # Stop reading the file while the window of in-flight batches is full
+            while len(pending) >= concurrency:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    yield encode(task.result())
+
+        if batch:
+            pending.add(asyncio.create_task(run_batch(batch)))
+            stats["batches"] += 1
+        while pending:
+            done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                yield encode(task.result())
+    finally:
+        # Client disconnected or the stream failed: stop the batches still running
+        for task in pending:
+            task.cancel()
+
+    stats["elapsed_seconds"] = round(time.perf_counter() - started, 3)
+    logger.info(f"[BULK] Bulk analysis finished: {stats}")
+    yield dumps({"type": "summary", **stats}) + b"\n"
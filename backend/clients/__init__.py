@@ -5,5 +5,10 @@ Client package initialization
 from .apify_client import ApifyClient
 from .builtwith_client import BuiltWithClient
 from .openrouter_client import OpenRouterClient
+from .model_router import ModelRouter, LLMUnavailableError
+from .llm_scheduler import LLMScheduler, SchedulerQueueFullError, SchedulerTimeoutError
 
-__all__ = ['ApifyClient', 'BuiltWithClient', 'OpenRouterClient']
+__all__ = [
+    'ApifyClient', 'BuiltWithClient', 'OpenRouterClient', 'ModelRouter', 'LLMUnavailableError',
+    'LLMScheduler', 'SchedulerQueueFullError', 'SchedulerTimeoutError'
+]
@@ -10,9 +10,10 @@ from models import ApifyResult, Technology, BuiltWithResult
 
 
 class ApifyClient:
-    def __init__(self, api_token: str):
+    def __init__(self, api_token: str, archive=None):
         self.api_token = api_token
         self.actor_id = "heLi1j7hzjC2gFlIx"
+        self.archive = archive  # Optional ResponseArchive for raw responses
 
     async def analyze_domains(self, websites: List[str]) -> List[ApifyResult]:
         async with httpx.AsyncClient() as client:
@@ -82,6 +83,14 @@ class ApifyClient:
                     print(f"Failed to fetch results: {results_response.status_code} - {results_response.text}")
                     raise HTTPException(status_code=500, detail=f"Failed to fetch results: {results_response.text}")
 
+                if self.archive:
+                    await self.archive.store_async(
+                        "apify",
+                        websites,
+                        results_response.content,
+                        meta={"run_id": run_id, "dataset_id": dataset_id}
+                    )
+
                 results = results_response.json()
                 print(f"Retrieved {len(results)} results")
                 
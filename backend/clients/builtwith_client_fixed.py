@@ -2,15 +2,121 @@
 Client for BuiltWith API integration (Fixed Version)
 """
 
+import asyncio
 import httpx
-from typing import Optional, List
+from typing import Dict, Optional, List
 from models import BuiltWithResult, Technology
+from domain_utils import normalize_domain
+from .tech_classifier import tech_classifier
+from .builtwith_stream import BatchTechnologyStreamParser, TechnologyStreamParser, BuiltWithStreamError
 
 
 class BuiltWithClientFixed:
-    def __init__(self, api_key: Optional[str] = None):
+    MAX_TECHNOLOGIES = 20  # Limit results to prevent overwhelming output
+    MAX_BATCH_SIZE = 16  # Most domains BuiltWith accepts in one comma-separated LOOKUP
+    REQUEST_TIMEOUT = 60.0  # Seconds; large responses take longer than httpx's 5s default
+
+    def __init__(self, api_key: Optional[str] = None, archive=None, batch_size: int = MAX_BATCH_SIZE):
         self.api_key = api_key
         self.base_url = "https://api.builtwith.com/v20/api.json"
+        self.archive = archive  # Optional ResponseArchive for raw responses
+        self.batch_size = max(1, min(batch_size, self.MAX_BATCH_SIZE))
+
+    async def analyze_domains(self, domains: List[str]) -> Dict[str, BuiltWithResult]:
+        """
+        Analyze many domains with as few API calls as possible.
+        Domains are packed into multi-domain lookups; any domain the batch
+        could not answer is retried with a single lookup. Returns results
+        keyed by the domains exactly as they were passed in.
+        """
+        if not self.api_key:
+            return {domain: self._get_mock_builtwith_data(domain) for domain in domains}
+
+        # Look each normalized domain up once, even if it was passed several times
+        lookups: Dict[str, str] = {}
+        for domain in domains:
+            lookups.setdefault(normalize_domain(domain) or domain, domain)
+        unique = list(lookups)
+        batches = [unique[i:i + self.batch_size] for i in range(0, len(unique), self.batch_size)]
+        print(f"   [BUILTWITH] {len(unique)} domains in {len(batches)} lookup(s) of up to {self.batch_size}")
+
+        by_lookup: Dict[str, BuiltWithResult] = {}
+        for batch_results in await asyncio.gather(*(self._analyze_batch(batch) for batch in batches)):
+            by_lookup.update(batch_results)
+
+        return {domain: by_lookup[normalize_domain(domain) or domain] for domain in domains}
+
+    async def _analyze_batch(self, batch: List[str]) -> Dict[str, BuiltWithResult]:
+        """
+        One multi-domain LOOKUP, streamed and split per domain by each path's
+        Domain, with single-lookup fallback. Reading stops once every domain
+        has MAX_TECHNOLOGIES technologies.
+        """
+        if len(batch) == 1:
+            return await self._analyze_singles(batch)
+
+        url = f"{self.base_url}?KEY={self.api_key}&LOOKUP={','.join(batch)}"
+        print(f"   [BUILTWITH] Batch lookup: {', '.join(batch)}")
+
+        collected = {domain: ([], set()) for domain in batch}  # domain -> (technologies, names)
+        parser = BatchTechnologyStreamParser()
+        stopped_early = False
+        writer = self.archive.writer("builtwith", batch) if self.archive else None
+
+        try:
+            async with httpx.AsyncClient(timeout=self.REQUEST_TIMEOUT) as client:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes():
+                        if writer:
+                            await writer.write_async(chunk)
+                        if stopped_early:
+                            continue
+                        for path_domain, tech_data in parser.feed(chunk):
+                            entry = collected.get(normalize_domain(path_domain or ""))
+                            if entry is not None and len(entry[0]) < self.MAX_TECHNOLOGIES:
+                                self._add_technology(entry[0], entry[1], tech_data)
+                        stopped_early = all(len(techs) >= self.MAX_TECHNOLOGIES for techs, _ in collected.values())
+                        if stopped_early and not (writer and self.archive.full_body):
+                            break
+            if writer:
+                await writer.commit_async(complete=not stopped_early or self.archive.full_body)
+        except Exception as e:
+            if writer:
+                writer.discard()
+            print(f"[ERROR] Batch lookup failed ({e}), falling back to single lookups")
+            return await self._analyze_singles(batch)
+
+        print(f"   [BUILTWITH] Read {parser.bytes_read} bytes for {len(batch)} domains{' (stopped early)' if stopped_early else ''}")
+        answered = {normalize_domain(lookup) for lookup in parser.lookups}
+        results: Dict[str, BuiltWithResult] = {
+            domain: BuiltWithResult(domain=domain, technologies=techs)
+            for domain, (techs, _) in collected.items()
+            if techs or domain in answered
+        }
+
+        missing = [domain for domain in batch if domain not in results]
+        if missing:
+            print(f"[WARNING] Batch returned no result for {', '.join(missing)}, retrying individually")
+            results.update(await self._analyze_singles(missing))
+
+        for domain, result in results.items():
+            if not result.technologies:
+                print(f"[WARNING] No technologies found for {domain}, using mock data fallback")
+                results[domain] = self._get_mock_builtwith_data(domain)
+        return results
+
+    async def _analyze_singles(self, domains: List[str]) -> Dict[str, BuiltWithResult]:
+        """Single-domain lookups; a failing domain gets an empty result"""
+        async def lookup(domain: str) -> BuiltWithResult:
+            try:
+                return await self.analyze_domain(domain)
+            except Exception as e:
+                print(f"[ERROR] Error analyzing {domain}: {e}")
+                return BuiltWithResult(domain=domain, technologies=[])
+
+        results = await asyncio.gather(*(lookup(domain) for domain in domains))
+        return dict(zip(domains, results))
 
     async def analyze_domain(self, domain: str) -> BuiltWithResult:
         if not self.api_key:
@@ -20,65 +126,86 @@ class BuiltWithClientFixed:
         url = f"https://api.builtwith.com/v20/api.json?KEY={self.api_key}&LOOKUP={domain}"
         print(f"   [BUILTWITH] URL: {url}")
     
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            data = response.json()
-    
-        print(f"   [BUILTWITH] Response Status: {response.status_code}")
-        print(f"   [BUILTWITH] API response received")
-        print(f"   [BUILTWITH] Response size: {len(response.text)} characters")
-    
+        technologies: List[Technology] = []
+        technology_names = set()  # Track unique names
+        parser = TechnologyStreamParser()
+        stopped_early = False
+        writer = self.archive.writer("builtwith", [domain]) if self.archive else None
+
         try:
-            return self._parse_builtwith_response(domain, data)
-        except Exception as e:
+            # Stream the body and stop parsing once we have enough technologies
+            async with httpx.AsyncClient(timeout=self.REQUEST_TIMEOUT) as client:
+                async with client.stream("GET", url) as response:
+                    response.raise_for_status()
+                    print(f"   [BUILTWITH] Response Status: {response.status_code}")
+
+                    async for chunk in response.aiter_bytes():
+                        if writer:
+                            await writer.write_async(chunk)
+                        if stopped_early:
+                            continue
+                        for tech_data in parser.feed(chunk):
+                            self._add_technology(technologies, technology_names, tech_data)
+                            if len(technologies) >= self.MAX_TECHNOLOGIES:
+                                stopped_early = True
+                                break
+                        # Keep draining only when the archive wants the complete body
+                        if stopped_early and not (writer and self.archive.full_body):
+                            break
+            if writer:
+                await writer.commit_async(complete=not stopped_early or self.archive.full_body)
+        except httpx.HTTPStatusError:
+            if writer:
+                writer.discard()
+            raise
+        except BuiltWithStreamError as e:
+            if writer:
+                writer.discard()
             print(f"[ERROR] Error parsing BuiltWith data: {e}")
+        except Exception:
+            if writer:
+                writer.discard()
+            raise
+
+        print(f"   [BUILTWITH] Read {parser.bytes_read} bytes{' (stopped early)' if stopped_early else ''}")
+        print(f"[RESULT] Final result: {len(technologies)} technologies parsed for {domain}")
+
+        if not technologies:
+            print(f"[WARNING] No technologies found for {domain}, using mock data fallback")
             return self._get_mock_builtwith_data(domain)
 
-    def _parse_builtwith_response(self, domain: str, data: dict) -> BuiltWithResult:
-        """Parse BuiltWith API response into our model - FIXED VERSION"""
+        return BuiltWithResult(domain=domain, technologies=technologies)
+
+    def _add_technology(self, technologies: List[Technology], technology_names: set, tech_data: dict) -> bool:
+        """Clean, dedupe and append one raw BuiltWith technology entry"""
+        if not isinstance(tech_data, dict) or "Name" not in tech_data:
+            return False
+
+        # The category name IS the technology name
+        cleaned_name = self._clean_technology_name(tech_data["Name"])
+        if not cleaned_name or cleaned_name in technology_names:
+            return False
+
+        technology_names.add(cleaned_name)
+        technologies.append(Technology(
+            name=cleaned_name,
+            tag=self._categorize_technology(cleaned_name),
+            version=None,
+            popularity=self._calculate_popularity(cleaned_name)
+        ))
+        print(f"[TECH] Added: {cleaned_name}")
+        return True
+
+    def _parse_builtwith_response(self, domain: str, data: dict, fallback_to_mock: bool = True) -> BuiltWithResult:
+        """Parse an already-decoded BuiltWith API response into our model"""
         technologies = []
-        technology_names = set()  # Track unique names
         
         try:
             print(f"[DEBUG] Parsing BuiltWith response for {domain}")
             
-            if "Results" in data and len(data["Results"]) > 0:
-                result = data["Results"][0]
-                
-                if "Result" in result and "Paths" in result["Result"]:
-                    paths = result["Result"]["Paths"]
-                    print(f"[DEBUG] Found {len(paths)} paths to analyze")
-                    
-                    for path in paths:
-                        if "Technologies" in path:
-                            tech_categories = path["Technologies"]
-                            print(f"[DEBUG] Found {len(tech_categories)} technology categories in path")
-                            
-                            for tech_category in tech_categories:
-                                if isinstance(tech_category, dict) and "Name" in tech_category:
-                                    tech_name = tech_category["Name"]
-                                    
-                                    # The category name IS the technology name
-                                    cleaned_name = self._clean_technology_name(tech_name)
-                                    
-                                    if cleaned_name and cleaned_name not in technology_names:
-                                        technology_names.add(cleaned_name)
-                                        technology = Technology(
-                                            name=cleaned_name,
-                                            tag=self._categorize_technology(cleaned_name),
-                                            version=None,
-                                            popularity=self._calculate_popularity(cleaned_name)
-                                        )
-                                        technologies.append(technology)
-                                        print(f"[TECH] Added: {cleaned_name}")
-                                        
-                                        # Limit results to prevent overwhelming output
-                                        if len(technologies) >= 20:
-                                            break
-                        
-                        if len(technologies) >= 20:
-                            break
+            result = self._find_result(domain, data)
+            if result is not None:
+                technologies = self._parse_result(domain, result).technologies
                                 
         except Exception as e:
             print(f"[ERROR] Error parsing BuiltWith response for {domain}: {e}")
@@ -88,49 +215,56 @@ class BuiltWithClientFixed:
         print(f"[RESULT] Final result: {len(technologies)} technologies parsed for {domain}")
         
         # If no technologies were found, fallback to mock data
-        if not technologies:
+        if not technologies and fallback_to_mock:
             print(f"[WARNING] No technologies found for {domain}, using mock data fallback")
             return self._get_mock_builtwith_data(domain)
         
         return BuiltWithResult(domain=domain, technologies=technologies)
-        
-        print(f"[RESULT] {len(technologies)} technologies parsed for {domain}")
-        
-        # If no technologies were found, fallback to mock data
-        if len(technologies) == 0:
-            print(f"[FALLBACK] No technologies found for {domain}, using mock data")
-            return self._get_mock_builtwith_data(domain)
-        
+
+    @staticmethod
+    def _find_result(domain: str, data: dict) -> Optional[dict]:
+        """Pick this domain's entry from a single- or multi-domain response"""
+        results = data.get("Results") or []
+        wanted = normalize_domain(domain)
+        for result in results:
+            if normalize_domain(result.get("Lookup", "")) == wanted:
+                return result
+        return results[0] if len(results) == 1 else None
+
+    def _parse_result(self, domain: str, result: dict) -> BuiltWithResult:
+        """Parse one entry of the response's Results array"""
+        technologies: List[Technology] = []
+        technology_names = set()
+        paths = (result.get("Result") or {}).get("Paths") or []
+        print(f"[DEBUG] Found {len(paths)} paths to analyze for {domain}")
+
+        for path in paths:
+            for tech_data in path.get("Technologies", []):
+                self._add_technology(technologies, technology_names, tech_data)
+                if len(technologies) >= self.MAX_TECHNOLOGIES:
+                    break
+
+            if len(technologies) >= self.MAX_TECHNOLOGIES:
+                break
+
+        return BuiltWithResult(domain=domain, technologies=technologies)
+
+    def _parse_raw_response(self, domain: str, body: bytes) -> BuiltWithResult:
+        """Parse a raw (possibly truncated, possibly multi-domain) response body with the streaming parser"""
+        technologies: List[Technology] = []
+        technology_names = set()
+        wanted = normalize_domain(domain)
+        for path_domain, tech_data in BatchTechnologyStreamParser().feed(body):
+            if path_domain is not None and normalize_domain(path_domain) != wanted:
+                continue
+            self._add_technology(technologies, technology_names, tech_data)
+            if len(technologies) >= self.MAX_TECHNOLOGIES:
+                break
         return BuiltWithResult(domain=domain, technologies=technologies)
 
     def _categorize_technology(self, tech_name: str) -> str:
         """Categorize technology based on its name"""
-        name_lower = tech_name.lower()
-        
-        if any(x in name_lower for x in ['jquery', 'react', 'angular', 'vue', 'bootstrap', 'javascript']):
-            return "JavaScript Frameworks & Libraries"
-        elif any(x in name_lower for x in ['analytics', 'tracking', 'metrics', 'tag manager']):
-            return "Analytics & Tracking"
-        elif any(x in name_lower for x in ['cloudflare', 'cdn', 'fastly', 'cloudfront']):
-            return "Content Delivery Network"
-        elif any(x in name_lower for x in ['nginx', 'apache', 'iis', 'server']):
-            return "Web Servers"
-        elif any(x in name_lower for x in ['php', 'python', 'java', 'node', 'ruby', 'perl']):
-            return "Programming Languages"
-        elif any(x in name_lower for x in ['mysql', 'postgres', 'mongodb', 'database']):
-            return "Databases"
-        elif any(x in name_lower for x in ['wordpress', 'drupal', 'cms', 'content']):
-            return "Content Management"
-        elif any(x in name_lower for x in ['ssl', 'https', 'security', 'certificate']):
-            return "Security"
-        elif any(x in name_lower for x in ['facebook', 'twitter', 'linkedin', 'social']):
-            return "Social Media"
-        elif any(x in name_lower for x in ['mail', 'email', 'smtp']):
-            return "Email Services"
-        elif any(x in name_lower for x in ['aws', 'azure', 'cloud', 'hosting']):
-            return "Cloud Services"
-        else:
-            return "Web Technologies"
+        return tech_classifier.categorize(tech_name)
 
     def _get_mock_builtwith_data(self, domain: str) -> BuiltWithResult:
         """Generate mock BuiltWith data for testing"""
@@ -170,83 +304,12 @@ class BuiltWithClientFixed:
             Technology(name="Cloudflare", tag="Content Delivery Network", popularity=80),
         ])
         
-        return BuiltWithResult(domain=domain, technologies=technologies)
+        return BuiltWithResult(domain=domain, technologies=technologies, mock=True)
 
     def _clean_technology_name(self, name: str) -> str:
         """Clean and normalize technology names"""
-        if not name:
-            return ""
-        
-        # Remove common prefixes/suffixes that aren't useful
-        name = name.strip()
-        
-        # Skip generic categories that aren't specific technologies
-        skip_terms = [
-            "top", "dataset", "inferred", "support", "compatible", "link", "embed",
-            "conversion tracking", "certified", "metrics", "tracking", "schema",
-            "banner", "opt-out", "challenge", "automatic", "none", "year", "signal",
-            "mechanism", "default", "history", "discovery", "clips", "profiles",
-            "site accelerator", "scaleable", "crawl", "directory", "revenue",
-            "indexed", "lookup", "trust", "attributes", "meta", "ping", "standard"
-        ]
-        
-        name_lower = name.lower()
-        for skip_term in skip_terms:
-            if skip_term in name_lower:
-                return ""
-        
-        # Skip very generic terms but keep important ones
-        if len(name) < 3:
-            return ""
-        
-        # Keep important short terms
-        important_short_terms = ["ssl", "php", "api", "cdn", "spf", "dns", "aws", "css", "html", "js", "seo"]
-        if len(name) <= 3 and name.lower() not in important_short_terms:
-            return ""
-        
-        # Clean up specific cases
-        if "analytics" in name_lower:
-            return "Google Analytics" if "google" in name_lower else "Analytics"
-        elif "jquery" in name_lower:
-            return "jQuery"
-        elif "bootstrap" in name_lower:
-            return "Bootstrap"
-        elif "cloudflare" in name_lower:
-            return "Cloudflare"
-        elif "wordpress" in name_lower:
-            return "WordPress"
-        elif "laravel" in name_lower:
-            return "Laravel"
-        elif "facebook" in name_lower:
-            return "Facebook"
-        elif "nginx" in name_lower:
-            return "Nginx"
-        elif "apache" in name_lower:
-            return "Apache"
-        elif "php" in name_lower:
-            return "PHP"
-        elif "mysql" in name_lower:
-            return "MySQL"
-        
-        # Remove version numbers from names
-        clean_name = name.split(" ")[0]  # Take first word if multiple
-        
-        # Skip if it's just a number
-        if clean_name.isdigit():
-            return ""
-            
-        return clean_name
+        return tech_classifier.clean_name(name)
 
     def _calculate_popularity(self, tech_name: str) -> int:
         """Calculate popularity score for technology"""
-        # Simple popularity scoring based on common technologies
-        popular_techs = {
-            "javascript": 95, "html": 98, "css": 95, "php": 78, "mysql": 75,
-            "jquery": 65, "bootstrap": 70, "nginx": 85, "apache": 60, "cloudflare": 80,
-            "google analytics": 95, "wordpress": 80, "laravel": 65, "react": 88,
-            "node": 82, "python": 85, "java": 70, "ruby": 60, "angular": 72,
-            "vue": 58, "mongodb": 68, "postgresql": 75, "redis": 65, "docker": 75,
-            "kubernetes": 60, "aws": 75, "azure": 65, "github": 85, "gitlab": 60
-        }
-        
-        return popular_techs.get(tech_name.lower(), 50)  # Default to 50 if unknown
+        return tech_classifier.popularity(tech_name)
@@ -0,0 +1,117 @@
+"""
+Incremental parser for BuiltWith API responses
+
+Finds the `"Technologies": [...]` arrays as bytes arrive and decodes each
+technology object on its own, so the caller can stop reading the response
+as soon as it has enough technologies instead of buffering megabytes of JSON.
+BatchTechnologyStreamParser also follows the `"Domain"` of each path (and
+collects `"Lookup"` values) so multi-domain responses can be split per domain.
+"""
+
+import codecs
+import json
+import re
+from typing import Any, Dict, List, Optional, Set
+
+TECHNOLOGIES_KEY = re.compile(r'"Technologies"\s*:\s*\[')
+BATCH_KEYS = re.compile(
+    r'"Technologies"\s*:\s*\[|"(?P<key>Domain|Lookup)"\s*:\s*"(?P<value>(?:[^"\\]|\\.)*)"'
+)
+WHITESPACE_AND_COMMAS = re.compile(r'[\s,]*')
+
+
+class BuiltWithStreamError(Exception):
+    """Raised when the buffered, undecodable data grows past the safety limit"""
+
+
+class TechnologyStreamParser:
+    """Feed response chunks, get back completed technology objects in document order"""
+
+    KEYS = TECHNOLOGIES_KEY
+    TAIL_CHARS = 32  # Kept unscanned in case a key is split across chunks
+
+    def __init__(self, max_buffer_chars: int = 1_000_000):
+        self.max_buffer_chars = max_buffer_chars
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        self._json = json.JSONDecoder()
+        self._buffer = ""
+        self._in_array = False
+        self.bytes_read = 0
+
+    def feed(self, chunk: bytes) -> List[Dict[str, Any]]:
+        """Consume the next chunk of the body and return any technologies it completed"""
+        self.bytes_read += len(chunk)
+        self._buffer += self._decoder.decode(chunk)
+        return self._drain()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        technologies = []
+        pos = 0
+        buffer = self._buffer
+
+        while True:
+            if not self._in_array:
+                match = self.KEYS.search(buffer, pos)
+                if not match:
+                    # Keep a short tail in case the key is split across chunks
+                    pos = max(pos, len(buffer) - self.TAIL_CHARS)
+                    break
+                pos = match.end()
+                if not self._on_key(match):
+                    continue
+                self._in_array = True
+
+            pos = WHITESPACE_AND_COMMAS.match(buffer, pos).end()
+            if pos >= len(buffer):
+                break
+            if buffer[pos] == "]":
+                self._in_array = False
+                pos += 1
+                continue
+
+            try:
+                item, end = self._json.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                # Object not complete yet: wait for more bytes
+                break
+            pos = end
+            if isinstance(item, dict):
+                technologies.append(self._item(item))
+
+        self._buffer = buffer[pos:]
+        if len(self._buffer) > self.max_buffer_chars:
+            raise BuiltWithStreamError("BuiltWith response item exceeds buffer limit")
+        return technologies
+
+    def _on_key(self, match: "re.Match") -> bool:
+        """True when the match opens a Technologies array"""
+        return True
+
+    def _item(self, item: Dict[str, Any]) -> Any:
+        return item
+
+
+class BatchTechnologyStreamParser(TechnologyStreamParser):
+    """Like TechnologyStreamParser, but returns (path domain, technology) pairs"""
+
+    KEYS = BATCH_KEYS
+    TAIL_CHARS = 512  # Room for a "Domain"/"Lookup" value split across chunks
+
+    def __init__(self, max_buffer_chars: int = 1_000_000):
+        super().__init__(max_buffer_chars)
+        self.domain: Optional[str] = None
+        self.lookups: Set[str] = set()
+
+    def _on_key(self, match: "re.Match") -> bool:
+        key = match.group("key")
+        if key is None:
+            return True
+        value = json.loads(f'"{match.group("value")}"')
+        if key == "Domain":
+            self.domain = value
+        else:
+            self.lookups.add(value)
+        return False
+
+    def _item(self, item: Dict[str, Any]) -> Any:
+        return self.domain, item
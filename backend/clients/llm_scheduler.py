@@ -0,0 +1,170 @@
+"""
+Global concurrency limiter and priority queue for LLM calls
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerQueueFullError(Exception):
+    """Raised when the wait queue is at capacity"""
+
+
+class SchedulerTimeoutError(Exception):
+    """Raised when a call waited past its deadline without getting a slot"""
+
+
+class LLMScheduler:
+    """
+    Limits how many LLM calls run at once.
+
+    Calls over the concurrency ceiling wait in a bounded queue. Interactive
+    calls are always served before background ones; within a priority level,
+    users are served round-robin so one user's burst cannot starve the others.
+    """
+
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+    def __init__(self, max_concurrency: int = 4, max_queue: int = 64, default_deadline: float = 20.0):
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max(0, max_queue)
+        self.default_deadline = default_deadline
+
+        self._in_flight = 0
+        self._queued = 0
+        # priority -> user_id -> waiting futures; dict order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, Deque[asyncio.Future]]"] = {
+            self.INTERACTIVE: OrderedDict(),
+            self.BACKGROUND: OrderedDict()
+        }
+
+        # Metrics
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self._wait_times: Deque[float] = deque(maxlen=500)
+        self._max_wait = 0.0
+
+    @asynccontextmanager
+    async def slot(self, user_id: Optional[str] = None, priority: int = INTERACTIVE, deadline: Optional[float] = None):
+        """Hold one concurrency slot for the duration of the block"""
+        await self.acquire(user_id, priority, deadline)
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def acquire(self, user_id: Optional[str] = None, priority: int = INTERACTIVE, deadline: Optional[float] = None):
+        user_id = user_id or "anonymous"
+        enqueued_at = time.monotonic()
+
+        if self._in_flight < self.max_concurrency and self._queued == 0:
+            self._in_flight += 1
+            self._record_wait(0.0)
+            return
+
+        if self._queued >= self.max_queue:
+            self.rejected += 1
+            logger.warning(f"[SCHEDULER] Queue full ({self._queued}), rejecting call for {user_id}")
+            raise SchedulerQueueFullError("LLM queue is full")
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._queues[priority].setdefault(user_id, deque()).append(waiter)
+        self._queued += 1
+
+        timeout = self.default_deadline if deadline is None else deadline
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was granted just as we gave up: hand it back
+                self.release()
+            else:
+                self._remove_waiter(priority, user_id, waiter)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                logger.warning(f"[SCHEDULER] Call for {user_id} waited more than {timeout:.1f}s")
+                raise SchedulerTimeoutError("Timed out waiting for an LLM slot")
+            raise
+
+        self._record_wait(time.monotonic() - enqueued_at)
+
+    def try_acquire(self) -> bool:
+        """Take a slot only if one is free right now and nobody is waiting"""
+        if self._in_flight < self.max_concurrency and self._queued == 0:
+            self._in_flight += 1
+            self._record_wait(0.0)
+            return True
+        return False
+
+    def release(self):
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """Hand free slots to the next waiters: highest priority first, users round-robin"""
+        while self._in_flight < self.max_concurrency and self._queued > 0:
+            waiter = self._next_waiter()
+            if waiter is None:
+                break
+            if waiter.done():
+                continue
+            self._in_flight += 1
+            waiter.set_result(True)
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        for priority in sorted(self._queues):
+            users = self._queues[priority]
+            if not users:
+                continue
+            user_id, waiters = users.popitem(last=False)
+            waiter = waiters.popleft()
+            if waiters:
+                users[user_id] = waiters  # back of the rotation
+            self._queued -= 1
+            return waiter
+        return None
+
+    def _remove_waiter(self, priority: int, user_id: str, waiter: asyncio.Future):
+        waiters = self._queues[priority].get(user_id)
+        if waiters and waiter in waiters:
+            waiters.remove(waiter)
+            self._queued -= 1
+            if not waiters:
+                del self._queues[priority][user_id]
+        waiter.cancel()
+
+    def _record_wait(self, seconds: float):
+        self.admitted += 1
+        self._wait_times.append(seconds)
+        self._max_wait = max(self._max_wait, seconds)
+
+    def metrics(self) -> dict:
+        """Queue depth, concurrency and wait-time statistics"""
+        waits = sorted(self._wait_times)
+        p95 = waits[int(0.95 * (len(waits) - 1))] if waits else 0.0
+        return {
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self._in_flight,
+            "queue_depth": self._queued,
+            "queue_depth_by_priority": {
+                "interactive": sum(len(w) for w in self._queues[self.INTERACTIVE].values()),
+                "background": sum(len(w) for w in self._queues[self.BACKGROUND].values())
+            },
+            "max_queue": self.max_queue,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "wait_seconds": {
+                "avg": round(sum(waits) / len(waits), 4) if waits else 0.0,
+                "p95": round(p95, 4),
+                "max": round(self._max_wait, 4)
+            }
+        }
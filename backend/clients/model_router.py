@@ -0,0 +1,169 @@
+"""
+Latency-aware model routing with hedged requests for the OpenRouter client
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class LLMUnavailableError(Exception):
+    """Raised when every configured model failed to answer"""
+
+
+class ModelStats:
+    """Exponentially weighted latency and failure tracking for one model"""
+
+    def __init__(self, alpha: float = 0.3):
+        self.alpha = alpha
+        self.ewma_latency: Optional[float] = None
+        self.successes = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.last_failure_at = 0.0
+
+    def record_latency(self, latency: float):
+        if self.ewma_latency is None:
+            self.ewma_latency = latency
+        else:
+            self.ewma_latency = self.alpha * latency + (1 - self.alpha) * self.ewma_latency
+
+    def record_success(self, latency: float):
+        self.record_latency(latency)
+        self.successes += 1
+        self.consecutive_failures = 0
+
+    def record_failure(self):
+        self.failures += 1
+        self.consecutive_failures += 1
+        self.last_failure_at = time.monotonic()
+
+    def to_dict(self) -> dict:
+        return {
+            "ewma_latency": round(self.ewma_latency, 3) if self.ewma_latency is not None else None,
+            "successes": self.successes,
+            "failures": self.failures,
+            "consecutive_failures": self.consecutive_failures
+        }
+
+
+class ModelRouter:
+    """
+    Routes a completion call over an ordered list of models.
+
+    The primary model gets the request first. If it has not answered after the
+    hedge delay, the next model is started in parallel and the first good answer
+    wins. Errors fall through to the next model immediately.
+    """
+
+    def __init__(
+        self,
+        models: List[str],
+        hedge_after: float = 4.0,
+        min_hedge_after: float = 1.0,
+        failure_threshold: int = 3,
+        cooldown: float = 60.0
+    ):
+        if not models:
+            raise ValueError("ModelRouter needs at least one model")
+        self.models = list(models)
+        self.hedge_after = hedge_after
+        self.min_hedge_after = min_hedge_after
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.stats: Dict[str, ModelStats] = {model: ModelStats() for model in self.models}
+
+    def _is_healthy(self, model: str) -> bool:
+        stats = self.stats[model]
+        if stats.consecutive_failures < self.failure_threshold:
+            return True
+        return time.monotonic() - stats.last_failure_at > self.cooldown
+
+    def ordered_models(self) -> List[str]:
+        """Configured order, with models in failure cooldown moved to the back"""
+        healthy = [m for m in self.models if self._is_healthy(m)]
+        cooling = [m for m in self.models if not self._is_healthy(m)]
+        return healthy + cooling
+
+    def hedge_delay(self, model: str) -> float:
+        """Wait this long for a model before hedging to the next one"""
+        ewma = self.stats[model].ewma_latency
+        if ewma is None:
+            return self.hedge_after
+        return min(self.hedge_after, max(self.min_hedge_after, ewma * 2))
+
+    async def _timed(self, model: str, call: Callable[[str], Awaitable[str]]) -> str:
+        started = time.monotonic()
+        try:
+            result = await call(model)
+        except asyncio.CancelledError:
+            # Lost a hedge race: the elapsed time is a lower bound on its latency
+            self.stats[model].record_latency(time.monotonic() - started)
+            raise
+        except Exception:
+            self.stats[model].record_failure()
+            raise
+        self.stats[model].record_success(time.monotonic() - started)
+        return result
+
+    async def run(
+        self,
+        call: Callable[[str], Awaitable[str]],
+        hedge: bool = True,
+        hedge_gate: Optional[Callable[[], bool]] = None
+    ) -> Tuple[str, str]:
+        """
+        Run `call(model)` with fallback and optional hedging; returns (model, result).
+        hedge_gate is asked before each hedge; when it says no, the run stops hedging.
+        """
+        candidates = self.ordered_models()
+        pending: Dict[asyncio.Task, str] = {}
+        errors: List[str] = []
+
+        def start_next() -> bool:
+            if not candidates:
+                return False
+            model = candidates.pop(0)
+            pending[asyncio.create_task(self._timed(model, call))] = model
+            return True
+
+        start_next()
+        try:
+            while pending:
+                primary = next(iter(pending.values()))
+                timeout = self.hedge_delay(primary) if hedge and candidates else None
+                done, _ = await asyncio.wait(
+                    pending.keys(), timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+                )
+
+                if not done:
+                    if hedge_gate is not None and not hedge_gate():
+                        logger.info(f"[ROUTER] {primary} slower than {timeout:.1f}s, no capacity to hedge")
+                        hedge = False
+                        continue
+                    logger.info(f"[ROUTER] {primary} slower than {timeout:.1f}s, hedging")
+                    start_next()
+                    continue
+
+                for task in done:
+                    model = pending.pop(task)
+                    error = task.exception()
+                    if error is None:
+                        return model, task.result()
+                    logger.warning(f"[ROUTER] {model} failed: {error}")
+                    errors.append(f"{model}: {error}")
+
+                if not pending:
+                    start_next()
+        finally:
+            for task in pending:
+                task.cancel()
+
+        raise LLMUnavailableError("All models failed: " + "; ".join(errors))
+
+    def snapshot(self) -> Dict[str, dict]:
+        """Per-model latency and failure stats for health reporting"""
+        return {model: self.stats[model].to_dict() for model in self.models}
@@ -2,23 +2,134 @@
 Client for OpenRouter API integration
 """
 
+import asyncio
 import httpx
-from typing import Optional, List, Dict
+from typing import Optional, List, Dict, Tuple
 from models import ChatResponse
+from .model_router import ModelRouter, LLMUnavailableError
+from .llm_scheduler import LLMScheduler
+
+DEFAULT_MODELS = ["anthropic/claude-3.5-sonnet", "openai/gpt-4o-mini"]
 
 
 class OpenRouterClient:
-    def __init__(self, api_key: Optional[str] = None):
+    def __init__(
+        self,
+        api_key: Optional[str] = None,
+        models: Optional[List[str]] = None,
+        hedge_after: float = 4.0,
+        timeout: float = 30.0,
+        scheduler: Optional[LLMScheduler] = None
+    ):
         self.api_key = api_key
         self.base_url = "https://openrouter.ai/api/v1"
+        self.timeout = timeout
+        self.router = ModelRouter(models or DEFAULT_MODELS, hedge_after=hedge_after)
+        self.scheduler = scheduler
+        self._http: Optional[httpx.AsyncClient] = None
+
+    def _client(self) -> httpx.AsyncClient:
+        """Shared HTTP client so hedged requests reuse pooled connections"""
+        if self._http is None or self._http.is_closed:
+            self._http = httpx.AsyncClient(timeout=self.timeout)
+        return self._http
+
+    async def _request_completion(
+        self,
+        model: str,
+        messages: List[Dict[str, str]],
+        max_tokens: int,
+        temperature: float
+    ) -> str:
+        """Single completion call against one model; raises on any failure"""
+        response = await self._client().post(
+            f"{self.base_url}/chat/completions",
+            headers={
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json",
+            },
+            json={
+                "model": model,
+                "messages": messages,
+                "max_tokens": max_tokens,
+                "temperature": temperature
+            }
+        )
+        if response.status_code != 200:
+            raise RuntimeError(f"OpenRouter API error {response.status_code}: {response.text[:200]}")
+
+        content = response.json()["choices"][0]["message"]["content"]
+        if not content or not content.strip():
+            raise RuntimeError("OpenRouter returned an empty completion")
+        return content
 
-    async def chat_completion(self, message: str, analysis_data: dict) -> ChatResponse:
+    async def _complete(
+        self,
+        messages: List[Dict[str, str]],
+        max_tokens: int = 1000,
+        temperature: float = 0.7,
+        hedge: bool = True,
+        user_id: Optional[str] = None,
+        priority: int = LLMScheduler.INTERACTIVE
+    ) -> Tuple[str, str]:
+        """
+        Route a completion over the model list; returns (model, content).
+        With a scheduler, every upstream attempt holds its own slot: the first
+        waits in the queue, a hedge only starts if a slot is free right away,
+        and a failed attempt hands its slot to the fallback that replaces it.
+        """
+        if not self.scheduler:
+            return await self.router.run(
+                lambda model: self._request_completion(model, messages, max_tokens, temperature),
+                hedge=hedge
+            )
+
+        scheduler = self.scheduler
+        await scheduler.acquire(user_id, priority)
+        spare = [True]  # Slots held for attempts that have not started yet
+
+        def reserve_hedge_slot() -> bool:
+            if spare:
+                return True  # A failed hedge left its slot idle; reuse it
+            if scheduler.try_acquire():
+                spare.append(True)
+                return True
+            return False
+
+        async def call(model: str) -> str:
+            spare.pop()
+            try:
+                content = await self._request_completion(model, messages, max_tokens, temperature)
+            except asyncio.CancelledError:
+                scheduler.release()  # Lost a hedge race
+                raise
+            except Exception:
+                spare.append(True)  # Keep the slot for the next model in line
+                raise
+            scheduler.release()
+            return content
+
+        try:
+            return await self.router.run(call, hedge=hedge, hedge_gate=reserve_hedge_slot)
+        finally:
+            for _ in spare:
+                scheduler.release()
+
+    async def chat_completion(
+        self,
+        message: str,
+        analysis_data: dict,
+        history: Optional[List[Dict[str, str]]] = None,
+        summary: Optional[str] = None,
+        user_id: Optional[str] = None,
+        facts: Optional[List[str]] = None
+    ) -> ChatResponse:
         if not self.api_key:
             print("No API key, using mock data")
             return self._get_mock_chat_response(message)
 
         # Prepare context from analysis data
-        context = self._prepare_analysis_context(analysis_data)
+        context = self._prepare_analysis_context(analysis_data, facts)
         
         system_prompt = f"""You are an expert web analytics and technology stack analyst. You provide clear, actionable insights based on comprehensive website analysis data.
 
@@ -45,56 +156,84 @@ AREAS OF EXPERTISE:
 
 Always support your insights with specific data points from the analysis."""
 
-        async with httpx.AsyncClient() as client:
-            try:
-                response = await client.post(
-                    f"{self.base_url}/chat/completions",
-                    headers={
-                        "Authorization": f"Bearer {self.api_key}",
-                        "Content-Type": "application/json",
-                    },
-                    json={
-                        "model": "anthropic/claude-3.5-sonnet",
-                        "messages": [
-                            {"role": "system", "content": system_prompt},
-                            {"role": "user", "content": message}
-                        ],
-                        "max_tokens": 1000,
-                        "temperature": 0.7
-                    },
-                    timeout=30.0
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    assistant_message = data["choices"][0]["message"]["content"]
-                    
-                    # Generate relevant suggestions based on the response
-                    suggestions = self._generate_suggestions(message, assistant_message)
-                    
-                    return ChatResponse(
-                        response=assistant_message,
-                        suggestions=suggestions
-                    )
-                else:
-                    print(f"OpenRouter API error: {response.status_code} - {response.text}")
-                    return self._get_mock_chat_response(message)
-                    
-            except Exception as e:
-                print(f"Error calling OpenRouter API: {e}")
-                return self._get_mock_chat_response(message)
-
-    def _prepare_analysis_context(self, analysis_data: dict) -> str:
-        """Convert analysis data into a readable context for the LLM"""
+        if summary:
+            system_prompt += f"""
+
+EARLIER CONVERSATION SUMMARY:
+{summary}"""
+
+        messages = [{"role": "system", "content": system_prompt}]
+        messages.extend(history or [])
+        messages.append({"role": "user", "content": message})
+
+        try:
+            model, assistant_message = await self._complete(messages, user_id=user_id)
+        except LLMUnavailableError as e:
+            # Surface the failure instead of answering with canned text
+            print(f"Error calling OpenRouter API: {e}")
+            raise
+
+        print(f"OpenRouter response from {model}")
+
+        # Generate relevant suggestions based on the response
+        suggestions = self._generate_suggestions(message, assistant_message)
+
+        return ChatResponse(
+            response=assistant_message,
+            suggestions=suggestions,
+            model=model
+        )
+
+    async def summarize_conversation(
+        self,
+        previous_summary: str,
+        turns: List[Dict],
+        user_id: Optional[str] = None
+    ) -> Optional[str]:
+        """Fold older chat turns into the running conversation summary"""
+        if not self.api_key:
+            return None
+
+        transcript = "\n".join(
+            f"User: {turn.get('message', '')}\nAssistant: {turn.get('response', '')}"
+            for turn in turns
+        )
+        prompt = f"""Update the running summary of a conversation about website analytics.
+Keep the facts, numbers, domains and decisions the user cares about. Drop pleasantries.
+Answer with the updated summary only, in at most 15 bullet points.
+
+CURRENT SUMMARY:
+{previous_summary or "(empty)"}
+
+NEW TURNS:
+{transcript}"""
+
+        # Background work: fall back across models but never hedge
+        _, content = await self._complete(
+            [{"role": "user", "content": prompt}],
+            max_tokens=500,
+            temperature=0.2,
+            hedge=False,
+            user_id=user_id,
+            priority=LLMScheduler.BACKGROUND
+        )
+        return content
+
+    @staticmethod
+    def analyzed_sites(analysis_data: dict) -> List[dict]:
+        """The analysis data's websites, without LinkedIn and other generic platforms"""
+        return [
+            website for website in analysis_data.get("data") or []
+            if website.get('name', '').lower() not in ['linkedin', 'linkedin.com', 'github', 'github.com']
+        ]
+
+    def _prepare_analysis_context(self, analysis_data: dict, facts: Optional[List[str]] = None) -> str:
+        """Convert analysis data into a readable context for the LLM, led by any precomputed facts"""
         context_parts = []
         
         if "data" in analysis_data:
             # Filter out LinkedIn and generic domains from context
-            filtered_data = []
-            for website in analysis_data["data"]:
-                website_name = website.get('name', '').lower()
-                if website_name not in ['linkedin', 'linkedin.com', 'github', 'github.com']:
-                    filtered_data.append(website)
+            filtered_data = self.analyzed_sites(analysis_data)
             
             if not filtered_data:
                 return "No specific website data available for analysis."
@@ -138,6 +277,10 @@ Always support your insights with specific data points from the analysis."""
 {self._format_top_keywords(website.get('topKeywords', []))}
 """
                 context_parts.append(summary)
+            
+            # Deterministic comparisons so the model quotes numbers instead of computing them
+            if facts:
+                context_parts.insert(0, "📐 **Precomputed Comparisons (exact figures, prefer these):**\n" + "\n".join(f"- {fact}" for fact in facts))
         
         return "\n".join(context_parts)
 
@@ -0,0 +1,150 @@
+"""
+Precompiled technology classifier for BuiltWith technology names
+
+The taxonomy (skip terms, name normalization, categories and popularity) lives
+in a versioned JSON file. It is loaded once and every term is compiled into a
+single trie-shaped regular expression. One scan of a name yields a bitmask of
+all terms it contains, and the skip/normalize/categorize rules become integer
+mask tests instead of dozens of Python `in` checks.
+"""
+
+import json
+import logging
+import os
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_TAXONOMY_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tech_taxonomy.json")
+
+
+def _trie_pattern(words: Iterable[str]) -> str:
+    """Regex alternation with shared prefixes factored out (e.g. java(?:script)?)"""
+    trie: Dict = {}
+    for word in words:
+        node = trie
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: Dict) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            body = ("(?:" + body + ")" if len(branches) == 1 else body) + "?"
+        return body
+
+    return build(trie)
+
+
+class TechClassifier:
+    """Skip / normalize / categorize / popularity lookups compiled from a taxonomy"""
+
+    def __init__(self, taxonomy: Dict):
+        self.version = taxonomy.get("version")
+        self.min_length = taxonomy.get("min_length", 3)
+        self.important_short_terms = frozenset(taxonomy.get("important_short_terms", []))
+        self.default_category = taxonomy.get("default_category", "Web Technologies")
+        self.popularity_map = {k.lower(): v for k, v in taxonomy.get("popularity", {}).items()}
+        self.default_popularity = taxonomy.get("default_popularity", 50)
+
+        skip_terms = taxonomy.get("skip_terms", [])
+        normalize_rules = taxonomy.get("normalize", [])
+        categories = taxonomy.get("categories", [])
+
+        terms = set(skip_terms)
+        for rule in normalize_rules:
+            terms.update(t for t in (rule["match"], rule.get("requires")) if t)
+        for category in categories:
+            terms.update(category["patterns"])
+        terms = sorted(terms)
+
+        bits = {term: 1 << i for i, term in enumerate(terms)}
+        # The greedy trie match at a position returns the longest term there;
+        # every term contained in it is present too, so fold those bits in.
+        self._term_mask = {
+            term: self._or(bits[other] for other in terms if other in term) for term in terms
+        }
+        self._scanner = re.compile("(?=(" + _trie_pattern(terms) + "))") if terms else None
+
+        self._skip_mask = self._or(bits[t] for t in skip_terms)
+        self._normalize_rules: List[Tuple[int, str]] = [
+            (self._or(bits[t] for t in (rule["match"], rule.get("requires")) if t), rule["name"])
+            for rule in normalize_rules
+        ]
+        self._category_rules: List[Tuple[int, str]] = [
+            (self._or(bits[t] for t in category["patterns"]), category["name"])
+            for category in categories
+        ]
+        self._category_cache: Dict[str, str] = {}
+
+    @staticmethod
+    def _or(masks: Iterable[int]) -> int:
+        result = 0
+        for mask in masks:
+            result |= mask
+        return result
+
+    @classmethod
+    def load(cls, path: Optional[str] = None) -> "TechClassifier":
+        """Load and compile the taxonomy file"""
+        path = path or os.environ.get("TECH_TAXONOMY_PATH") or DEFAULT_TAXONOMY_PATH
+        with open(path, encoding="utf-8") as f:
+            taxonomy = json.load(f)
+        classifier = cls(taxonomy)
+        logger.info(f"[TAXONOMY] Loaded technology taxonomy v{classifier.version} from {path}")
+        return classifier
+
+    def _mask(self, text: str) -> int:
+        """Bitmask of every taxonomy term contained in text (one regex pass)"""
+        mask = 0
+        if self._scanner:
+            term_mask = self._term_mask
+            for term in self._scanner.findall(text):
+                mask |= term_mask[term]
+        return mask
+
+    def clean_name(self, name: str) -> str:
+        """Normalize a raw BuiltWith name; returns "" for generic or noisy entries"""
+        if not name:
+            return ""
+        name = name.strip()
+        name_lower = name.lower()
+        mask = self._mask(name_lower)
+
+        if mask & self._skip_mask:
+            return ""
+        if len(name) < self.min_length:
+            return ""
+        if len(name) <= 3 and name_lower not in self.important_short_terms:
+            return ""
+
+        for needed, canonical in self._normalize_rules:
+            if mask & needed == needed:
+                return canonical
+
+        # Remove version numbers from names
+        clean_name = name.split(" ")[0]
+        if clean_name.isdigit():
+            return ""
+        return clean_name
+
+    def categorize(self, tech_name: str) -> str:
+        # Cleaned names come from a small vocabulary, so memoize them
+        category = self._category_cache.get(tech_name)
+        if category is None:
+            mask = self._mask(tech_name.lower())
+            category = next((name for needed, name in self._category_rules if mask & needed), self.default_category)
+            if len(self._category_cache) < 10000:
+                self._category_cache[tech_name] = category
+        return category
+
+    def popularity(self, tech_name: str) -> int:
+        return self.popularity_map.get(tech_name.lower(), self.default_popularity)
+
+
+# Global classifier, compiled once at import time
+tech_classifier = TechClassifier.load()
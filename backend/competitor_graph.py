@@ -0,0 +1,138 @@
+"""
+Bounded breadth-first crawl of the topSimilarityCompetitors graph
+
+Starting from seed domains, each level's unseen competitors are looked up in
+the snapshot cache first. Only the misses are sent to the Apify actor, packed
+into multi-domain runs with a cap on concurrent runs. The crawl stops at the
+depth limit or the node budget. The result is an in-memory graph whose edges
+are weighted by SimilarWeb affinity.
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional
+
+from domain_utils import normalize_domain, unique_domains
+from models import ApifyResult
+from snapshot_cache import SnapshotCache
+
+logger = logging.getLogger(__name__)
+
+
+class CompetitorGraphCrawler:
+    """Expands competitor links level by level within a depth and node budget"""
+
+    def __init__(self, apify_client, cache: SnapshotCache, batch_size: int = 10, max_concurrency: int = 2):
+        self.apify_client = apify_client
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        # Shared by every fetch (crawls and scheduled refreshes), created inside the running loop
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    async def fetch(self, domains: List[str], stats: Dict[str, int]) -> Dict[str, ApifyResult]:
+        """Cached snapshots plus batched, concurrency-limited actor runs for the misses"""
+        found, missing = self.cache.get_many(domains)
+        stats["cache_hits"] += len(found)
+        if not missing or not self.apify_client:
+            stats["unresolved"] += len(missing)
+            return found
+
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [missing[i:i + self.batch_size] for i in range(0, len(missing), self.batch_size)]
+
+        async def run(batch: List[str]) -> List[ApifyResult]:
+            async with self._semaphore:
+                stats["actor_runs"] += 1
+                try:
+                    return await self.apify_client.analyze_domains(batch)
+                except Exception as e:
+                    print(f"[CRAWL] Actor run failed for {', '.join(batch)}: {e}")
+                    return []
+
+        wanted = set(missing)
+        for results in await asyncio.gather(*(run(batch) for batch in batches)):
+            for result in results:
+                domain = normalize_domain(result.name)
+                self.cache.put(result, domain)
+                if domain in wanted and domain not in found:
+                    found[domain] = result
+                    stats["fetched"] += 1
+        stats["unresolved"] += sum(1 for domain in missing if domain not in found)
+        return found
+
+    async def crawl(
+        self,
+        seeds: List[str],
+        max_depth: int = 2,
+        max_nodes: int = 50,
+        min_affinity: float = 0.0
+    ) -> Dict[str, Any]:
+        """BFS from the seeds; returns {nodes, edges, stats}"""
+        stats = {"actor_runs": 0, "cache_hits": 0, "fetched": 0, "unresolved": 0, "depth_reached": 0}
+        nodes: Dict[str, Dict[str, Any]] = {}
+        edges: Dict[tuple, float] = {}
+
+        frontier = unique_domains(seeds)[:max_nodes]
+        for domain in frontier:
+            nodes[domain] = {"domain": domain, "depth": 0, "expanded": False}
+
+        depth = 0
+        while frontier:
+            print(f"[CRAWL] Depth {depth}: expanding {len(frontier)} domains")
+            stats["depth_reached"] = depth
+            snapshots = await self.fetch(frontier, stats)
+
+            # Candidate next level, strongest affinity first so the budget goes to close competitors
+            candidates: Dict[str, float] = {}
+            for domain in frontier:
+                snapshot = snapshots.get(domain)
+                if snapshot is None:
+                    continue
+                nodes[domain].update(self._summary(snapshot), expanded=True)
+
+                for competitor in snapshot.topSimilarityCompetitors:
+                    target = normalize_domain(competitor.domain)
+                    if not target or target == domain or competitor.affinity < min_affinity:
+                        continue
+                    key = (domain, target)
+                    edges[key] = max(edges.get(key, 0.0), competitor.affinity)
+                    if target not in nodes:
+                        candidates[target] = max(candidates.get(target, 0.0), competitor.affinity)
+
+            if depth >= max_depth:
+                break
+            budget = max_nodes - len(nodes)
+            frontier = sorted(candidates, key=candidates.get, reverse=True)[:max(budget, 0)]
+            depth += 1
+            for domain in frontier:
+                nodes[domain] = {"domain": domain, "depth": depth, "expanded": False}
+
+        # Competitors seen but not crawled still appear as leaves of the graph
+        for _, target in edges:
+            nodes.setdefault(target, {"domain": target, "depth": None, "expanded": False})
+
+        stats.update(
+            nodes=len(nodes),
+            crawled=sum(1 for node in nodes.values() if node["depth"] is not None),
+            edges=len(edges)
+        )
+        logger.info(f"[CRAWL] Crawl finished: {stats}")
+        return {
+            "nodes": list(nodes.values()),
+            "edges": [
+                {"source": source, "target": target, "affinity": round(affinity, 4)}
+                for (source, target), affinity in sorted(edges.items(), key=lambda e: -e[1])
+            ],
+            "stats": stats
+        }
+
+    @staticmethod
+    def _summary(snapshot: ApifyResult) -> Dict[str, Optional[Any]]:
+        return {
+            "globalRank": snapshot.globalRank,
+            "totalVisits": snapshot.totalVisits,
+            "bounceRate": snapshot.bounceRate,
+            "pagesPerVisit": snapshot.pagesPerVisit
+        }
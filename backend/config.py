@@ -29,12 +29,88 @@ class Config:
         self.builtwith_key = os.environ.get("BUILTWITH_API_KEY")
         self.openrouter_key = os.environ.get("OPENROUTER_API_KEY")
         
+        # BuiltWith lookup settings
+        self.builtwith_batch_size = self._env_int("BUILTWITH_BATCH_SIZE", 16)
+        self.builtwith_prefetch = os.environ.get("BUILTWITH_PREFETCH", "true").lower() in ("1", "true", "yes")
+        self.builtwith_prefetch_concurrency = self._env_int("BUILTWITH_PREFETCH_CONCURRENCY", 1)
+        self.builtwith_cache_ttl = self._env_float("BUILTWITH_CACHE_TTL_SECONDS", 86400.0)
+        
+        # SimilarWeb snapshot cache settings
+        self.snapshot_ttl = self._env_float("SNAPSHOT_TTL_SECONDS", 86400.0)
+        self.snapshot_max_entries = self._env_int("SNAPSHOT_MAX_ENTRIES", 5000)
+        
+        # Competitor graph crawl limits
+        self.crawl_max_depth = self._env_int("CRAWL_MAX_DEPTH", 3)
+        self.crawl_max_nodes = self._env_int("CRAWL_MAX_NODES", 200)
+        self.crawl_batch_size = self._env_int("CRAWL_BATCH_SIZE", 10)
+        self.crawl_max_concurrency = self._env_int("CRAWL_MAX_CONCURRENCY", 2)
+        
+        # Bulk upload analysis limits
+        self.bulk_batch_size = self._env_int("BULK_BATCH_SIZE", 10)
+        self.bulk_concurrency = self._env_int("BULK_CONCURRENCY", 2)
+        self.bulk_max_domains = self._env_int("BULK_MAX_DOMAINS", 10000)
+        
+        # Sessions read per page when streaming history
+        self.history_page_size = self._env_int("HISTORY_PAGE_SIZE", 20)
+        
+        # Rows per CSV chunk / Parquet row group in history exports
+        self.export_row_group_rows = self._env_int("EXPORT_ROW_GROUP_ROWS", 10000)
+        
+        # Response compression (gzip, or brotli when installed) for bodies of at least this many bytes
+        self.compression_min_size = self._env_int("COMPRESSION_MIN_SIZE", 1024)
+        
+        # Scheduled re-analysis of tracked domains (window is "HH:MM-HH:MM" UTC, may wrap midnight)
+        self.refresh_enabled = os.environ.get("REFRESH_ENABLED", "false").lower() in ("1", "true", "yes")
+        self.refresh_window = os.environ.get("REFRESH_WINDOW", "01:00-05:00")
+        self.refresh_interval_hours = self._env_float("REFRESH_INTERVAL_HOURS", 168.0)
+        self.refresh_tick_seconds = self._env_float("REFRESH_TICK_SECONDS", 300.0)
+        self.refresh_max_per_run = self._env_int("REFRESH_MAX_PER_RUN", 200)
+        self.refresh_retry_base_minutes = self._env_float("REFRESH_RETRY_BASE_MINUTES", 60.0)
+        self.refresh_state_path = os.environ.get("REFRESH_STATE_PATH", "data/tracked_domains.json")
+        
+        # Raw upstream response archive settings
+        self.raw_archive_enabled = os.environ.get("RAW_ARCHIVE_ENABLED", "true").lower() in ("1", "true", "yes")
+        self.raw_archive_dir = os.environ.get("RAW_ARCHIVE_DIR", "archive")
+        self.raw_archive_full_body = os.environ.get("RAW_ARCHIVE_FULL_BODY", "false").lower() in ("1", "true", "yes")
+        
+        # Chat memory settings
+        self.chat_history_turns = self._env_int("CHAT_HISTORY_TURNS", 6)
+        self.chat_summary_max_chars = self._env_int("CHAT_SUMMARY_MAX_CHARS", 2000)
+        
+        # Chat model routing settings
+        self.chat_models = [
+            m.strip() for m in os.environ.get("OPENROUTER_MODELS", "").split(",") if m.strip()
+        ]
+        self.chat_hedge_after = self._env_float("CHAT_HEDGE_AFTER_SECONDS", 4.0)
+        self.chat_timeout = self._env_float("CHAT_TIMEOUT_SECONDS", 30.0)
+        
+        # LLM call scheduling settings
+        self.llm_max_concurrency = self._env_int("LLM_MAX_CONCURRENCY", 4)
+        self.llm_max_queue = self._env_int("LLM_MAX_QUEUE", 64)
+        self.llm_queue_deadline = self._env_float("LLM_QUEUE_DEADLINE_SECONDS", 20.0)
+        
         # Initialize Supabase client
         self.supabase = self.setup_supabase()
         
         # Log configuration status
         self.log_configuration_status()
     
+    @staticmethod
+    def _env_int(name: str, default: int) -> int:
+        """Read an integer setting from the environment, falling back to default"""
+        try:
+            return int(os.environ.get(name, default))
+        except (TypeError, ValueError):
+            return default
+    
+    @staticmethod
+    def _env_float(name: str, default: float) -> float:
+        """Read a float setting from the environment, falling back to default"""
+        try:
+            return float(os.environ.get(name, default))
+        except (TypeError, ValueError):
+            return default
+    
     def setup_logging(self):
         """Configure logging for the application"""
         logging.basicConfig(
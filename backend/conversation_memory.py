@@ -0,0 +1,119 @@
+"""
+Rolling conversation memory for the chat endpoint
+
+Keeps the most recent turns of a session's chat verbatim and folds older
+turns into a running summary stored on the session, so the prompt sent to
+the LLM stays bounded no matter how long the conversation gets.
+"""
+
+import logging
+from typing import List, Dict, Any, Optional, Tuple
+from config import config
+
+logger = logging.getLogger(__name__)
+
+
+class ConversationMemory:
+    """Builds bounded chat history from a session's chat_discussion"""
+
+    def __init__(self, window_turns: int = None, summary_max_chars: int = None):
+        self.window_turns = max(1, window_turns or config.chat_history_turns)
+        self.summary_max_chars = summary_max_chars or config.chat_summary_max_chars
+
+    @staticmethod
+    def empty_summary() -> Dict[str, Any]:
+        """Summary record for a session that has not been summarized yet"""
+        return {"text": "", "turns": 0}
+
+    def load_summary(self, session: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Read the running summary from a parsed session"""
+        summary = (session or {}).get("chat_summary") or {}
+        return {
+            "text": summary.get("text", "") or "",
+            "turns": int(summary.get("turns", 0) or 0)
+        }
+
+    def build_history(
+        self,
+        chat_discussion: Optional[List[Dict[str, Any]]],
+        summary: Dict[str, Any]
+    ) -> Tuple[List[Dict[str, str]], str]:
+        """
+        Return (messages, summary_text) for the prompt.
+        Only the last `window_turns` turns are sent verbatim; anything older
+        is represented by the summary text.
+        """
+        turns = chat_discussion or []
+        recent = turns[-self.window_turns:]
+
+        messages = []
+        for turn in recent:
+            if turn.get("message"):
+                messages.append({"role": "user", "content": turn["message"]})
+            if turn.get("response"):
+                messages.append({"role": "assistant", "content": turn["response"]})
+
+        return messages, summary.get("text", "")
+
+    def turns_to_fold(
+        self,
+        chat_discussion: Optional[List[Dict[str, Any]]],
+        summary: Dict[str, Any]
+    ) -> List[Dict[str, Any]]:
+        """Turns that have fallen out of the verbatim window but are not yet summarized"""
+        turns = chat_discussion or []
+        window_start = max(0, len(turns) - self.window_turns)
+        already_folded = min(summary.get("turns", 0), window_start)
+        return turns[already_folded:window_start]
+
+    def fallback_summary(self, previous_summary: str, turns: List[Dict[str, Any]]) -> str:
+        """Extractive summary used when the LLM is unavailable"""
+        lines = [previous_summary] if previous_summary else []
+        for turn in turns:
+            question = (turn.get("message") or "").strip().replace("\n", " ")
+            answer = (turn.get("response") or "").strip().replace("\n", " ")
+            lines.append(f"- User asked: {question[:160]} | Answer: {answer[:240]}")
+        return self.truncate("\n".join(lines))
+
+    def truncate(self, text: str) -> str:
+        """Keep the most recent part of the summary within the size budget"""
+        if len(text) <= self.summary_max_chars:
+            return text
+        return "..." + text[-(self.summary_max_chars - 3):]
+
+    async def fold(self, session_id: str, openrouter_client, db_service) -> bool:
+        """
+        Fold turns that left the verbatim window into the session's running summary.
+        Safe to run in the background after the chat response has been sent.
+        """
+        session = await db_service.get_analysis_session(session_id)
+        if not session:
+            return False
+
+        chat_discussion = session.get("chat_discussion") or []
+        summary = self.load_summary(session)
+        pending = self.turns_to_fold(chat_discussion, summary)
+        if not pending:
+            return False
+
+        try:
+            text = await openrouter_client.summarize_conversation(
+                summary["text"], pending, user_id=session.get("user_id")
+            )
+        except Exception as e:
+            logger.warning(f"[MEMORY] Summarization failed, using extractive summary: {e}")
+            text = None
+
+        if not text:
+            text = self.fallback_summary(summary["text"], pending)
+
+        new_summary = {
+            "text": self.truncate(text),
+            "turns": summary["turns"] + len(pending)
+        }
+        logger.info(f"[MEMORY] Folded {len(pending)} turns into summary for session {session_id}")
+        return await db_service.update_chat_summary(session_id, new_summary)
+
+
+# Global conversation memory instance
+conversation_memory = ConversationMemory()
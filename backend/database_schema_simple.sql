@@ -16,10 +16,14 @@ CREATE TABLE IF NOT EXISTS analysis_sessions (
     similarweb_jsonb JSONB,
     builtwith_jsonb JSONB,
     chat_discussion JSONB,
+    chat_summary JSONB,
     created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
     updated_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
 );
 
+-- Add columns introduced after the initial release
+ALTER TABLE analysis_sessions ADD COLUMN IF NOT EXISTS chat_summary JSONB;
+
 -- Create indexes for better performance
 CREATE INDEX IF NOT EXISTS idx_analysis_sessions_user_id ON analysis_sessions(user_id);
 CREATE INDEX IF NOT EXISTS idx_analysis_sessions_created_at ON analysis_sessions(created_at);
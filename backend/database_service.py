@@ -2,23 +2,51 @@
 Database service for managing user data and analysis history
 """
 
+import asyncio
+import copy
 import json
 import logging
 import uuid
+from collections import OrderedDict
 from datetime import datetime
-from typing import List, Optional, Dict, Any
+from typing import AsyncIterator, List, Optional, Dict, Any
 from config import config
 from models import ApifyResult, ChatMessage
+from domain_history import domain_history
+from domain_metrics import domain_metrics
+from keyword_index import keyword_index
+from mock_data import observed_results
+from tech_index import tech_index
+from traffic_similarity import traffic_index
 
 logger = logging.getLogger(__name__)
 
+# Parsed field -> stored column
+SESSION_COLUMNS = {
+    "user_id": "user_id",
+    "domains": "domains",
+    "similarweb_data": "similarweb_jsonb",
+    "builtwith_data": "builtwith_jsonb",
+    "chat_discussion": "chat_discussion",
+    "chat_summary": "chat_summary",
+    "created_at": "created_at",
+}
+JSON_COLUMNS = {"similarweb_data", "builtwith_data", "chat_discussion", "chat_summary"}
+
 
 class DatabaseService:
     """Service for managing database operations"""
     
-    def __init__(self):
+    def __init__(self, session_cache_size: int = 256):
         self.supabase = config.supabase
         self.logger = logger
+        # Recently written sessions (session id -> parsed fields) so follow-up steps skip the DB read
+        self._session_cache: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._session_cache_size = session_cache_size
+        # Background rebuild of the domain-keyed indexes after a session delete
+        self._reindex_task: Optional[asyncio.Task] = None
+        self._reindex_pending = False
+        self._reindex_tech_domains: set = set()
         
         # Log the status of the Supabase client
         if self.supabase:
@@ -69,6 +97,16 @@ class DatabaseService:
             try:
                 result = self.supabase.table("analysis_sessions").insert(session_data).execute()
                 self.logger.info(f"Analysis session saved successfully: {session_id}")
+                self._cache_session(session_id, {
+                    "user_id": session_data["user_id"],
+                    "created_at": session_data["created_at"],
+                    "domains": domains,
+                    "similarweb_data": json.loads(session_data["similarweb_jsonb"]) if similarweb_data else None,
+                    "builtwith_data": json.loads(session_data["builtwith_jsonb"]) if builtwith_data else None
+                })
+                self._index_results(
+                    session_id, session_data["user_id"], session_data["created_at"], similarweb_data, builtwith_data
+                )
                 return session_id
             except Exception as db_error:
                 self.logger.error(f"Database insert failed: {db_error}")
@@ -119,12 +157,85 @@ class DatabaseService:
             result = self.supabase.table("analysis_sessions").update(update_data).eq("id", session_id).execute()
             
             self.logger.info(f"Analysis session updated successfully: {session_id}")
+            self._cache_session(session_id, {
+                field: json.loads(update_data[column])
+                for field, column in SESSION_COLUMNS.items() if column in update_data
+            }, merge=True)
+            if similarweb_data or builtwith_data:
+                meta = await self.get_session_fields(session_id, ["user_id", "created_at"]) or {}
+                self._index_results(
+                    session_id, meta.get("user_id"), meta.get("created_at") or update_data["updated_at"],
+                    similarweb_data, builtwith_data
+                )
             return True
             
         except Exception as e:
             self.logger.error(f"Error updating analysis session: {e}")
             return False
     
+    def _index_results(
+        self,
+        session_id: str,
+        user_id: Optional[str],
+        analyzed_at: str,
+        similarweb_data: Optional[List[ApifyResult]],
+        builtwith_data: Optional[List[ApifyResult]]
+    ):
+        """
+        Feed saved results to the in-process indexes, stamped with the session's
+        analysis time (created_at) so later chat updates never make old data look new.
+        Mock rows and mock BuiltWith stacks are placeholders, not observations, and are skipped.
+        """
+        similarweb_data = observed_results(similarweb_data)
+        builtwith_data = observed_results(builtwith_data)
+        if similarweb_data:
+            traffic_index.update_many(similarweb_data, updated_at=analyzed_at)
+            keyword_index.update_many(similarweb_data, updated_at=analyzed_at, user_id=user_id)
+            domain_metrics.update_many(similarweb_data, updated_at=analyzed_at)
+            domain_history.record_many(similarweb_data, updated_at=analyzed_at)
+        if builtwith_data:
+            domain_metrics.update_many(builtwith_data, updated_at=analyzed_at)
+            domain_history.record_many(builtwith_data, updated_at=analyzed_at)
+            tech_index.index_session(session_id, builtwith_data, user_id=user_id, updated_at=analyzed_at)
+    
+    def _unindex_sessions(self, rows: List[Dict[str, Any]]):
+        """
+        Purge deleted analysis_sessions rows from every index _index_results feeds.
+        The domain-keyed stores keep one entry per domain, so those domains are dropped
+        right away and the stores are rebuilt in the background to restore what other
+        sessions hold.
+        """
+        domains = set()
+        for row in rows:
+            self._reindex_tech_domains.update(tech_index.remove_session(row["id"]))
+            domains.update(row.get("domains") or [])
+            for column in ("similarweb_jsonb", "builtwith_jsonb"):
+                if row.get(column):
+                    domains.update(item.get("name", "") for item in json.loads(row[column]))
+        for domain in domains:
+            traffic_index.remove(domain)
+            keyword_index.remove(domain)
+            domain_metrics.remove(domain)
+            domain_history.remove(domain)
+        if not domains:
+            return
+        self._reindex_pending = True
+        if self._reindex_task is None or self._reindex_task.done():
+            self._reindex_task = asyncio.create_task(self._reindex())
+
+    async def _reindex(self):
+        """Rebuild the domain-keyed indexes until no delete arrived during the last pass"""
+        try:
+            while self._reindex_pending:
+                self._reindex_pending = False
+                for store in (traffic_index, keyword_index, domain_metrics, domain_history):
+                    await store.reload(self)
+                tech_domains, self._reindex_tech_domains = self._reindex_tech_domains, set()
+                if tech_domains:
+                    await tech_index.reindex_domains(self, tech_domains)
+        except Exception as e:
+            self.logger.error(f"[INDEX] Rebuild after session delete failed: {e}")
+    
     async def get_user_history(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
         """
         Get user's analysis history
@@ -149,17 +260,7 @@ class DatabaseService:
                 sessions = []
                 for session in result.data:
                     try:
-                        parsed_session = {
-                            "id": session["id"],
-                            "user_id": session["user_id"],
-                            "domains": session["domains"],
-                            "created_at": session["created_at"],
-                            "updated_at": session["updated_at"],
-                            "similarweb_data": json.loads(session["similarweb_jsonb"]) if session["similarweb_jsonb"] else None,
-                            "builtwith_data": json.loads(session["builtwith_jsonb"]) if session["builtwith_jsonb"] else None,
-                            "chat_discussion": json.loads(session["chat_discussion"]) if session["chat_discussion"] else None
-                        }
-                        sessions.append(parsed_session)
+                        sessions.append(self._parse_session(session))
                     except Exception as parse_error:
                         self.logger.error(f"Error parsing session data: {parse_error}")
                         continue
@@ -189,17 +290,7 @@ class DatabaseService:
                 .execute()
             
             if result.data and len(result.data) > 0:
-                session = result.data[0]
-                parsed_session = {
-                    "id": session["id"],
-                    "user_id": session["user_id"],
-                    "domains": session["domains"],
-                    "created_at": session["created_at"],
-                    "updated_at": session["updated_at"],
-                    "similarweb_data": json.loads(session["similarweb_jsonb"]) if session["similarweb_jsonb"] else None,
-                    "builtwith_data": json.loads(session["builtwith_jsonb"]) if session["builtwith_jsonb"] else None,
-                    "chat_discussion": json.loads(session["chat_discussion"]) if session["chat_discussion"] else None
-                }
+                parsed_session = self._parse_session(result.data[0])
                 
                 self.logger.info(f"Retrieved analysis session: {session_id}")
                 return parsed_session
@@ -210,6 +301,169 @@ class DatabaseService:
             self.logger.error(f"Error retrieving analysis session: {e}")
             return None
     
+    async def get_session_version(self, session_id: str) -> Optional[str]:
+        """
+        updated_at of a session without loading its payload (None if not found)
+        """
+        try:
+            if not self.supabase:
+                self.logger.warning("Supabase client not available")
+                return None
+            
+            result = self.supabase.table("analysis_sessions")\
+                .select("id,updated_at")\
+                .eq("id", session_id)\
+                .execute()
+            return result.data[0]["updated_at"] if result.data else None
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving session version: {e}")
+            return None
+    
+    async def get_history_versions(self, user_id: str, limit: int = 50) -> List[Dict[str, Any]]:
+        """
+        id and updated_at of the sessions get_user_history returns, in the same order
+        """
+        try:
+            if not self.supabase:
+                self.logger.warning("Supabase client not available")
+                return []
+            
+            result = self.supabase.table("analysis_sessions")\
+                .select("id,updated_at")\
+                .eq("user_id", self._ensure_valid_uuid(user_id))\
+                .order("created_at", desc=True)\
+                .limit(limit)\
+                .execute()
+            return result.data or []
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving history versions: {e}")
+            return []
+    
+    async def get_session_fields(self, session_id: str, fields: List[str]) -> Optional[Dict[str, Any]]:
+        """
+        Fetch only the given parsed fields of a session (e.g. ["similarweb_data"]),
+        served from the recent-session cache when possible
+        """
+        cached = self._session_cache.get(session_id)
+        if cached is not None and all(field in cached for field in fields):
+            self._session_cache.move_to_end(session_id)
+            self.logger.info(f"Session cache hit: {session_id}")
+            return {"id": session_id, **{field: copy.deepcopy(cached[field]) for field in fields}}
+        
+        try:
+            if not self.supabase:
+                self.logger.warning("Supabase client not available")
+                return None
+            
+            columns = ",".join(["id"] + [SESSION_COLUMNS[field] for field in fields])
+            result = self.supabase.table("analysis_sessions")\
+                .select(columns)\
+                .eq("id", session_id)\
+                .execute()
+            
+            if not result.data:
+                return None
+            
+            row = result.data[0]
+            parsed = {}
+            for field in fields:
+                value = row.get(SESSION_COLUMNS[field])
+                parsed[field] = json.loads(value) if field in JSON_COLUMNS and value else value
+            self._cache_session(session_id, copy.deepcopy(parsed), merge=True)
+            return {"id": session_id, **parsed}
+            
+        except Exception as e:
+            self.logger.error(f"Error retrieving session fields: {e}")
+            return None
+    
+    def _cache_session(self, session_id: str, fields: Dict[str, Any], merge: bool = False):
+        if merge and session_id in self._session_cache:
+            self._session_cache[session_id].update(fields)
+        else:
+            self._session_cache[session_id] = dict(fields)
+        self._session_cache.move_to_end(session_id)
+        while len(self._session_cache) > self._session_cache_size:
+            self._session_cache.popitem(last=False)
+    
+    async def list_sessions(self, offset: int = 0, limit: int = 100, user_id: str = None) -> List[Dict[str, Any]]:
+        """
+        Page through analysis sessions (all users, or one user), oldest first
+        """
+        try:
+            if not self.supabase:
+                self.logger.warning("Supabase client not available")
+                return []
+            
+            query = self.supabase.table("analysis_sessions").select("*")
+            if user_id:
+                query = query.eq("user_id", self._ensure_valid_uuid(user_id))
+            result = query.order("created_at").range(offset, offset + limit - 1).execute()
+            
+            sessions = []
+            for session in result.data or []:
+                try:
+                    sessions.append(self._parse_session(session))
+                except Exception as parse_error:
+                    self.logger.error(f"Error parsing session data: {parse_error}")
+            return sessions
+            
+        except Exception as e:
+            self.logger.error(f"Error listing analysis sessions: {e}")
+            return []
+    
+    async def iter_user_history(self, user_id: str, limit: int = 0, page_size: int = 20) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield a user's parsed sessions newest first, reading page_size rows at a time
+        (limit 0 = all), so only one page is held in memory
+        """
+        if not self.supabase:
+            self.logger.warning("Supabase client not available")
+            return
+        
+        valid_user_id = self._ensure_valid_uuid(user_id)
+        offset = 0
+        while not limit or offset < limit:
+            size = min(page_size, limit - offset) if limit else page_size
+            try:
+                result = self.supabase.table("analysis_sessions")\
+                    .select("*")\
+                    .eq("user_id", valid_user_id)\
+                    .order("created_at", desc=True)\
+                    .range(offset, offset + size - 1)\
+                    .execute()
+            except Exception as e:
+                self.logger.error(f"Error streaming user history: {e}")
+                raise
+            
+            rows = result.data or []
+            del result
+            offset += len(rows)
+            last_page = len(rows) < size
+            while rows:
+                # Drop each raw row once parsed so at most one page is alive
+                row = rows.pop(0)
+                try:
+                    yield self._parse_session(row)
+                except Exception as parse_error:
+                    self.logger.error(f"Error parsing session data: {parse_error}")
+            if last_page:
+                break
+    
+    async def iter_sessions(self, page_size: int = 500, user_id: str = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield every analysis session, oldest first, one page at a time
+        """
+        offset = 0
+        while True:
+            page = await self.list_sessions(offset=offset, limit=page_size, user_id=user_id)
+            for session in page:
+                yield session
+            if len(page) < page_size:
+                break
+            offset += len(page)
+    
     async def save_chat_message(self, session_id: str, message: str, response: str, is_user: bool = True) -> bool:
         """
         Save a chat message to an analysis session
@@ -249,6 +503,27 @@ class DatabaseService:
             self.logger.error(f"Error saving chat message: {e}")
             return False
     
+    async def update_chat_summary(self, session_id: str, chat_summary: Dict[str, Any]) -> bool:
+        """
+        Store the running conversation summary for a session
+        """
+        try:
+            if not self.supabase:
+                self.logger.warning("Supabase client not available")
+                return False
+            
+            self.supabase.table("analysis_sessions").update({
+                "chat_summary": json.dumps(chat_summary),
+                "updated_at": datetime.utcnow().isoformat()
+            }).eq("id", session_id).execute()
+            
+            self.logger.info(f"Chat summary updated for session: {session_id}")
+            return True
+            
+        except Exception as e:
+            self.logger.error(f"Error updating chat summary: {e}")
+            return False
+    
     async def delete_analysis_session(self, session_id: str, user_id: str) -> bool:
         """
         Delete an analysis session (only if it belongs to the user)
@@ -268,6 +543,9 @@ class DatabaseService:
                 .execute()
             
             self.logger.info(f"Analysis session deleted: {session_id}")
+            self._session_cache.pop(session_id, None)
+            if result.data:
+                self._unindex_sessions(result.data)
             return True
             
         except Exception as e:
@@ -310,6 +588,24 @@ class DatabaseService:
             self.logger.error(f"Error ensuring user exists: {e}")
             return False
     
+    def _parse_session(self, session: Dict[str, Any]) -> Dict[str, Any]:
+        """Decode the JSON columns of a raw analysis_sessions row"""
+        return {
+            "id": session["id"],
+            "user_id": session["user_id"],
+            "domains": session["domains"],
+            "created_at": session["created_at"],
+            "updated_at": session["updated_at"],
+            "similarweb_data": json.loads(session["similarweb_jsonb"]) if session["similarweb_jsonb"] else None,
+            "builtwith_data": json.loads(session["builtwith_jsonb"]) if session["builtwith_jsonb"] else None,
+            "chat_discussion": json.loads(session["chat_discussion"]) if session["chat_discussion"] else None,
+            "chat_summary": json.loads(session["chat_summary"]) if session.get("chat_summary") else None
+        }
+    
+    def user_uuid(self, user_id: str) -> str:
+        """The UUID a user's sessions are stored under (for ownership checks and index lookups)"""
+        return self._ensure_valid_uuid(user_id)
+    
     def _ensure_valid_uuid(self, user_id: str) -> str:
         """Ensure the user_id is a valid UUID, generate one if not"""
         try:
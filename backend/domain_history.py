@@ -0,0 +1,298 @@
+"""
+Per-domain time series of SimilarWeb metrics and BuiltWith technology sets
+
+Each saved ApifyResult appends one point to its domain's series. The
+SNAPSHOT_FIELDS values go into a float32 matrix (one row per observation,
+grown geometrically), and consecutive identical snapshots are collapsed.
+Technology sets are stored as diffs: one event per observation with the
+technologies added and removed since the previous one, plus the current set.
+Observations may arrive out of order; a late one is slotted in by timestamp.
+Trends and "what changed" for a domain are then a single dictionary lookup
+followed by array slicing, not a scan of stored sessions.
+"""
+
+import asyncio
+import bisect
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+from domain_metrics import SNAPSHOT_FIELDS, snapshot_metrics
+from domain_utils import normalize_domain, parse_timestamp
+from mock_data import observed_results
+from tech_index import normalize_term
+
+logger = logging.getLogger(__name__)
+
+FIELD_COLUMNS = {field: i for i, field in enumerate(SNAPSHOT_FIELDS)}
+RANK_FIELDS = ("globalRank", "countryRank", "categoryRank")
+
+
+class DomainSeries:
+    """Metric observations and technology diffs of one domain"""
+
+    __slots__ = ("times", "values", "countries", "tech_times", "tech_events", "technologies")
+
+    def __init__(self):
+        self.times: List[datetime] = []
+        self.values = np.empty((0, len(SNAPSHOT_FIELDS)), dtype=np.float32)
+        self.countries: List[Optional[str]] = []
+        self.tech_times: List[datetime] = []
+        self.tech_events: List[tuple] = []  # (added names, removed names)
+        self.technologies: Dict[str, str] = {}  # normalized -> display name
+
+    def add_metrics(self, timestamp: datetime, vector: np.ndarray, country: Optional[str]) -> bool:
+        position = bisect.bisect_right(self.times, timestamp)
+        if position and np.array_equal(self.values[position - 1], vector, equal_nan=True):
+            return False  # Same snapshot saved again (e.g. Step 1 data re-saved by Step 2)
+        count = len(self.times)
+        if count == len(self.values):
+            grown = np.empty((max(4, 2 * count), self.values.shape[1]), dtype=np.float32)
+            grown[:count] = self.values[:count]
+            self.values = grown
+        if position < count:
+            # Out-of-order observation: shift the later rows down
+            self.values[position + 1:count + 1] = self.values[position:count]
+        self.values[position] = vector
+        self.times.insert(position, timestamp)
+        self.countries.insert(position, country)
+        return True
+
+    def add_technologies(self, timestamp: datetime, names: Iterable[str]) -> bool:
+        current = {}
+        for name in names:
+            key = normalize_term(name)
+            if key:
+                current.setdefault(key, name.strip())
+        position = bisect.bisect_right(self.tech_times, timestamp)
+        if position == len(self.tech_times):
+            return self._append_technologies(timestamp, current)
+
+        # Out-of-order set: rebuild the diffs from the full sets with this one in place
+        states = self._technology_states()
+        changed = position == 0 or states[position - 1][1].keys() != current.keys()
+        states.insert(position, (timestamp, current))
+        self.tech_times, self.tech_events, self.technologies = [], [], {}
+        for state_time, state in states:
+            self._append_technologies(state_time, state)
+        return changed
+
+    def _append_technologies(self, timestamp: datetime, current: Dict[str, str]) -> bool:
+        added = tuple(sorted(current[key] for key in current.keys() - self.technologies.keys()))
+        removed = tuple(sorted(self.technologies[key] for key in self.technologies.keys() - current.keys()))
+        if self.tech_times and not added and not removed:
+            return False
+        self.tech_times.append(timestamp)
+        self.tech_events.append((added, removed))
+        self.technologies = current
+        return True
+
+    def _technology_states(self) -> List[tuple]:
+        """(timestamp, normalized -> display name) after each technology event"""
+        states, state = [], {}
+        for timestamp, (added, removed) in zip(self.tech_times, self.tech_events):
+            state = dict(state)
+            for name in removed:
+                state.pop(normalize_term(name), None)
+            for name in added:
+                state[normalize_term(name)] = name
+            states.append((timestamp, state))
+        return states
+
+    def index_at(self, timestamp: Optional[datetime]) -> int:
+        """Index of the last observation at or before timestamp (-1 if none)"""
+        if timestamp is None:
+            return len(self.times) - 1
+        return bisect.bisect_right(self.times, timestamp) - 1
+
+
+class DomainHistoryStore:
+    """Append-only per-domain history with trend and change queries"""
+
+    def __init__(self):
+        self.loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._replay: Optional[List[tuple]] = None  # Writes made while a reload runs
+        self._series: Dict[str, DomainSeries] = {}
+
+    def __len__(self) -> int:
+        return len(self._series)
+
+    def record(self, result: Any, updated_at: Optional[str] = None) -> bool:
+        """Append one ApifyResult (model or dict), including its BuiltWith technologies if present"""
+        if self._replay is not None:
+            self._replay.append((result, updated_at))
+        data = result if isinstance(result, dict) else result.model_dump()
+        domain = normalize_domain(data.get("name", ""))
+        if not domain:
+            return False
+        timestamp = parse_timestamp(updated_at)
+        series = self._series.get(domain)
+        if series is None:
+            series = self._series[domain] = DomainSeries()
+
+        values, country = snapshot_metrics(data)
+        vector = np.array([values[field] for field in SNAPSHOT_FIELDS], dtype=np.float32)
+        changed = series.add_metrics(timestamp, vector, country)
+        builtwith = data.get("builtwith_result")
+        if builtwith is not None and builtwith.get("technologies"):
+            changed |= series.add_technologies(timestamp, (t.get("name") or "" for t in builtwith["technologies"]))
+        return changed
+
+    def record_many(self, results: Iterable[Any], updated_at: Optional[str] = None) -> int:
+        return sum(1 for result in results or [] if self.record(result, updated_at))
+
+    def remove(self, domain: str):
+        self._series.pop(normalize_domain(domain), None)
+
+    def _get(self, domain: str) -> DomainSeries:
+        series = self._series.get(normalize_domain(domain))
+        if series is None or not series.times:
+            raise KeyError(domain)
+        return series
+
+    @staticmethod
+    def _fields(fields: Optional[List[str]]) -> List[str]:
+        fields = fields or SNAPSHOT_FIELDS
+        unknown = [field for field in fields if field not in FIELD_COLUMNS]
+        if unknown:
+            raise ValueError(f"Unknown fields: {', '.join(unknown)}. Fields: {', '.join(SNAPSHOT_FIELDS)}")
+        return fields
+
+    @staticmethod
+    def _time(value: Optional[str]) -> Optional[datetime]:
+        """Parse a since/until bound; ValueError if it is not an ISO timestamp"""
+        return parse_timestamp(value) if value else None
+
+    @staticmethod
+    def _clean(values: np.ndarray) -> List[Optional[float]]:
+        return [None if v != v else round(v, 6) for v in values.tolist()]
+
+    def trend(self, domain: str, fields: Optional[List[str]] = None, since: Optional[str] = None,
+              until: Optional[str] = None) -> Dict[str, Any]:
+        """Metric series and technology events between since and until (ISO timestamps)"""
+        series = self._get(domain)
+        fields = self._fields(fields)
+        since, until = self._time(since), self._time(until)
+        start = bisect.bisect_left(series.times, since) if since else 0
+        end = series.index_at(until) + 1
+        block = series.values[start:end]
+        tech_start = bisect.bisect_left(series.tech_times, since) if since else 0
+        tech_end = bisect.bisect_right(series.tech_times, until) if until else len(series.tech_times)
+        return {
+            "domain": normalize_domain(domain),
+            "timestamps": [t.isoformat() for t in series.times[start:end]],
+            "series": {field: self._clean(block[:, FIELD_COLUMNS[field]]) for field in fields},
+            "topCountry": series.countries[start:end],
+            "technology_events": [
+                {"timestamp": series.tech_times[i].isoformat(), "added": list(added), "removed": list(removed)}
+                for i, (added, removed) in enumerate(series.tech_events[tech_start:tech_end], tech_start)
+            ],
+        }
+
+    def changes(self, domain: str, since: Optional[str] = None, until: Optional[str] = None) -> Dict[str, Any]:
+        """
+        What changed between the snapshot at `since` (default: the one before the latest)
+        and the snapshot at `until` (default: the latest)
+        """
+        series = self._get(domain)
+        since, until = self._time(since), self._time(until)
+        to_index = series.index_at(until)
+        if to_index < 0:
+            raise KeyError(domain)
+        from_index = series.index_at(since) if since else to_index - 1
+        from_index = min(from_index, to_index)
+        if from_index < 0:
+            from_index = 0  # `since` predates the history: compare against the first snapshot
+
+        before = series.values[from_index]
+        after = series.values[to_index]
+        metrics = {}
+        for field, column in FIELD_COLUMNS.items():
+            old, new = float(before[column]), float(after[column])
+            if old != old or new != new or old == new:
+                continue
+            metrics[field] = {
+                "from": round(old, 6),
+                "to": round(new, 6),
+                "delta": round(new - old, 6),
+                "pct": round((new - old) / abs(old) * 100, 2) if old else None,
+            }
+        # Positive moves mean a better (numerically lower) rank
+        rank_moves = {field: -int(metrics[field]["delta"]) for field in RANK_FIELDS if field in metrics}
+
+        from_time, to_time = series.times[from_index], series.times[to_index]
+        added, removed = set(), set()
+        # Events after `from` up to `to`; the first event is the baseline set, not a change
+        lo = max(bisect.bisect_right(series.tech_times, from_time), 1)
+        hi = bisect.bisect_right(series.tech_times, to_time)
+        for event_added, event_removed in series.tech_events[lo:hi]:
+            for name in event_added:
+                if name in removed:
+                    removed.discard(name)
+                else:
+                    added.add(name)
+            for name in event_removed:
+                if name in added:
+                    added.discard(name)
+                else:
+                    removed.add(name)
+
+        return {
+            "domain": normalize_domain(domain),
+            "from": from_time.isoformat(),
+            "to": to_time.isoformat(),
+            "metrics": metrics,
+            "rank_moves": rank_moves,
+            "top_country": {"from": series.countries[from_index], "to": series.countries[to_index]},
+            "technologies_added": sorted(added),
+            "technologies_removed": sorted(removed),
+            "technologies": sorted(series.technologies.values()),
+        }
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "domains": len(self._series),
+            "snapshots": sum(len(s.times) for s in self._series.values()),
+            "technology_events": sum(len(s.tech_events) for s in self._series.values()),
+        }
+
+    async def reload(self, db) -> int:
+        """
+        Rebuild from stored sessions (oldest first) into a fresh store, then swap it in.
+        Observations are stamped with the session's created_at (its analysis time);
+        updated_at also moves when someone chats about the session. Writes that arrive
+        while the sessions are being read are recorded and replayed after the swap.
+        """
+        fresh = DomainHistoryStore()
+        sessions = 0
+        self._replay = []
+        try:
+            async for session in db.iter_sessions():
+                sessions += 1
+                fresh.record_many(observed_results(session.get("similarweb_data")), updated_at=session.get("created_at"))
+                fresh.record_many(observed_results(session.get("builtwith_data")), updated_at=session.get("created_at"))
+        finally:
+            replay, self._replay = self._replay, None
+        self._series = fresh._series
+        for result, updated_at in replay:
+            self.record(result, updated_at)
+        self.loaded = True
+        logger.info(f"[HISTORY] Loaded {len(self)} domain series from {sessions} sessions: {self.stats()}")
+        return len(self)
+
+    async def ensure_loaded(self, db):
+        """Load from stored sessions once per process"""
+        if self.loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self.loaded:
+                await self.reload(db)
+
+
+# Global domain history, appended to on every analysis write
+domain_history = DomainHistoryStore()
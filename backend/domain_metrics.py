@@ -0,0 +1,261 @@
+"""
+Columnar in-memory store of per-domain SimilarWeb metrics
+
+One NumPy array per metric (ranks, visits, engagement, traffic-source
+shares, top-country share, technology count) plus a domain dictionary
+mapping each analyzed domain to its row. Range filters are vectorized
+comparisons over whole columns, and sorting only orders the top-k rows
+(argpartition), so dashboard queries over 100k domains take milliseconds.
+Rows are replaced as new analyses are saved; the most recently analyzed
+data per domain wins (by session created_at, not updated_at, which chat
+messages bump).
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from domain_utils import normalize_domain, parse_timestamp
+from metrics_engine import TRAFFIC_CHANNELS, parse_duration
+from mock_data import observed_results
+
+logger = logging.getLogger(__name__)
+
+SCALAR_FIELDS = [
+    "globalRank", "countryRank", "categoryRank", "totalVisits", "avgVisitDuration", "pagesPerVisit",
+    "bounceRate", "organicTraffic", "paidTraffic", "companyYearFounded", "companyEmployeesMin",
+    "companyEmployeesMax",
+]
+SNAPSHOT_FIELDS = SCALAR_FIELDS + TRAFFIC_CHANNELS + ["topCountryShare"]
+NUMERIC_FIELDS = SNAPSHOT_FIELDS + ["technologyCount"]
+
+
+def _number(value: Any) -> float:
+    try:
+        return float(value) if value is not None else np.nan
+    except (TypeError, ValueError):
+        return np.nan
+
+
+def snapshot_metrics(data: Dict[str, Any]) -> Tuple[Dict[str, float], Optional[str]]:
+    """SNAPSHOT_FIELDS values (NaN when missing) and the top country of one ApifyResult dict"""
+    values = {}
+    for field in SCALAR_FIELDS:
+        value = data.get(field)
+        values[field] = parse_duration(value) if field == "avgVisitDuration" else _number(value)
+    traffic = data.get("trafficSources") or {}
+    for channel in TRAFFIC_CHANNELS:
+        values[channel] = _number(traffic.get(channel))
+
+    countries = [c for c in data.get("topCountries") or [] if c.get("countryAlpha2Code")]
+    top = max(countries, key=lambda c: c.get("visitsShare") or 0.0) if countries else None
+    values["topCountryShare"] = _number(top.get("visitsShare")) if top else np.nan
+    return values, top["countryAlpha2Code"].upper() if top else None
+
+
+class DomainMetricsStore:
+    """Filter / sort / top-k over per-domain metric columns"""
+
+    def __init__(self):
+        self.loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._replay: Optional[List[tuple]] = None  # Writes made while a reload runs
+        self._reset()
+
+    def _reset(self, capacity: int = 0):
+        self._rows: Dict[str, int] = {}
+        self._domains: List[Optional[str]] = []
+        self._names: List[Optional[str]] = []
+        self._updated: Dict[str, datetime] = {}
+        self._free: List[int] = []
+        self._countries: List[str] = []
+        self._country_codes: Dict[str, int] = {}
+        self._columns: Dict[str, np.ndarray] = {field: np.full(capacity, np.nan) for field in NUMERIC_FIELDS}
+        self._top_country = np.full(capacity, -1, dtype=np.int32)
+        self._alive = np.zeros(capacity, dtype=bool)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def capacity(self) -> int:
+        return len(self._alive)
+
+    def _grow(self):
+        # Geometric growth keeps incremental inserts amortized O(1)
+        extra = max(1024, self.capacity)
+        for field, column in self._columns.items():
+            self._columns[field] = np.concatenate([column, np.full(extra, np.nan)])
+        self._top_country = np.concatenate([self._top_country, np.full(extra, -1, dtype=np.int32)])
+        self._alive = np.concatenate([self._alive, np.zeros(extra, dtype=bool)])
+
+    def _row_for(self, domain: str) -> int:
+        row = self._rows.get(domain)
+        if row is not None:
+            return row
+        if self._free:
+            row = self._free.pop()
+        else:
+            row = len(self._domains)
+            if row >= self.capacity:
+                self._grow()
+            self._domains.append(None)
+            self._names.append(None)
+        self._rows[domain] = row
+        self._domains[row] = domain
+        self._alive[row] = True
+        return row
+
+    def _country_code(self, country: str) -> int:
+        code = self._country_codes.get(country)
+        if code is None:
+            code = self._country_codes[country] = len(self._countries)
+            self._countries.append(country)
+        return code
+
+    def update(self, result: Any, updated_at: Optional[str] = None) -> bool:
+        """Insert or replace one domain's metrics unless newer ones are already stored"""
+        if self._replay is not None:
+            self._replay.append((result, updated_at))
+        data = result if isinstance(result, dict) else result.model_dump()
+        domain = normalize_domain(data.get("name", ""))
+        if not domain:
+            return False
+        updated_at = parse_timestamp(updated_at)
+        if self._updated.get(domain, datetime.min) > updated_at:
+            return False
+
+        row = self._row_for(domain)
+        columns = self._columns
+        values, top_country = snapshot_metrics(data)
+        for field, value in values.items():
+            columns[field][row] = value
+        self._top_country[row] = self._country_code(top_country) if top_country else -1
+
+        builtwith = data.get("builtwith_result")
+        if builtwith is not None:
+            # Step 1 rows carry no BuiltWith data; keep the last known count then
+            columns["technologyCount"][row] = len(builtwith.get("technologies") or [])
+        self._names[row] = data.get("companyName")
+        self._updated[domain] = updated_at
+        return True
+
+    def update_many(self, results: Iterable[Any], updated_at: Optional[str] = None) -> int:
+        return sum(1 for result in results or [] if self.update(result, updated_at))
+
+    def remove(self, domain: str):
+        domain = normalize_domain(domain)
+        row = self._rows.pop(domain, None)
+        if row is None:
+            return
+        for column in self._columns.values():
+            column[row] = np.nan
+        self._top_country[row] = -1
+        self._alive[row] = False
+        self._domains[row] = None
+        self._names[row] = None
+        self._updated.pop(domain, None)
+        self._free.append(row)
+
+    def query(
+        self,
+        ranges: Optional[Dict[str, Tuple[Optional[float], Optional[float]]]] = None,
+        countries: Optional[List[str]] = None,
+        sort: Optional[str] = None,
+        descending: bool = True,
+        limit: int = 50,
+        offset: int = 0
+    ) -> Dict[str, Any]:
+        """
+        Domains whose metrics fall in every [min, max] range (either bound may be None),
+        optionally with one of the given top countries, sorted by one field.
+        Raises ValueError for unknown fields. Missing values never match a range and sort last.
+        """
+        for field in list(ranges or {}) + ([sort] if sort else []):
+            if field not in NUMERIC_FIELDS:
+                raise ValueError(f"Unknown field '{field}'. Fields: {', '.join(NUMERIC_FIELDS)}")
+
+        used = len(self._domains)
+        mask = self._alive[:used].copy()
+        for field, (low, high) in (ranges or {}).items():
+            column = self._columns[field][:used]
+            if low is not None:
+                mask &= column >= low
+            if high is not None:
+                mask &= column <= high
+        if countries:
+            codes = [self._country_codes[c.upper()] for c in countries if c.upper() in self._country_codes]
+            mask &= np.isin(self._top_country[:used], codes)
+
+        rows = np.flatnonzero(mask)
+        count = len(rows)
+        end = min(offset + limit, count)
+        if sort and offset < end:
+            keys = self._columns[sort][rows]
+            keys = np.where(np.isnan(keys), np.inf, -keys if descending else keys)
+            if end < count:
+                # Only the first `end` rows need ordering
+                part = np.argpartition(keys, end - 1)[:end]
+                rows = rows[part[np.argsort(keys[part], kind="stable")]]
+            else:
+                rows = rows[np.argsort(keys, kind="stable")]
+        rows = rows[offset:end]
+        return {"count": count, "domains": self._materialize(rows)}
+
+    def _materialize(self, rows: np.ndarray) -> List[Dict[str, Any]]:
+        values = {field: self._columns[field][rows].tolist() for field in NUMERIC_FIELDS}
+        codes = self._top_country[rows].tolist()
+        results = []
+        for i, row in enumerate(rows.tolist()):
+            item = {
+                "domain": self._domains[row],
+                "companyName": self._names[row],
+                "topCountry": self._countries[codes[i]] if codes[i] >= 0 else None,
+            }
+            for field in NUMERIC_FIELDS:
+                value = values[field][i]
+                item[field] = None if value != value else value  # NaN -> null
+            results.append(item)
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return {"domains": len(self._rows), "capacity": self.capacity, "countries": len(self._countries)}
+
+    async def reload(self, db) -> int:
+        """
+        Rebuild from stored sessions into a fresh store, then swap it in. Writes that
+        arrive while the sessions are being read are recorded and replayed after the swap.
+        """
+        fresh = DomainMetricsStore()
+        sessions = 0
+        self._replay = []
+        try:
+            async for session in db.iter_sessions():
+                sessions += 1
+                fresh.update_many(observed_results(session.get("similarweb_data")), updated_at=session.get("created_at"))
+                fresh.update_many(observed_results(session.get("builtwith_data")), updated_at=session.get("created_at"))
+        finally:
+            replay, self._replay = self._replay, None
+        self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ("loaded", "_load_lock", "_replay")})
+        for result, updated_at in replay:
+            self.update(result, updated_at)
+        self.loaded = True
+        logger.info(f"[DOMAIN METRICS] Loaded {len(self)} domains from {sessions} sessions")
+        return len(self)
+
+    async def ensure_loaded(self, db):
+        """Load from stored sessions once per process"""
+        if self.loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self.loaded:
+                await self.reload(db)
+
+
+# Global domain metrics store, kept current on every analysis write
+domain_metrics = DomainMetricsStore()
@@ -0,0 +1,47 @@
+"""
+Helpers for normalizing domains coming from users and upstream APIs, and
+the timestamps stored with their analyses
+"""
+
+from datetime import datetime, timezone
+from typing import Iterable, List, Optional, Union
+
+
+def normalize_domain(value: str) -> str:
+    """Lowercase a domain and strip scheme, www., path, port and trailing dots"""
+    if not value:
+        return ""
+    domain = value.strip().lower()
+    if "://" in domain:
+        domain = domain.split("://", 1)[1]
+    domain = domain.split("/", 1)[0].split("?", 1)[0].split("#", 1)[0]
+    domain = domain.split("@")[-1].split(":", 1)[0].strip(".")
+    if domain.startswith("www."):
+        domain = domain[4:]
+    return domain
+
+
+def unique_domains(values: Iterable[str]) -> List[str]:
+    """Normalize and dedupe domains, keeping the first-seen order"""
+    seen = set()
+    domains = []
+    for value in values:
+        domain = normalize_domain(value)
+        if domain and domain not in seen:
+            seen.add(domain)
+            domains.append(domain)
+    return domains
+
+
+def parse_timestamp(value: Optional[Union[str, datetime]]) -> datetime:
+    """
+    Naive UTC datetime from an ISO timestamp with or without an offset
+    (stored created_at values come both ways); now when empty.
+    Raises ValueError for anything that is not an ISO timestamp.
+    """
+    if not value:
+        return datetime.utcnow()
+    parsed = value if isinstance(value, datetime) else datetime.fromisoformat(str(value).strip())
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
@@ -0,0 +1,64 @@
+"""
+orjson-backed JSON responses
+
+FastAPI validates a `response_model` return value again and encodes dict
+responses with `jsonable_encoder` plus the stdlib encoder. Returning a
+FastJSONResponse skips both: pydantic models are dumped once by
+pydantic-core and everything else goes straight to orjson. Declare
+`response_model` on the route anyway to keep the OpenAPI schema.
+"""
+
+from typing import Any, AsyncIterator, Dict, Optional
+
+import orjson
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+
+def _default(obj: Any) -> Any:
+    if isinstance(obj, BaseModel):
+        return obj.model_dump()
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+def dumps(content: Any) -> bytes:
+    """Encode models, dicts, lists, numpy values and datetimes to JSON bytes"""
+    if isinstance(content, BaseModel):
+        # Already validated; serialize without a round trip through dicts
+        return content.__pydantic_serializer__.to_json(content)
+    return orjson.dumps(content, default=_default, option=OPTIONS)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with orjson (NaN and infinity become null)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def json_response(content: Any, status_code: int = 200, headers: Optional[dict] = None) -> FastJSONResponse:
+    return FastJSONResponse(content, status_code=status_code, headers=headers)
+
+
+async def stream_json_array(items: AsyncIterator[Any], key: str = "data", extra: Optional[Dict[str, Any]] = None) -> AsyncIterator[bytes]:
+    """
+    Encode {**extra, key: [...items], "count": n} incrementally, one item per chunk,
+    so only the item being encoded is held in memory
+    """
+    head = dumps(dict(extra or {}, **{key: []}))
+    yield head[:-2]  # Up to and including the "[" of the (last) empty list
+    count = 0
+    async for item in items:
+        yield (b"," if count else b"") + dumps(item)
+        count += 1
+    yield b'],"count":' + str(count).encode() + b"}"
+
+
+async def stream_ndjson(items: AsyncIterator[Any]) -> AsyncIterator[bytes]:
+    """One JSON document per line"""
+    async for item in items:
+        yield dumps(item) + b"\n"
@@ -0,0 +1,309 @@
+"""
+Export of a user's analysis history as normalized columnar tables
+
+Every stored ApifyResult is flattened into six tables keyed by
+(session_id, domain): domains (scalar metrics), traffic_sources, countries,
+keywords, competitors and technologies. A table is streamed as CSV, Parquet
+or an Arrow IPC stream. Sessions are read page by page and rows are written
+in row groups of EXPORT_ROW_GROUP_ROWS, so neither the history nor the
+output file is ever held in memory as a whole. Parquet and Arrow need the
+optional pyarrow package.
+
+Usage:
+    python history_export.py USER_ID [--out DIR] [--format csv|parquet|arrow] [--tables domains,keywords]
+"""
+
+import argparse
+import asyncio
+import csv
+import io
+import math
+import os
+from typing import Any, AsyncIterator, Dict, Iterable, List, Tuple
+
+from domain_utils import normalize_domain
+
+FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# Table -> [(column, type)], types: str, int, float, bool
+TABLES: Dict[str, List[tuple]] = {
+    "domains": [
+        ("session_id", "str"), ("created_at", "str"), ("domain", "str"), ("company_name", "str"),
+        ("company_year_founded", "int"), ("employees_min", "int"), ("employees_max", "int"),
+        ("global_rank", "int"), ("country_rank", "int"), ("category_rank", "int"),
+        ("total_visits", "int"), ("avg_visit_duration_s", "float"), ("pages_per_visit", "float"),
+        ("bounce_rate", "float"), ("organic_traffic", "float"), ("paid_traffic", "float"),
+        ("technology_count", "int"),
+    ],
+    "traffic_sources": [("session_id", "str"), ("domain", "str"), ("channel", "str"), ("share", "float")],
+    "countries": [
+        ("session_id", "str"), ("domain", "str"), ("country", "str"), ("share", "float"), ("share_change", "float"),
+    ],
+    "keywords": [
+        ("session_id", "str"), ("domain", "str"), ("keyword", "str"), ("volume", "int"),
+        ("estimated_value", "int"), ("cpc", "float"),
+    ],
+    "competitors": [
+        ("session_id", "str"), ("domain", "str"), ("competitor", "str"), ("affinity", "float"),
+        ("visits", "int"), ("category_rank", "int"),
+    ],
+    "technologies": [
+        ("session_id", "str"), ("domain", "str"), ("technology", "str"), ("tag", "str"),
+        ("version", "str"), ("popularity", "int"),
+    ],
+}
+
+
+def _session_items(session: Dict[str, Any]) -> List[Tuple[str, Dict[str, Any]]]:
+    """(domain, ApifyResult dict) pairs, one per domain; Step 2 rows (with BuiltWith data) win over Step 1 rows"""
+    by_domain: Dict[str, Dict[str, Any]] = {}
+    for column in ("similarweb_data", "builtwith_data"):
+        for item in session.get(column) or []:
+            domain = normalize_domain(item.get("name", ""))
+            if domain:
+                by_domain[domain] = item
+    return list(by_domain.items())
+
+
+def _coerce(value: Any, kind: str) -> Any:
+    """A stored value as the column type, or None when it cannot be one (e.g. "n/a" visits)"""
+    if value is None:
+        return None
+    if kind == "str":
+        return value if isinstance(value, str) else str(value)
+    if kind == "bool":
+        return value if isinstance(value, bool) else None
+    try:
+        number = float(value)
+    except (TypeError, ValueError):
+        return None
+    if not math.isfinite(number):
+        return None
+    return int(number) if kind == "int" else number
+
+
+def _append(rows: Dict[str, List[tuple]], table: str, values: tuple):
+    rows[table].append(tuple(_coerce(value, kind) for value, (_, kind) in zip(values, TABLES[table])))
+
+
+def _technologies(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """BuiltWith technologies of an item, first occurrence of each name only"""
+    seen = set()
+    technologies = []
+    for tech in (item.get("builtwith_result") or {}).get("technologies") or []:
+        key = (tech.get("name") or "").strip().lower()
+        if key and key not in seen:
+            seen.add(key)
+            technologies.append(tech)
+    return technologies
+
+
+def flatten_item(
+    rows: Dict[str, List[tuple]],
+    session_id: Any,
+    created_at: Any,
+    domain: str,
+    item: Dict[str, Any]
+) -> None:
+    """
+    Append one ApifyResult dict's rows to each table present in rows. Values are
+    coerced to the TABLES column types; ones that do not fit become None.
+    """
+    from metrics_engine import parse_duration
+
+    technologies = _technologies(item)
+    if "domains" in rows:
+        duration = parse_duration(item.get("avgVisitDuration"))
+        _append(rows, "domains", (
+            session_id, created_at, domain, item.get("companyName"),
+            item.get("companyYearFounded"), item.get("companyEmployeesMin"), item.get("companyEmployeesMax"),
+            item.get("globalRank"), item.get("countryRank"), item.get("categoryRank"),
+            item.get("totalVisits"), duration, item.get("pagesPerVisit"),
+            item.get("bounceRate"), item.get("organicTraffic"), item.get("paidTraffic"),
+            len(technologies),
+        ))
+    if "traffic_sources" in rows:
+        for channel, share in (item.get("trafficSources") or {}).items():
+            _append(rows, "traffic_sources", (session_id, domain, channel.replace("VisitsShare", ""), share))
+    if "countries" in rows:
+        for country in item.get("topCountries") or []:
+            _append(rows, "countries", (
+                session_id, domain, country.get("countryAlpha2Code"), country.get("visitsShare"),
+                country.get("visitsShareChange"),
+            ))
+    if "keywords" in rows:
+        for keyword in item.get("topKeywords") or []:
+            _append(rows, "keywords", (
+                session_id, domain, keyword.get("name"), keyword.get("volume"),
+                keyword.get("estimatedValue"), keyword.get("cpc"),
+            ))
+    if "competitors" in rows:
+        for competitor in item.get("topSimilarityCompetitors") or []:
+            _append(rows, "competitors", (
+                session_id, domain, normalize_domain(competitor.get("domain", "")), competitor.get("affinity"),
+                competitor.get("visitsTotalCount"), competitor.get("categoryRank"),
+            ))
+    if "technologies" in rows:
+        for tech in technologies:
+            _append(rows, "technologies", (
+                session_id, domain, tech.get("name").strip(), tech.get("tag"), tech.get("version"), tech.get("popularity"),
+            ))
+
+
+def flatten_session(session: Dict[str, Any], tables: Iterable[str] = TABLES) -> Dict[str, List[tuple]]:
+    """Rows (tuples in TABLES column order) of the requested tables for one parsed session"""
+    rows: Dict[str, List[tuple]] = {name: [] for name in tables}
+    for domain, item in _session_items(session):
+        flatten_item(rows, session.get("id"), session.get("created_at"), domain, item)
+    return rows
+
+
+def pyarrow_available() -> bool:
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands written bytes back to the caller after each row group"""
+
+    def __init__(self):
+        self.chunks: List[bytes] = []
+        self.position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self.chunks.append(data)
+        self.position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self.position
+
+    def drain(self) -> bytes:
+        data = b"".join(self.chunks)
+        self.chunks = []
+        return data
+
+
+class _CSVEncoder:
+    def __init__(self, table: str):
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.writer.writerow([name for name, _ in TABLES[table]])
+
+    def write(self, rows: List[tuple]) -> bytes:
+        self.writer.writerows(rows)
+        data = self.buffer.getvalue().encode("utf-8")
+        self.buffer.seek(0)
+        self.buffer.truncate()
+        return data
+
+    def close(self) -> bytes:
+        return self.write([])
+
+
+class _ArrowEncoder:
+    """Parquet file or Arrow IPC stream, one row group / record batch per write"""
+
+    TYPES = {"str": "string", "int": "int64", "float": "float64", "bool": "bool_"}
+
+    def __init__(self, table: str, fmt: str):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        self.pa = pa
+        self.columns = TABLES[table]
+        self.schema = pa.schema([(name, getattr(pa, self.TYPES[kind])()) for name, kind in self.columns])
+        self.sink = _ChunkSink()
+        if fmt == "parquet":
+            self.writer = pq.ParquetWriter(self.sink, self.schema, compression="zstd")
+        else:
+            self.writer = pa.ipc.new_stream(self.sink, self.schema)
+
+    def write(self, rows: List[tuple]) -> bytes:
+        if rows:
+            arrays = [
+                self.pa.array([row[i] for row in rows], type=field.type)
+                for i, field in enumerate(self.schema)
+            ]
+            self.writer.write_table(self.pa.Table.from_arrays(arrays, schema=self.schema))
+        return self.sink.drain()
+
+    def close(self) -> bytes:
+        self.writer.close()
+        return self.sink.drain()
+
+
+async def stream_table(
+    sessions: AsyncIterator[Dict[str, Any]],
+    table: str,
+    fmt: str = "csv",
+    row_group_rows: int = 10000
+) -> AsyncIterator[bytes]:
+    """Encode one table over all sessions, flushing a row group every row_group_rows rows"""
+    encoder = _CSVEncoder(table) if fmt == "csv" else _ArrowEncoder(table, fmt)
+    pending: List[tuple] = []
+    async for session in sessions:
+        pending.extend(flatten_session(session, (table,))[table])
+        if len(pending) >= row_group_rows:
+            yield encoder.write(pending)
+            pending = []
+    chunk = encoder.write(pending)
+    if chunk:
+        yield chunk
+    yield encoder.close()
+
+
+async def export_to_files(user_id: str, out_dir: str, fmt: str, tables: Iterable[str], row_group_rows: int) -> Dict[str, int]:
+    """Write each table to out_dir; returns bytes written per file"""
+    from config import config
+    from database_service import db_service
+
+    os.makedirs(out_dir, exist_ok=True)
+    written = {}
+    for table in tables:
+        path = os.path.join(out_dir, f"{table}.{FORMATS[fmt][1]}")
+        sessions = db_service.iter_user_history(user_id, page_size=config.history_page_size)
+        size = 0
+        with open(path, "wb") as handle:
+            async for chunk in stream_table(sessions, table, fmt, row_group_rows):
+                handle.write(chunk)
+                size += len(chunk)
+        written[os.path.basename(path)] = size
+        print(f"[EXPORT] Wrote {path} ({size} bytes)")
+    return written
+
+
+def main():
+    from config import config
+
+    parser = argparse.ArgumentParser(description="Export a user's analysis history as columnar tables")
+    parser.add_argument("user_id")
+    parser.add_argument("--out", default="export", help="Output directory")
+    parser.add_argument("--format", choices=list(FORMATS), default="parquet" if pyarrow_available() else "csv")
+    parser.add_argument("--tables", default=",".join(TABLES), help=f"Comma-separated subset of: {', '.join(TABLES)}")
+    parser.add_argument("--row-group-rows", type=int, default=config.export_row_group_rows)
+    args = parser.parse_args()
+
+    tables = [t.strip() for t in args.tables.split(",") if t.strip()]
+    unknown = [t for t in tables if t not in TABLES]
+    if unknown:
+        parser.error(f"Unknown tables: {', '.join(unknown)}")
+    if args.format != "csv" and not pyarrow_available():
+        parser.error(f"--format {args.format} needs pyarrow (pip install pyarrow); use --format csv")
+
+    asyncio.run(export_to_files(args.user_id, args.out, args.format, tables, max(1, args.row_group_rows)))
+
+
+if __name__ == "__main__":
+    main()
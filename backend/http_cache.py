@@ -0,0 +1,60 @@
+"""
+Strong ETags and conditional GET helpers
+
+Session and history documents change only when a session is written, and
+every write bumps `updated_at`. An ETag built from the session ids and
+their `updated_at` values can therefore be checked against `If-None-Match`
+with a cheap id/updated_at query, and a 304 returned before the JSON
+columns are loaded, parsed or serialized.
+"""
+
+import hashlib
+from typing import Any, Dict, Iterable, Optional
+
+from fastapi import Response
+
+# Suffixes CompressionMiddleware adds to the ETag of an encoded representation
+ENCODING_SUFFIXES = ("-br", "-gzip")
+
+
+def make_etag(*parts: Any) -> str:
+    """Quoted strong ETag over the given version parts"""
+    digest = hashlib.blake2b("|".join(str(part) for part in parts).encode("utf-8"), digest_size=12)
+    return f'"{digest.hexdigest()}"'
+
+
+def session_etag(session_id: str, updated_at: Optional[str]) -> str:
+    return make_etag("session", session_id, updated_at)
+
+
+def history_etag(scope: str, user_id: str, limit: int, sessions: Iterable[Dict[str, Any]]) -> str:
+    """ETag of a history listing from the (id, updated_at) of the sessions in it"""
+    return make_etag(scope, user_id, limit, *(f"{s.get('id')}@{s.get('updated_at')}" for s in sessions))
+
+
+def _strip(tag: str) -> str:
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    for suffix in ENCODING_SUFFIXES:
+        if tag.endswith(suffix + '"'):
+            return tag[:-len(suffix) - 1] + '"'
+    return tag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """If-None-Match check (weak comparison, as RFC 9110 requires for GET)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(_strip(tag) == etag for tag in if_none_match.split(","))
+
+
+def cache_headers(etag: str) -> Dict[str, str]:
+    # Clients may store the document but must revalidate before reusing it
+    return {"ETag": etag, "Cache-Control": "private, no-cache"}
+
+
+def not_modified(etag: str) -> Response:
+    return Response(status_code=304, headers=cache_headers(etag))
@@ -0,0 +1,311 @@
+"""
+Keyword overlap and gap analysis across analyzed domains
+
+Keywords and domains are interned to integer ids and stored in hashed
+inverted indexes (keyword -> domains and domain -> keywords), so shared,
+unique and gap queries cost time proportional to the keywords touched,
+not to the number of domain pairs. The global index is loaded once from
+stored sessions and kept current by the database write hooks; each user's
+analyzed domains are tracked so queries can be scoped to one user.
+"""
+
+import asyncio
+import heapq
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from domain_utils import normalize_domain, parse_timestamp
+from mock_data import observed_results
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_keyword(keyword: str) -> str:
+    """Lowercase and collapse whitespace so "Ooredoo  Tunisie" == "ooredoo tunisie" """
+    return " ".join((keyword or "").lower().split())
+
+
+class KeywordIndex:
+    """Inverted keyword index over the topKeywords of many domains"""
+
+    def __init__(self):
+        self.loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._replay: Optional[List[tuple]] = None  # Writes made while a reload runs
+        self._updated: Dict[int, datetime] = {}  # domain id -> analysis time of the indexed data
+        self._user_domains: Dict[str, Set[int]] = defaultdict(set)
+        self._domain_ids: Dict[str, int] = {}
+        self._domains: List[str] = []
+        self._keyword_ids: Dict[str, int] = {}
+        self._keywords: List[str] = []
+        # keyword id -> domain id -> keyword metrics for that domain
+        self._postings: Dict[int, Dict[int, Dict[str, float]]] = defaultdict(dict)
+        # domain id -> keyword ids
+        self._domain_keywords: Dict[int, Set[int]] = defaultdict(set)
+
+    def __len__(self) -> int:
+        return len(self._domain_keywords)
+
+    def _domain_id(self, domain: str) -> int:
+        if domain not in self._domain_ids:
+            self._domain_ids[domain] = len(self._domains)
+            self._domains.append(domain)
+        return self._domain_ids[domain]
+
+    def _keyword_id(self, keyword: str) -> int:
+        if keyword not in self._keyword_ids:
+            self._keyword_ids[keyword] = len(self._keywords)
+            self._keywords.append(keyword)
+        return self._keyword_ids[keyword]
+
+    def add_domain(self, domain: str, keywords: Iterable[Dict[str, Any]]):
+        """Index (or re-index) the keywords of one domain"""
+        domain = normalize_domain(domain)
+        if not domain:
+            return
+        domain_id = self._domain_id(domain)
+        self.remove_domain(domain)
+
+        for keyword in keywords or []:
+            if not isinstance(keyword, dict):
+                keyword = keyword.model_dump()
+            name = normalize_keyword(keyword.get("name", ""))
+            if not name:
+                continue
+            keyword_id = self._keyword_id(name)
+            self._postings[keyword_id][domain_id] = {
+                "volume": float(keyword.get("volume") or 0),
+                "cpc": float(keyword.get("cpc") or 0),
+                "estimatedValue": float(keyword.get("estimatedValue") or 0)
+            }
+            self._domain_keywords[domain_id].add(keyword_id)
+
+    def remove_domain(self, domain: str):
+        domain_id = self._domain_ids.get(normalize_domain(domain))
+        if domain_id is None:
+            return
+        for keyword_id in self._domain_keywords.pop(domain_id, set()):
+            self._postings[keyword_id].pop(domain_id, None)
+            if not self._postings[keyword_id]:
+                del self._postings[keyword_id]
+
+    def remove(self, domain: str):
+        """Drop a domain's keywords, analysis time and user links (e.g. after its session is deleted)"""
+        domain_id = self._domain_ids.get(normalize_domain(domain))
+        if domain_id is None:
+            return
+        self.remove_domain(domain)
+        self._updated.pop(domain_id, None)
+        for user_domains in self._user_domains.values():
+            user_domains.discard(domain_id)
+
+    def add_results(self, results: Iterable[Any]):
+        """Index a list of ApifyResult objects or their dict form"""
+        for result in results or []:
+            if not isinstance(result, dict):
+                result = result.model_dump()
+            self.add_domain(result.get("name", ""), result.get("topKeywords") or [])
+
+    def update(self, result: Any, updated_at: Optional[str] = None, user_id: Optional[str] = None) -> bool:
+        """Index one ApifyResult for a user unless newer keywords are already indexed for its domain"""
+        if self._replay is not None:
+            self._replay.append((result, updated_at, user_id))
+        if not isinstance(result, dict):
+            result = result.model_dump()
+        domain = normalize_domain(result.get("name", ""))
+        if not domain:
+            return False
+        domain_id = self._domain_id(domain)
+        if user_id:
+            self._user_domains[user_id].add(domain_id)
+        updated_at = parse_timestamp(updated_at)
+        if self._updated.get(domain_id, datetime.min) > updated_at:
+            return False
+        self.add_domain(domain, result.get("topKeywords") or [])
+        self._updated[domain_id] = updated_at
+        return True
+
+    def update_many(self, results: Iterable[Any], updated_at: Optional[str] = None, user_id: Optional[str] = None) -> int:
+        return sum(1 for result in results or [] if self.update(result, updated_at, user_id))
+
+    def domains(self) -> List[str]:
+        return [self._domains[d] for d in self._domain_keywords]
+
+    def user_domains(self, user_id: str) -> List[str]:
+        """Domains the user has analyzed (empty if none)"""
+        return [self._domains[d] for d in self._user_domains.get(user_id, ()) if d in self._domain_keywords]
+
+    def _resolve(self, domains: Optional[Iterable[str]]) -> List[int]:
+        """Domain ids for the given names, or every indexed domain"""
+        if not domains:
+            return list(self._domain_keywords)
+        ids = []
+        for domain in domains:
+            domain_id = self._domain_ids.get(normalize_domain(domain))
+            if domain_id is not None and domain_id in self._domain_keywords:
+                ids.append(domain_id)
+        return ids
+
+    def _entry(self, keyword_id: int, domain_ids: Set[int]) -> Dict[str, Any]:
+        # Walk the (short) posting list, not the candidate domain set
+        postings = self._postings[keyword_id]
+        per_domain = {self._domains[d]: m for d, m in postings.items() if d in domain_ids}
+        return {
+            "keyword": self._keywords[keyword_id],
+            "domains": sorted(per_domain),
+            "volume": max((m["volume"] for m in per_domain.values()), default=0),
+            "estimatedValue": max((m["estimatedValue"] for m in per_domain.values()), default=0),
+            "cpc": max((m["cpc"] for m in per_domain.values()), default=0)
+        }
+
+    @staticmethod
+    def _score(entry: Dict[str, Any], weight: float) -> float:
+        """Blend search volume (weight) and estimated value (1 - weight)"""
+        return weight * entry["volume"] + (1 - weight) * entry["estimatedValue"]
+
+    def _top(self, factors: Dict[int, float], domain_ids: Set[int], weight: float, limit: int) -> List[Dict[str, Any]]:
+        """Score candidate keywords from their postings and build entries for the top `limit` only"""
+        def score(item):
+            keyword_id, factor = item
+            postings = self._postings[keyword_id]
+            volume = max((m["volume"] for d, m in postings.items() if d in domain_ids), default=0)
+            value = max((m["estimatedValue"] for d, m in postings.items() if d in domain_ids), default=0)
+            return factor * (weight * volume + (1 - weight) * value)
+
+        entries = []
+        for keyword_id, factor in heapq.nlargest(limit, factors.items(), key=score):
+            entry = self._entry(keyword_id, domain_ids)
+            entry["score"] = round(self._score(entry, weight) * factor, 2)
+            entries.append(entry)
+        return entries
+
+    def shared(
+        self,
+        domains: Optional[Iterable[str]] = None,
+        min_domains: int = 2,
+        weight: float = 0.5,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Keywords that at least `min_domains` of the given domains rank for"""
+        domain_ids = set(self._resolve(domains))
+        counts = Counter()
+        for domain_id in domain_ids:
+            counts.update(self._domain_keywords[domain_id])
+
+        factors = {k: count for k, count in counts.items() if count >= min_domains}
+        return self._top(factors, domain_ids, weight, limit)
+
+    def unique(
+        self,
+        domain: str,
+        among: Optional[Iterable[str]] = None,
+        weight: float = 0.5,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """Keywords only `domain` ranks for, within `among` (default: the whole index)"""
+        target = self._resolve([domain])
+        if not target:
+            return []
+        target_id = target[0]
+        others = set(self._resolve(among)) - {target_id} if among else None
+
+        entries = []
+        for keyword_id in self._domain_keywords[target_id]:
+            postings = self._postings[keyword_id]
+            if others is None:
+                is_unique = len(postings) == 1
+            else:
+                is_unique = not any(d in others for d in postings)
+            if is_unique:
+                entry = self._entry(keyword_id, {target_id})
+                entry["score"] = round(self._score(entry, weight), 2)
+                entries.append(entry)
+        entries.sort(key=lambda e: e["score"], reverse=True)
+        return entries[:limit]
+
+    def gap(
+        self,
+        domain: str,
+        competitors: Optional[Iterable[str]] = None,
+        weight: float = 0.5,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        Keywords the competitors rank for but `domain` does not.
+        Score = blended volume/value x share of competitors that rank for it.
+        """
+        target = self._resolve([domain])
+        target_keywords = self._domain_keywords[target[0]] if target else set()
+        competitor_ids = {d for d in self._resolve(competitors) if not target or d != target[0]}
+        if not competitor_ids:
+            return []
+
+        counts = Counter()
+        for competitor_id in competitor_ids:
+            counts.update(self._domain_keywords[competitor_id] - target_keywords)
+
+        factors = {k: count / len(competitor_ids) for k, count in counts.items()}
+        entries = self._top(factors, competitor_ids, weight, limit)
+        for entry in entries:
+            entry["coverage"] = round(len(entry["domains"]) / len(competitor_ids), 4)
+        return entries
+
+    def stats(self) -> Dict[str, int]:
+        return {"domains": len(self._domain_keywords), "keywords": len(self._postings)}
+
+    async def reload(self, db) -> int:
+        """
+        Rebuild from stored sessions into a fresh index, then swap it in. Writes that
+        arrive while the sessions are being read are recorded and replayed after the swap.
+        """
+        fresh = KeywordIndex()
+        sessions = 0
+        self._replay = []
+        try:
+            async for session in db.iter_sessions():
+                sessions += 1
+                fresh.update_many(
+                    observed_results(session.get("similarweb_data")), updated_at=session.get("created_at"),
+                    user_id=session.get("user_id")
+                )
+        finally:
+            replay, self._replay = self._replay, None
+        self.__dict__.update({k: v for k, v in fresh.__dict__.items() if k not in ("loaded", "_load_lock", "_replay")})
+        for result, updated_at, user_id in replay:
+            self.update(result, updated_at, user_id)
+        self.loaded = True
+        logger.info(f"[KEYWORDS] Indexed {self.stats()} from {sessions} sessions")
+        return len(self)
+
+    async def ensure_loaded(self, db):
+        """Load from stored sessions once per process"""
+        if self.loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self.loaded:
+                await self.reload(db)
+
+
+def build_keyword_index(sessions: Iterable[Dict[str, Any]]) -> KeywordIndex:
+    """
+    Build an index from parsed sessions (newest first, as returned by the
+    database service). A domain seen in several sessions keeps its newest data.
+    """
+    index = KeywordIndex()
+    seen = set()
+    for session in sessions:
+        for result in observed_results(session.get("similarweb_data")):
+            domain = normalize_domain(result.get("name", ""))
+            if domain and domain not in seen:
+                seen.add(domain)
+                index.add_domain(domain, result.get("topKeywords") or [])
+    logger.info(f"[KEYWORDS] Indexed {index.stats()}")
+    return index
+
+
+# Global keyword index over every analyzed domain, kept current on analysis writes
+keyword_index = KeywordIndex()
@@ -2,15 +2,21 @@
 Main application file for the BuiltWith Analyzer API
 """
 
+import asyncio
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from routes import router
-from middleware import LoggingMiddleware
+from routes import refresh_scheduler, router
+from middleware import CompressionMiddleware, LoggingMiddleware
 from config import config
+from database_service import db_service
+from domain_history import domain_history
+from domain_metrics import domain_metrics
+from fast_json import FastJSONResponse
 
 # Create FastAPI app
-app = FastAPI(title="BuiltWith Analyzer API", version="1.0.0")
+app = FastAPI(title="BuiltWith Analyzer API", version="1.0.0", default_response_class=FastJSONResponse)
 
 # Add CORS middleware first
 app.add_middleware(
@@ -26,12 +32,26 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress large JSON bodies; added after CORS so it wraps it, and logging wraps both
+# (the last middleware added is the outermost)
+app.add_middleware(CompressionMiddleware, min_size=config.compression_min_size)
+
 # Add logging middleware after CORS
 app.add_middleware(LoggingMiddleware)
 
 # Include routes
 app.include_router(router)
 
+
+@app.on_event("startup")
+async def start_background_work():
+    """Fill the domain metrics and history stores in the background so startup is not delayed,
+    and start the tracked-domain refresh loop when enabled"""
+    asyncio.create_task(domain_metrics.ensure_loaded(db_service))
+    asyncio.create_task(domain_history.ensure_loaded(db_service))
+    if config.refresh_enabled:
+        refresh_scheduler.start()
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
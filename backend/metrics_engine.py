@@ -0,0 +1,278 @@
+"""
+Deterministic competitive-metrics engine
+
+Turns N sites' SimilarWeb data into NumPy arrays and computes rankings,
+deltas, shares and z-scores locally, so comparisons do not depend on the LLM
+doing arithmetic.
+"""
+
+import logging
+import warnings
+from typing import Any, Dict, List, Union
+
+import numpy as np
+
+from models import ApifyResult, TrafficSources
+
+logger = logging.getLogger(__name__)
+
+# metric name -> True when a higher value is better
+SCALAR_METRICS = {
+    "globalRank": False,
+    "countryRank": False,
+    "totalVisits": True,
+    "avgVisitDuration": True,
+    "pagesPerVisit": True,
+    "bounceRate": False,
+    "organicTraffic": True,
+    "paidTraffic": True,
+}
+
+TRAFFIC_CHANNELS = list(TrafficSources.model_fields.keys())
+
+CHANNEL_LABELS = {
+    "directVisitsShare": "direct",
+    "organicSearchVisitsShare": "organic search",
+    "referralVisitsShare": "referrals",
+    "socialNetworksVisitsShare": "social networks",
+    "mailVisitsShare": "email",
+    "paidSearchVisitsShare": "paid search",
+    "adsVisitsShare": "display ads",
+}
+
+
+def parse_duration(value: Any) -> float:
+    """Convert "4:17" / "00:04:17" / seconds into seconds"""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if not value or not isinstance(value, str):
+        return np.nan
+    try:
+        seconds = 0.0
+        for part in value.strip().split(":"):
+            seconds = seconds * 60 + float(part)
+        return seconds
+    except ValueError:
+        return np.nan
+
+
+class CompetitiveMetricsEngine:
+    """Vectorized comparison of ApifyResult records"""
+
+    def _as_dicts(self, sites: List[Union[ApifyResult, Dict[str, Any]]]) -> List[Dict[str, Any]]:
+        return [site.model_dump() if isinstance(site, ApifyResult) else dict(site) for site in sites]
+
+    def _build_arrays(self, sites: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """Pack the per-site fields into (N,), (N, channels) and (N, countries) arrays"""
+        n = len(sites)
+        scalars = np.full((len(SCALAR_METRICS), n), np.nan)
+        for j, site in enumerate(sites):
+            for i, metric in enumerate(SCALAR_METRICS):
+                value = site.get(metric)
+                if metric == "avgVisitDuration":
+                    scalars[i, j] = parse_duration(value)
+                elif isinstance(value, (int, float)):
+                    scalars[i, j] = value
+
+        sources = np.zeros((n, len(TRAFFIC_CHANNELS)))
+        for j, site in enumerate(sites):
+            traffic = site.get("trafficSources") or {}
+            sources[j] = [float(traffic.get(channel) or 0.0) for channel in TRAFFIC_CHANNELS]
+
+        country_codes = sorted({
+            country.get("countryAlpha2Code")
+            for site in sites
+            for country in (site.get("topCountries") or [])
+            if country.get("countryAlpha2Code")
+        })
+        column = {code: k for k, code in enumerate(country_codes)}
+        countries = np.zeros((n, len(country_codes)))
+        for j, site in enumerate(sites):
+            for country in site.get("topCountries") or []:
+                code = country.get("countryAlpha2Code")
+                if code in column:
+                    countries[j, column[code]] = float(country.get("visitsShare") or 0.0)
+
+        return {"scalars": scalars, "sources": sources, "countries": countries, "country_codes": country_codes}
+
+    def compare(self, sites: List[Union[ApifyResult, Dict[str, Any]]]) -> Dict[str, Any]:
+        """Compute rankings, deltas, shares and z-scores for all sites in one pass"""
+        sites = self._as_dicts(sites)
+        domains = [site.get("name", f"site-{i}") for i, site in enumerate(sites)]
+        if not sites:
+            return {"domains": [], "metrics": {}, "traffic_sources": {}, "countries": {}, "facts": []}
+
+        arrays = self._build_arrays(sites)
+        scalars = arrays["scalars"]
+        higher_better = np.array(list(SCALAR_METRICS.values()))
+
+        # Orient every metric so larger == better, missing values sort last
+        oriented = np.where(higher_better[:, None], scalars, -scalars)
+        oriented = np.where(np.isnan(oriented), -np.inf, oriented)
+        order = np.argsort(-oriented, axis=1, kind="stable")
+        ranks = np.empty_like(order)
+        rows = np.arange(order.shape[0])[:, None]
+        ranks[rows, order] = np.arange(1, len(sites) + 1)
+
+        with np.errstate(invalid="ignore", divide="ignore"), warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)
+            means = np.nanmean(scalars, axis=1, keepdims=True)
+            stds = np.nanstd(scalars, axis=1, keepdims=True)
+            zscores = np.where(stds > 0, (scalars - means) / stds, 0.0)
+        best_idx = order[:, 0]
+        best = scalars[rows[:, 0], best_idx][:, None]
+        delta_best = scalars - best
+        delta_mean = scalars - means
+
+        sources = arrays["sources"]
+        source_totals = sources.sum(axis=1, keepdims=True)
+        source_shares = np.divide(sources, source_totals, out=np.zeros_like(sources), where=source_totals > 0)
+
+        visits = np.nan_to_num(scalars[list(SCALAR_METRICS).index("totalVisits")])
+        visit_share = visits / visits.sum() if visits.sum() > 0 else np.zeros_like(visits)
+
+        organic = np.nan_to_num(scalars[list(SCALAR_METRICS).index("organicTraffic")])
+        paid = np.nan_to_num(scalars[list(SCALAR_METRICS).index("paidTraffic")])
+        search_total = organic + paid
+        organic_share = np.divide(organic, search_total, out=np.zeros_like(organic), where=search_total > 0)
+
+        countries = arrays["countries"]
+        # Estimated visits per country = share * total visits
+        country_visits = countries * visits[:, None]
+
+        metrics = {}
+        for i, metric in enumerate(SCALAR_METRICS):
+            values = scalars[i]
+            metrics[metric] = {
+                "higher_is_better": bool(higher_better[i]),
+                "values": self._to_list(values),
+                "rank": ranks[i].tolist(),
+                "zscore": self._to_list(zscores[i], 3),
+                "delta_vs_best": self._to_list(delta_best[i], 4),
+                "delta_vs_mean": self._to_list(delta_mean[i], 4),
+                "mean": self._to_float(means[i, 0]),
+                "best": domains[best_idx[i]] if not np.isnan(values[best_idx[i]]) else None,
+            }
+
+        result = {
+            "domains": domains,
+            "metrics": metrics,
+            "visit_share": dict(zip(domains, self._to_list(visit_share, 4))),
+            "organic_search_share": dict(zip(domains, self._to_list(organic_share, 4))),
+            "traffic_sources": {
+                "channels": TRAFFIC_CHANNELS,
+                "shares": {
+                    domain: dict(zip(TRAFFIC_CHANNELS, self._to_list(source_shares[j], 4)))
+                    for j, domain in enumerate(domains)
+                },
+                "leader_by_channel": {
+                    channel: domains[j] for channel, j in zip(TRAFFIC_CHANNELS, source_shares.argmax(axis=0))
+                },
+                "dominant_channel": {
+                    domain: TRAFFIC_CHANNELS[k] for domain, k in zip(domains, source_shares.argmax(axis=1))
+                },
+            },
+            "countries": {
+                "codes": arrays["country_codes"],
+                "leader_by_country": {
+                    code: domains[j]
+                    for code, j in zip(arrays["country_codes"], country_visits.argmax(axis=0))
+                },
+                "estimated_visits": {
+                    domain: dict(zip(arrays["country_codes"], self._to_list(country_visits[j], 0)))
+                    for j, domain in enumerate(domains)
+                },
+            },
+        }
+        result["facts"] = self._facts(result)
+        return result
+
+    def facts(self, sites: List[Union[ApifyResult, Dict[str, Any]]]) -> List[str]:
+        """Short, precomputed comparison statements for the chat prompt"""
+        if len(sites) < 2:
+            return []
+        return self.compare(sites)["facts"]
+
+    def _facts(self, result: Dict[str, Any]) -> List[str]:
+        domains = result["domains"]
+        if len(domains) < 2:
+            return []
+
+        facts = []
+        labels = {
+            "globalRank": "best global rank",
+            "totalVisits": "most monthly visits",
+            "avgVisitDuration": "longest average visit",
+            "pagesPerVisit": "most pages per visit",
+            "bounceRate": "lowest bounce rate",
+            "organicTraffic": "most organic search traffic",
+            "paidTraffic": "most paid search traffic",
+        }
+        for metric, label in labels.items():
+            data = result["metrics"][metric]
+            if data["best"] is None:
+                continue
+            value = data["values"][domains.index(data["best"])]
+            # Exact ties share the lead; when every site ties there is no leader to name
+            leaders = [d for d, v in zip(domains, data["values"]) if v == value]
+            if len(leaders) == len(domains):
+                continue
+            verb = "has" if len(leaders) == 1 else "share"
+            facts.append(
+                f"{self._join(leaders)} {verb} the {label} ({self._format(metric, value)}; "
+                f"average {self._format(metric, data['mean'])})"
+            )
+
+        shares = result["traffic_sources"]["shares"]
+        for domain, channel in result["traffic_sources"]["dominant_channel"].items():
+            share = shares[domain][channel]
+            if share > 0:
+                top = [self._channel(c) for c, s in shares[domain].items() if s == share]
+                facts.append(f"{domain} gets most traffic from {self._join(top)} ({share * 100:.1f}% each)"
+                             if len(top) > 1 else
+                             f"{domain} gets most traffic from {top[0]} ({share * 100:.1f}%)")
+
+        for channel, domain in result["traffic_sources"]["leader_by_channel"].items():
+            share = shares[domain][channel]
+            leaders = [d for d in domains if shares[d][channel] == share]
+            if share > 0 and len(leaders) < len(domains):
+                verb = "leads" if len(leaders) == 1 else "share the lead"
+                facts.append(f"{self._join(leaders)} {verb} on {self._channel(channel)} share ({share * 100:.1f}%)")
+
+        for domain, share in result["visit_share"].items():
+            facts.append(f"{domain} has {share * 100:.1f}% of the combined visits of the compared sites")
+
+        return facts
+
+    @staticmethod
+    def _join(names: List[str]) -> str:
+        return names[0] if len(names) == 1 else ", ".join(names[:-1]) + " and " + names[-1]
+
+    @staticmethod
+    def _channel(channel: str) -> str:
+        return CHANNEL_LABELS.get(channel, channel)
+
+    @staticmethod
+    def _format(metric: str, value: Any) -> str:
+        if value is None:
+            return "N/A"
+        if metric == "bounceRate":
+            return f"{value * 100:.1f}%" if value <= 1 else f"{value:.1f}%"
+        if metric == "avgVisitDuration":
+            return f"{int(value) // 60}:{int(value) % 60:02d}"
+        if metric in ("globalRank", "countryRank"):
+            return f"#{int(value):,}"
+        if metric == "pagesPerVisit":
+            return f"{value:.2f}"
+        return f"{value:,.0f}"
+
+    @staticmethod
+    def _to_float(value: float, digits: int = 4):
+        return None if np.isnan(value) else round(float(value), digits)
+
+    def _to_list(self, values: np.ndarray, digits: int = 4) -> List:
+        return [self._to_float(v, digits) for v in values]
+
+
+# Global metrics engine instance
+metrics_engine = CompetitiveMetricsEngine()
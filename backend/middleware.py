@@ -2,13 +2,24 @@
 Middleware for the BuiltWith Analyzer API
 """
 
+import gzip
 import time
 import logging
+from typing import Optional
 from fastapi import Request, Response
+from starlette.datastructures import Headers, MutableHeaders
 from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # Optional: gzip only
+    brotli = None
 
 logger = logging.getLogger(__name__)
 
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
 
 class LoggingMiddleware(BaseHTTPMiddleware):
     """Middleware to log all HTTP requests and responses"""
@@ -43,3 +54,105 @@ class LoggingMiddleware(BaseHTTPMiddleware):
             logger.error(f"[ERROR] Error in middleware: {e}")
             logger.error(f"   Processing time: {process_time:.3f}s")
             raise
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Best supported content coding from an Accept-Encoding header: "br", "gzip" or None"""
+    accepted = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        if params.strip().startswith("q="):
+            try:
+                q = float(params.strip()[2:])
+            except ValueError:
+                q = 0.0
+        accepted[name.strip()] = q
+    wildcard = accepted.get("*", 0.0)
+    for name in (("br", "gzip") if brotli else ("gzip",)):
+        if accepted.get(name, wildcard) > 0:
+            return name
+    return None
+
+
+class CompressionMiddleware:
+    """
+    Negotiated brotli/gzip compression for complete responses of at least min_size bytes.
+    Streamed responses (e.g. NDJSON) pass through untouched so lines are not held back.
+    """
+
+    def __init__(self, app: ASGIApp, min_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 5):
+        self.app = app
+        self.min_size = min_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+
+        start: Optional[Message] = None
+        passthrough = False
+
+        async def send_compressed(message: Message):
+            nonlocal start, passthrough
+            if passthrough:
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                if message["status"] == 304:
+                    self._tag_not_modified(message, request_headers.get("if-none-match", ""), encoding)
+                    passthrough = True
+                    await send(message)
+                    return
+                start = message  # Held until the first body chunk shows whether to compress
+                return
+
+            headers = MutableHeaders(scope=start)
+            content_type = headers.get("content-type", "")
+            if content_type.startswith(COMPRESSIBLE_TYPES):
+                headers.add_vary_header("Accept-Encoding")
+            body = message.get("body", b"")
+            if (
+                message.get("more_body", False)
+                or encoding is None
+                or len(body) < self.min_size
+                or "content-encoding" in headers
+                or not content_type.startswith(COMPRESSIBLE_TYPES)
+            ):
+                passthrough = True
+                await send(start)
+                await send(message)
+                return
+
+            if encoding == "br":
+                body = brotli.compress(body, quality=self.brotli_quality)
+            else:
+                body = gzip.compress(body, compresslevel=self.gzip_level)
+            headers["Content-Encoding"] = encoding
+            headers["Content-Length"] = str(len(body))
+            etag = headers.get("etag")
+            if etag and etag.endswith('"'):
+                # A strong ETag identifies one representation; tag the encoded one
+                headers["ETag"] = f'{etag[:-1]}-{encoding}"'
+            await send(start)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_compressed)
+
+    @staticmethod
+    def _tag_not_modified(message: Message, if_none_match: str, encoding: Optional[str]):
+        """
+        A 304 carries the ETag and Vary the 200 would have: the encoded tag when the
+        client's cached copy is the encoded representation, the plain one otherwise
+        """
+        headers = MutableHeaders(scope=message)
+        headers.add_vary_header("Accept-Encoding")
+        etag = headers.get("etag")
+        if encoding and etag and etag.endswith('"'):
+            encoded = f'{etag[:-1]}-{encoding}"'
+            if any(tag.strip().removeprefix("W/") == encoded for tag in if_none_match.split(",")):
+                headers["ETag"] = encoded
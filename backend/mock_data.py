@@ -2,7 +2,7 @@
 Mock data generator for testing
 """
 
-from typing import List
+from typing import Any, Iterable, List, Optional
 from models import (
     ApifyResult, 
     BuiltWithResult, 
@@ -62,6 +62,31 @@ def get_mock_data() -> List[ApifyResult]:
             ],
             organicTraffic=610500.0,
             paidTraffic=2200.0,
-            builtwith_result=None  # Will be populated in step 2
+            builtwith_result=None,  # Will be populated in step 2
+            mock=True
         )
     ]
+
+
+def _is_mock(value: Any) -> bool:
+    if isinstance(value, dict):
+        return bool(value.get("mock"))
+    return bool(getattr(value, "mock", False))
+
+
+def observed_results(results: Optional[Iterable[Any]]) -> List[Any]:
+    """
+    Results (models or stored dicts) that are real observations: mock SimilarWeb
+    rows are dropped and mock BuiltWith stacks are stripped from the others
+    """
+    observed = []
+    for result in results or []:
+        if _is_mock(result):
+            continue
+        if isinstance(result, dict):
+            if _is_mock(result.get("builtwith_result")):
+                result = dict(result, builtwith_result=None)
+        elif _is_mock(result.builtwith_result):
+            result = result.model_copy(update={"builtwith_result": None})
+        observed.append(result)
+    return observed
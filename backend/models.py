@@ -51,6 +51,7 @@ class Technology(BaseModel):
 class BuiltWithResult(BaseModel):
     domain: str
     technologies: List[Technology]
+    mock: bool = False  # Placeholder stack, not a real BuiltWith observation
 
 
 class ApifyResult(BaseModel):
@@ -74,11 +75,13 @@ class ApifyResult(BaseModel):
     organicTraffic: float
     paidTraffic: float
     builtwith_result: Optional[BuiltWithResult] = None  # Add BuiltWith data
+    mock: bool = False  # Placeholder SimilarWeb data, not a real observation
 
 
 class WebsiteAnalysisRequest(BaseModel):
     websites: List[str]
     userId: str
+    session_id: Optional[str] = None  # Step 2: add BuiltWith data to this Step 1 session
 
 
 class AnalysisResponse(BaseModel):
@@ -86,14 +89,36 @@ class AnalysisResponse(BaseModel):
     data: List[ApifyResult]
     count: int
     note: Optional[str] = None
+    session_id: Optional[str] = None
+
+
+class CompetitorCrawlRequest(BaseModel):
+    websites: List[str]
+    userId: Optional[str] = None
+    max_depth: int = 2
+    max_nodes: int = 50
+    min_affinity: float = 0.0
+
+
+class TrackDomainsRequest(BaseModel):
+    websites: List[str]
+    userId: str
+    interval_hours: Optional[float] = None  # Defaults to REFRESH_INTERVAL_HOURS
+
+
+class CompareRequest(BaseModel):
+    data: Optional[List[ApifyResult]] = None  # Sites to compare inline
+    session_id: Optional[str] = None  # Or compare the SimilarWeb data of a stored session
 
 
 class ChatMessage(BaseModel):
     message: str
     analysis_data: dict
     session_id: Optional[str] = None  # Add session_id for chat tracking
+    userId: Optional[str] = None  # Used for per-user fairness in the LLM queue
 
 
 class ChatResponse(BaseModel):
     response: str
     suggestions: Optional[List[str]] = None
+    model: Optional[str] = None  # Model that produced the answer
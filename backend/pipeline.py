@@ -0,0 +1,117 @@
+"""
+Minimal DAG engine for analysis pipelines
+
+Stages declare the names of the stages whose results they need. The engine
+checks the graph once, then starts every stage as soon as its inputs have
+finished, so independent stages (e.g. SimilarWeb and BuiltWith lookups) run
+concurrently and the whole pipeline takes about as long as its critical
+path. Results are passed between stages in memory.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class PipelineError(Exception):
+    """Raised when the stage graph is invalid or a required stage fails"""
+
+    def __init__(self, message: str, stage: Optional[str] = None):
+        super().__init__(message)
+        self.stage = stage
+
+
+class Stage:
+    """One named step: `func(ctx, **inputs)` is awaited with the results of `inputs`"""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[..., Awaitable[Any]],
+        inputs: Iterable[str] = (),
+        optional: bool = False,
+        timeout: Optional[float] = None
+    ):
+        self.name = name
+        self.func = func
+        self.inputs = list(inputs)
+        self.optional = optional  # Failure yields None instead of failing the pipeline
+        self.timeout = timeout
+
+
+class Pipeline:
+    """Validated stage graph that can be run many times"""
+
+    def __init__(self, stages: List[Stage]):
+        self.stages = {stage.name: stage for stage in stages}
+        if len(self.stages) != len(stages):
+            raise PipelineError("Duplicate stage names")
+        self.order = self._topological_order()
+
+    def _topological_order(self) -> List[str]:
+        for stage in self.stages.values():
+            for name in stage.inputs:
+                if name not in self.stages:
+                    raise PipelineError(f"Stage '{stage.name}' depends on unknown stage '{name}'", stage.name)
+
+        order: List[str] = []
+        remaining = {name: set(stage.inputs) for name, stage in self.stages.items()}
+        while remaining:
+            ready = sorted(name for name, deps in remaining.items() if not deps)
+            if not ready:
+                raise PipelineError(f"Cycle between stages: {', '.join(sorted(remaining))}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    async def run(self, ctx: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Run every stage; returns {"results", "timings", "errors"} keyed by stage name.
+        Raises PipelineError if a required stage fails.
+        """
+        started = time.perf_counter()
+        results: Dict[str, Any] = {}
+        timings: Dict[str, float] = {}
+        errors: Dict[str, str] = {}
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def execute(stage: Stage) -> Any:
+            if stage.inputs:
+                await asyncio.gather(*(tasks[name] for name in stage.inputs))
+            stage_started = time.perf_counter()
+            try:
+                call = stage.func(ctx, **{name: results[name] for name in stage.inputs})
+                value = await asyncio.wait_for(call, stage.timeout) if stage.timeout else await call
+            except Exception as e:
+                timings[stage.name] = round(time.perf_counter() - stage_started, 3)
+                if not stage.optional:
+                    raise PipelineError(f"Stage '{stage.name}' failed: {e}", stage.name) from e
+                logger.warning(f"[PIPELINE] Optional stage '{stage.name}' failed: {e}")
+                errors[stage.name] = str(e)
+                value = None
+            else:
+                timings[stage.name] = round(time.perf_counter() - stage_started, 3)
+            results[stage.name] = value
+            return value
+
+        # Tasks are created in topological order, so every input task exists first
+        for name in self.order:
+            tasks[name] = asyncio.create_task(execute(self.stages[name]))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except PipelineError:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+
+        timings["total"] = round(time.perf_counter() - started, 3)
+        logger.info(f"[PIPELINE] Finished in {timings['total']}s: {timings}")
+        return {"results": results, "timings": timings, "errors": errors}
@@ -0,0 +1,272 @@
+"""
+Scheduled incremental re-analysis of tracked domains
+
+Users track domains with a per-domain refresh interval. A background loop
+wakes every tick and, inside the configured off-peak window, refreshes the
+domains that are due:
+  - domains with a fresh snapshot in the snapshot cache were just analyzed
+    and are only rescheduled
+  - the rest are fetched through the competitor crawler's batched,
+    concurrency-limited actor runs, plus one batched BuiltWith lookup
+  - domains that return no data are retried with exponential backoff
+    (retry_base_minutes * 2**failures, capped at the domain's interval)
+  - a per-field fingerprint of each result is compared with the previous
+    refresh, and only domains with changed fields are saved (one session
+    per user), so unchanged weeks cost no storage
+The watchlist and fingerprints are kept in a small JSON state file.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, time as dtime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+from domain_utils import normalize_domain, unique_domains
+from models import ApifyResult
+from tech_index import normalize_term
+
+logger = logging.getLogger(__name__)
+
+
+def parse_window(value: str) -> Optional[Tuple[dtime, dtime]]:
+    """"01:00-05:00" -> (start, end); empty or "always" -> None (no window)"""
+    if not value or value.strip().lower() in ("always", "any", "*"):
+        return None
+    start, _, end = value.partition("-")
+    return dtime.fromisoformat(start.strip()), dtime.fromisoformat(end.strip())
+
+
+def in_window(now: datetime, window: Optional[Tuple[dtime, dtime]]) -> bool:
+    if window is None:
+        return True
+    start, end = window
+    current = now.time()
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end  # Window wraps past midnight
+
+
+def fingerprints(result: ApifyResult) -> Dict[str, str]:
+    """Short hash per ApifyResult field, with technologies compared as a normalized set"""
+    data = result.model_dump(exclude={"builtwith_result"})
+    prints = {
+        field: hashlib.blake2b(json.dumps(value, sort_keys=True).encode("utf-8"), digest_size=8).hexdigest()
+        for field, value in data.items()
+    }
+    if result.builtwith_result is not None:
+        names = sorted({normalize_term(t.name) for t in result.builtwith_result.technologies} - {""})
+        prints["technologies"] = hashlib.blake2b("|".join(names).encode("utf-8"), digest_size=8).hexdigest()
+    return prints
+
+
+class RefreshScheduler:
+    """Watchlist of (user, domain) pairs refreshed on per-domain intervals"""
+
+    def __init__(
+        self,
+        crawler,
+        tech_stack_cache,
+        snapshot_cache,
+        db,
+        state_path: str,
+        window: Optional[str] = None,
+        default_interval_hours: float = 168.0,
+        tick_seconds: float = 300.0,
+        max_per_run: int = 200,
+        retry_base_minutes: float = 60.0
+    ):
+        self.crawler = crawler
+        self.tech_stack_cache = tech_stack_cache
+        self.snapshot_cache = snapshot_cache
+        self.db = db
+        self.state_path = state_path
+        self.window = parse_window(window)
+        self.default_interval_hours = default_interval_hours
+        self.tick_seconds = tick_seconds
+        self.max_per_run = max_per_run
+        self.retry_base_minutes = retry_base_minutes
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+        self._run_lock: Optional[asyncio.Lock] = None
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: Optional[Dict[str, Any]] = None
+
+    # --- Watchlist ---------------------------------------------------------
+
+    @staticmethod
+    def _key(user_id: str, domain: str) -> str:
+        return f"{user_id}|{domain}"
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.state_path, encoding="utf-8") as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.error(f"[REFRESH] Could not read {self.state_path}: {e}")
+            return {}
+
+    def _save(self):
+        directory = os.path.dirname(self.state_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._entries, f)
+        os.replace(tmp_path, self.state_path)
+
+    def track(self, user_id: str, websites: List[str], interval_hours: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Add or update tracked domains; new ones are due at the next run"""
+        interval = interval_hours or self.default_interval_hours
+        tracked = []
+        for domain in unique_domains(websites):
+            entry = self._entries.setdefault(self._key(user_id, domain), {
+                "user_id": user_id,
+                "domain": domain,
+                "next_due": datetime.utcnow().isoformat(),
+                "last_checked": None,
+                "last_changed": None,
+                "last_changes": [],
+                "fingerprints": {},
+            })
+            entry["interval_hours"] = interval
+            tracked.append(self._public(entry))
+        self._save()
+        return tracked
+
+    def untrack(self, user_id: str, domain: str) -> bool:
+        removed = self._entries.pop(self._key(user_id, normalize_domain(domain)), None) is not None
+        if removed:
+            self._save()
+        return removed
+
+    def tracked(self, user_id: Optional[str] = None) -> List[Dict[str, Any]]:
+        entries = [e for e in self._entries.values() if user_id is None or e["user_id"] == user_id]
+        return [self._public(e) for e in sorted(entries, key=lambda e: e["next_due"])]
+
+    @staticmethod
+    def _public(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {k: v for k, v in entry.items() if k != "fingerprints"}
+
+    # --- Refresh -----------------------------------------------------------
+
+    def _reschedule(self, entry: Dict[str, Any], now: datetime):
+        entry["last_checked"] = now.isoformat()
+        entry["next_due"] = (now + timedelta(hours=entry["interval_hours"])).isoformat()
+        entry.pop("failures", None)
+        entry.pop("last_error", None)
+
+    def _retry_later(self, entry: Dict[str, Any], now: datetime, error: str):
+        """Back off exponentially so a dead domain does not cost an actor run every tick"""
+        failures = entry.get("failures", 0)
+        delay = min(timedelta(hours=entry["interval_hours"]), timedelta(minutes=self.retry_base_minutes * 2 ** failures))
+        entry["failures"] = failures + 1
+        entry["last_error"] = error
+        entry["last_checked"] = now.isoformat()
+        entry["next_due"] = (now + delay).isoformat()
+
+    async def run_once(self, force: bool = False, now: Optional[datetime] = None) -> Dict[str, Any]:
+        """Refresh due domains; outside the window nothing happens unless force is set"""
+        now = now or datetime.utcnow()
+        if not force and not in_window(now, self.window):
+            return {"skipped": "outside refresh window"}
+        if self._run_lock is None:
+            self._run_lock = asyncio.Lock()
+        if self._run_lock.locked():
+            return {"skipped": "refresh already running"}
+
+        async with self._run_lock:
+            due = sorted(
+                (e for e in self._entries.values() if e["next_due"] <= now.isoformat()),
+                key=lambda e: e["next_due"]
+            )[:self.max_per_run]
+            stats = {"due": len(due), "fresh": 0, "actor_runs": 0, "cache_hits": 0, "fetched": 0,
+                     "unresolved": 0, "changed": 0, "unchanged": 0, "sessions": 0}
+            if not due:
+                self.last_run = dict(stats, finished_at=now.isoformat())
+                return self.last_run
+
+            # Fresh snapshots mean the domain was analyzed moments ago; just reschedule it
+            domains = unique_domains(e["domain"] for e in due)
+            found, missing = self.snapshot_cache.get_many(domains)
+            stats["fresh"] = len(found)
+            print(f"[REFRESH] {len(due)} tracked domains due: {len(found)} fresh, {len(missing)} to fetch")
+
+            snapshots = await self.crawler.fetch(missing, stats) if missing else {}
+            resolved = [domain for domain in missing if domain in snapshots]
+            tech = await self.tech_stack_cache.analyze_domains(resolved) if resolved else {}
+
+            # user -> (entry, result, fingerprints, changed fields), committed once the session saves
+            changed_by_user: Dict[str, List[tuple]] = {}
+            for entry in due:
+                domain = entry["domain"]
+                if domain in found:
+                    self._reschedule(entry, now)
+                    continue
+                snapshot = snapshots.get(domain)
+                if snapshot is None:
+                    self._retry_later(entry, now, "No SimilarWeb data returned")
+                    continue
+
+                result = snapshot.model_copy(deep=True)
+                stack = tech.get(domain)
+                # A mock stack is not an observation: leave the technologies fingerprint as it was
+                result.builtwith_result = stack if stack is not None and not stack.mock else None
+                prints = fingerprints(result)
+                changes = sorted(f for f, h in prints.items() if entry["fingerprints"].get(f) != h)
+                self._reschedule(entry, now)
+                if not changes:
+                    stats["unchanged"] += 1
+                    continue
+                stats["changed"] += 1
+                changed_by_user.setdefault(entry["user_id"], []).append((entry, result, prints, changes))
+
+            # Only domains with changed fields are stored, one session per user
+            for user_id, changed in changed_by_user.items():
+                results = [result for _, result, _, _ in changed]
+                session_id = await self.db.save_analysis_session(
+                    user_id=user_id,
+                    domains=[normalize_domain(r.name) for r in results],
+                    similarweb_data=results,
+                    builtwith_data=results
+                )
+                if not session_id:
+                    # Keep the old fingerprints so the next attempt still sees these changes
+                    for entry, _, _, _ in changed:
+                        self._retry_later(entry, now, "Saving the refreshed session failed")
+                    continue
+                stats["sessions"] += 1
+                for entry, _, prints, changes in changed:
+                    entry["fingerprints"] = dict(entry["fingerprints"], **prints)
+                    entry["last_changed"] = now.isoformat()
+                    entry["last_changes"] = changes
+
+            self._save()
+            self.last_run = dict(stats, finished_at=datetime.utcnow().isoformat())
+            logger.info(f"[REFRESH] Run finished: {self.last_run}")
+            return self.last_run
+
+    async def run_forever(self):
+        """Background loop: one run_once per tick"""
+        print(f"[REFRESH] Scheduler started: {len(self._entries)} tracked domains, tick {self.tick_seconds}s")
+        while True:
+            try:
+                await self.run_once()
+            except Exception as e:
+                logger.error(f"[REFRESH] Scheduled run failed: {e}")
+            await asyncio.sleep(self.tick_seconds)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self.run_forever())
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "tracked": len(self._entries),
+            "window": [t.isoformat() for t in self.window] if self.window else None,
+            "running": bool(self._task and not self._task.done()),
+            "last_run": self.last_run,
+        }
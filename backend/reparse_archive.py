@@ -0,0 +1,244 @@
+"""
+Offline re-parse of archived upstream responses
+
+Re-runs the current BuiltWith parsing and ApifyResult validation over the raw
+response archive in a process pool, then rewrites the stored sessions with
+the new results. No upstream API is called.
+
+Each session is patched only with the archived fetch that produced it, matched
+by fetch time: SimilarWeb data with the newest fetch at or before the session
+was created, BuiltWith data with the first fetch after that (Step 2) or else
+the newest one before it (a cache hit). Fetches older than --max-age-hours
+before the session never match, so old snapshots are not overwritten with
+newer data.
+
+Usage:
+    python reparse_archive.py [--provider builtwith|apify|all] [--workers N] [--max-age-hours H] [--dry-run]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import os
+import bisect
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+from domain_utils import normalize_domain
+from response_archive import ResponseArchive
+
+
+def reparse_blob(task: Tuple[str, str, str, bool, List[str]]) -> Tuple[str, str, Dict[str, Any], Optional[str]]:
+    """
+    Worker: parse one archived blob for the domains that reference it.
+    Returns (provider, digest, {domain: result dict}, error).
+    """
+    provider, archive_root, digest, complete, domains = task
+    from clients.builtwith_client_fixed import BuiltWithClientFixed
+    from models import ApifyResult
+
+    try:
+        body = ResponseArchive(archive_root).read(digest)
+        results: Dict[str, Any] = {}
+
+        # The parsers are chatty; keep worker output readable
+        with contextlib.redirect_stdout(io.StringIO()):
+            if provider == "builtwith":
+                client = BuiltWithClientFixed()
+                data = json.loads(body) if complete else None
+                for domain in domains:
+                    if complete:
+                        parsed = client._parse_builtwith_response(domain, data, fallback_to_mock=False)
+                    else:
+                        parsed = client._parse_raw_response(domain, body)
+                    if parsed.technologies:
+                        results[domain] = parsed.model_dump()
+
+            elif provider == "apify":
+                wanted = set(domains)
+                for item in json.loads(body):
+                    try:
+                        parsed = ApifyResult(**item)
+                    except Exception:
+                        continue
+                    domain = normalize_domain(parsed.name)
+                    if domain in wanted:
+                        results[domain] = parsed.model_dump(exclude={"builtwith_result"})
+
+        return provider, digest, results, None
+    except Exception as e:
+        return provider, digest, {}, f"{digest}: {e}"
+
+
+def _utc(value: Optional[str]) -> Optional[datetime]:
+    """Naive UTC datetime from a stored ISO timestamp (with or without offset)"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def build_tasks(archive: ResponseArchive, provider: Optional[str]):
+    """
+    One task per blob, listing every domain fetched into it, plus the fetch
+    history per (provider, domain): a time-sorted list of (fetched_at, digest)
+    """
+    grouped: Dict[Tuple[str, str, bool], set] = defaultdict(set)
+    fetches: Dict[Tuple[str, str], List[Tuple[datetime, str]]] = defaultdict(list)
+    for entry in archive.entries(provider=provider, latest_only=False):
+        grouped[(entry["provider"], entry["sha256"], entry.get("complete", True))].add(entry["domain"])
+        fetches[(entry["provider"], entry["domain"])].append((_utc(entry["fetched_at"]), entry["sha256"]))
+    for history in fetches.values():
+        history.sort()
+    tasks = [(p, archive.root, digest, complete, sorted(domains)) for (p, digest, complete), domains in grouped.items()]
+    return tasks, dict(fetches)
+
+
+def match_fetch(
+    history: List[Tuple[datetime, str]],
+    provider: str,
+    session: Dict[str, Any],
+    max_age: timedelta
+) -> Optional[str]:
+    """Digest of the archived fetch that produced this session's data for one domain, if any"""
+    created = _utc(session.get("created_at"))
+    if not history or created is None:
+        return None
+    times = [fetched_at for fetched_at, _ in history]
+    position = bisect.bisect_right(times, created)
+
+    if provider == "builtwith":
+        # Step 2 runs soon after the session was created and before anyone chats about it
+        chat = session.get("chat_discussion") or []
+        bound = _utc(chat[0].get("timestamp")) if chat else None
+        bound = min(bound or _utc(session.get("updated_at")) or created, created + max_age)
+        if position < len(history) and history[position][0] <= bound:
+            return history[position][1]
+
+    # Newest fetch at or before creation (for BuiltWith: a Step 2 cache hit), unless it is too old
+    if position and created - history[position - 1][0] <= max_age:
+        return history[position - 1][1]
+    return None
+
+
+def session_results(
+    session: Dict[str, Any],
+    fetches: Dict[Tuple[str, str], List[Tuple[datetime, str]]],
+    parsed: Dict[Tuple[str, str], Dict[str, Any]],
+    max_age: timedelta
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Re-parsed SimilarWeb and BuiltWith results ({domain: result dict}) that belong to one session"""
+    matched: Dict[str, Dict[str, Any]] = {"apify": {}, "builtwith": {}}
+    domains = {
+        normalize_domain(item.get("name", ""))
+        for column in ("similarweb_data", "builtwith_data") for item in session.get(column) or []
+    }
+    for provider, results in matched.items():
+        for domain in domains:
+            digest = match_fetch(fetches.get((provider, domain), []), provider, session, max_age)
+            result = parsed.get((provider, digest), {}).get(domain) if digest else None
+            if result is not None:
+                results[domain] = result
+    return matched["apify"], matched["builtwith"]
+
+
+def apply_to_items(items: Optional[List[Dict[str, Any]]], apify: Dict[str, Any], builtwith: Dict[str, Any]) -> bool:
+    """Patch a session's stored ApifyResult dicts in place; returns True if anything changed"""
+    changed = False
+    for i, item in enumerate(items or []):
+        domain = normalize_domain(item.get("name", ""))
+        existing_bw = item.get("builtwith_result")
+        bw_domain = normalize_domain(existing_bw.get("domain", "")) if existing_bw else domain
+
+        if domain in apify:
+            items[i] = dict(apify[domain], builtwith_result=existing_bw)
+            changed = True
+        if existing_bw is not None and bw_domain in builtwith:
+            items[i]["builtwith_result"] = builtwith[bw_domain]
+            changed = True
+    return changed
+
+
+async def update_sessions(
+    fetches: Dict[Tuple[str, str], List[Tuple[datetime, str]]],
+    parsed: Dict[Tuple[str, str], Dict[str, Any]],
+    max_age: timedelta,
+    page_size: int = 100
+) -> int:
+    """Rewrite stored sessions with the re-parsed fetches that produced them"""
+    from database_service import db_service
+    from models import ApifyResult
+
+    updated = 0
+    offset = 0
+    while True:
+        sessions = await db_service.list_sessions(offset=offset, limit=page_size)
+        if not sessions:
+            break
+        offset += len(sessions)
+
+        for session in sessions:
+            apify, builtwith = session_results(session, fetches, parsed, max_age)
+            if not (apify or builtwith):
+                continue
+            similarweb = session.get("similarweb_data")
+            builtwith_data = session.get("builtwith_data")
+            sw_changed = apply_to_items(similarweb, apify, {})
+            bw_changed = apply_to_items(builtwith_data, apify, builtwith)
+            if not (sw_changed or bw_changed):
+                continue
+
+            ok = await db_service.update_analysis_session(
+                session_id=session["id"],
+                similarweb_data=[ApifyResult(**item) for item in similarweb] if sw_changed else None,
+                builtwith_data=[ApifyResult(**item) for item in builtwith_data] if bw_changed else None
+            )
+            updated += 1 if ok else 0
+    return updated
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse archived BuiltWith/Apify responses without network calls")
+    parser.add_argument("--provider", choices=["builtwith", "apify", "all"], default="all")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 2)
+    parser.add_argument("--archive-dir", default=os.environ.get("RAW_ARCHIVE_DIR", "archive"))
+    parser.add_argument("--max-age-hours", type=float, default=24.0,
+                        help="Oldest fetch (before session creation) that may still belong to a session")
+    parser.add_argument("--dry-run", action="store_true", help="Parse only, do not update sessions")
+    args = parser.parse_args()
+
+    archive = ResponseArchive(args.archive_dir)
+    tasks, fetches = build_tasks(archive, None if args.provider == "all" else args.provider)
+    print(f"[REPARSE] {len(tasks)} archived responses to re-parse with {args.workers} workers")
+
+    # (provider, digest) -> {domain: result dict}
+    parsed: Dict[Tuple[str, str], Dict[str, Any]] = {}
+    counts = {"apify": 0, "builtwith": 0}
+    errors = []
+    with ProcessPoolExecutor(max_workers=args.workers) as pool:
+        for provider, digest, results, error in pool.map(reparse_blob, tasks, chunksize=8):
+            parsed[(provider, digest)] = results
+            counts[provider] += len(results)
+            if error:
+                errors.append(error)
+
+    print(f"[REPARSE] Parsed {counts['apify']} SimilarWeb and {counts['builtwith']} BuiltWith domain fetches")
+    for error in errors[:20]:
+        print(f"[ERROR] {error}")
+
+    if args.dry_run:
+        print("[REPARSE] Dry run, sessions not updated")
+        return
+
+    updated = asyncio.run(update_sessions(fetches, parsed, timedelta(hours=args.max_age_hours)))
+    print(f"[REPARSE] Updated {updated} sessions")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+"""
+Content-addressed archive of raw upstream responses
+
+Every raw BuiltWith / Apify response body is stored gzip-compressed under its
+SHA-256 (identical bodies are stored once). An append-only NDJSON manifest
+records provider, domain, fetch time and blob hash, so improved parsing logic
+can be re-run over old lookups without paying for them again. The *_async
+methods run the gzip and file work in a thread so the event loop never
+blocks on disk.
+"""
+
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from datetime import datetime
+from typing import Any, Dict, Iterator, List, Optional
+
+from domain_utils import normalize_domain
+
+logger = logging.getLogger(__name__)
+
+
+class ArchiveWriter:
+    """Streams one response body into a compressed temp file, then files it by hash"""
+
+    def __init__(self, archive: "ResponseArchive", provider: str, domains: List[str], meta: Optional[Dict[str, Any]] = None):
+        self.archive = archive
+        self.provider = provider
+        self.domains = domains
+        self.meta = meta or {}
+        self._hash = hashlib.sha256()
+        self._size = 0
+        fd, self._tmp_path = tempfile.mkstemp(dir=archive.tmp_dir, suffix=".gz")
+        self._raw = os.fdopen(fd, "wb")
+        self._file = gzip.GzipFile(fileobj=self._raw, mode="wb", compresslevel=6)
+
+    def write(self, chunk: bytes):
+        self._hash.update(chunk)
+        self._size += len(chunk)
+        self._file.write(chunk)
+
+    async def write_async(self, chunk: bytes):
+        await asyncio.to_thread(self.write, chunk)
+
+    def _close(self):
+        # GzipFile does not close a file object it was handed
+        try:
+            self._file.close()
+        finally:
+            self._raw.close()
+
+    def commit(self, complete: bool = True) -> str:
+        """Finish the blob and add manifest entries; returns the content hash"""
+        self._close()
+        digest = self._hash.hexdigest()
+        blob_path = self.archive.blob_path(digest)
+        if os.path.exists(blob_path):
+            os.remove(self._tmp_path)
+        else:
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            os.replace(self._tmp_path, blob_path)
+
+        fetched_at = datetime.utcnow().isoformat()
+        for domain in self.domains:
+            self.archive._append_manifest({
+                "provider": self.provider,
+                "domain": normalize_domain(domain),
+                "fetched_at": fetched_at,
+                "sha256": digest,
+                "bytes": self._size,
+                "complete": complete,
+                "meta": self.meta
+            })
+        return digest
+
+    async def commit_async(self, complete: bool = True) -> str:
+        return await asyncio.to_thread(self.commit, complete)
+
+    def discard(self):
+        try:
+            self._close()
+        finally:
+            if os.path.exists(self._tmp_path):
+                os.remove(self._tmp_path)
+
+
+class ResponseArchive:
+    """Local archive rooted at a directory: blobs/ab/<sha256>.gz plus manifest.ndjson"""
+
+    def __init__(self, root: str, full_body: bool = False):
+        self.root = root
+        # Keep reading past the parser's early exit so blobs are complete (costs the network reads it saves)
+        self.full_body = full_body
+        self.blob_dir = os.path.join(root, "blobs")
+        self.tmp_dir = os.path.join(root, "tmp")
+        self.manifest_path = os.path.join(root, "manifest.ndjson")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blob_dir, digest[:2], f"{digest}.gz")
+
+    def writer(self, provider: str, domains: List[str], meta: Optional[Dict[str, Any]] = None) -> ArchiveWriter:
+        return ArchiveWriter(self, provider, domains, meta)
+
+    def store(self, provider: str, domains: List[str], body: bytes, meta: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        """Archive a response body that is already in memory"""
+        writer = self.writer(provider, domains, meta)
+        try:
+            writer.write(body)
+            return writer.commit()
+        except Exception as e:
+            writer.discard()
+            logger.error(f"[ARCHIVE] Failed to archive {provider} response: {e}")
+            return None
+
+    async def store_async(self, provider: str, domains: List[str], body: bytes, meta: Optional[Dict[str, Any]] = None) -> Optional[str]:
+        return await asyncio.to_thread(self.store, provider, domains, body, meta)
+
+    def _append_manifest(self, entry: Dict[str, Any]):
+        with open(self.manifest_path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(entry) + "\n")
+
+    def entries(self, provider: Optional[str] = None, latest_only: bool = True) -> Iterator[Dict[str, Any]]:
+        """Manifest entries, optionally only the newest fetch per (provider, domain)"""
+        if not os.path.exists(self.manifest_path):
+            return iter(())
+
+        latest: Dict[tuple, Dict[str, Any]] = {}
+        all_entries = []
+        with open(self.manifest_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                if provider and entry.get("provider") != provider:
+                    continue
+                if latest_only:
+                    key = (entry["provider"], entry["domain"])
+                    if key not in latest or entry["fetched_at"] >= latest[key]["fetched_at"]:
+                        latest[key] = entry
+                else:
+                    all_entries.append(entry)
+        return iter(latest.values() if latest_only else all_entries)
+
+    def read(self, digest: str) -> bytes:
+        with gzip.open(self.blob_path(digest), "rb") as f:
+            return f.read()
@@ -5,13 +5,39 @@ API route handlers for the BuiltWith Analyzer
 import json
 import logging
 from typing import List
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, HTTPException, BackgroundTasks, File, Form, Query, Request, UploadFile
+from fastapi.responses import StreamingResponse
 from config import config
-from models import WebsiteAnalysisRequest, AnalysisResponse, ChatMessage, ChatResponse, ApifyResult
+from models import (
+    WebsiteAnalysisRequest, AnalysisResponse, ChatMessage, ChatResponse, ApifyResult, BuiltWithResult,
+    CompareRequest, CompetitorCrawlRequest, TrackDomainsRequest
+)
 from mock_data import get_mock_data
-from clients import ApifyClient, OpenRouterClient
+from clients import (
+    ApifyClient, OpenRouterClient, LLMScheduler, LLMUnavailableError, SchedulerQueueFullError, SchedulerTimeoutError
+)
 from clients.builtwith_client_fixed import BuiltWithClientFixed
 from database_service import db_service
+from domain_utils import normalize_domain, unique_domains
+from response_archive import ResponseArchive
+from conversation_memory import conversation_memory
+from metrics_engine import metrics_engine
+from keyword_index import build_keyword_index, keyword_index
+from tech_index import tech_index
+from tech_similarity import tech_lsh
+from traffic_similarity import traffic_index
+from domain_metrics import domain_metrics
+from domain_history import domain_history
+from snapshot_cache import SnapshotCache
+from competitor_graph import CompetitorGraphCrawler
+from refresh_scheduler import RefreshScheduler
+from tech_stack_cache import TechStackCache
+from pipeline import PipelineError
+from analysis_pipeline import build_analysis_pipeline
+from bulk_analysis import detect_format, stream_bulk_analysis
+from fast_json import json_response, stream_json_array, stream_ndjson
+from history_export import FORMATS as EXPORT_FORMATS, TABLES as EXPORT_TABLES, pyarrow_available, stream_table
+from http_cache import cache_headers, etag_matches, history_etag, not_modified, session_etag
 import uuid
 
 # Setup router
@@ -19,9 +45,50 @@ router = APIRouter()
 logger = logging.getLogger(__name__)
 
 # Initialize clients
-apify_client = ApifyClient(config.apify_token) if config.apify_token else None
-builtwith_client = BuiltWithClientFixed(config.builtwith_key)
-openrouter_client = OpenRouterClient(config.openrouter_key)
+response_archive = ResponseArchive(config.raw_archive_dir, full_body=config.raw_archive_full_body) if config.raw_archive_enabled else None
+apify_client = ApifyClient(config.apify_token, archive=response_archive) if config.apify_token else None
+builtwith_client = BuiltWithClientFixed(
+    config.builtwith_key,
+    archive=response_archive,
+    batch_size=config.builtwith_batch_size
+)
+tech_stack_cache = TechStackCache(
+    builtwith_client,
+    ttl_seconds=config.builtwith_cache_ttl,
+    prefetch_concurrency=config.builtwith_prefetch_concurrency
+)
+snapshot_cache = SnapshotCache(ttl_seconds=config.snapshot_ttl, max_entries=config.snapshot_max_entries)
+competitor_crawler = CompetitorGraphCrawler(
+    apify_client,
+    snapshot_cache,
+    batch_size=config.crawl_batch_size,
+    max_concurrency=config.crawl_max_concurrency
+)
+refresh_scheduler = RefreshScheduler(
+    competitor_crawler,
+    tech_stack_cache,
+    snapshot_cache,
+    db_service,
+    state_path=config.refresh_state_path,
+    window=config.refresh_window,
+    default_interval_hours=config.refresh_interval_hours,
+    tick_seconds=config.refresh_tick_seconds,
+    max_per_run=config.refresh_max_per_run,
+    retry_base_minutes=config.refresh_retry_base_minutes
+)
+analysis_pipeline = build_analysis_pipeline(apify_client, tech_stack_cache, snapshot_cache, db_service)
+llm_scheduler = LLMScheduler(
+    max_concurrency=config.llm_max_concurrency,
+    max_queue=config.llm_max_queue,
+    default_deadline=config.llm_queue_deadline
+)
+openrouter_client = OpenRouterClient(
+    config.openrouter_key,
+    models=config.chat_models or None,
+    hedge_after=config.chat_hedge_after,
+    timeout=config.chat_timeout,
+    scheduler=llm_scheduler
+)
 
 
 @router.get("/")
@@ -32,11 +99,36 @@ async def root():
         "endpoints": {
             "similarweb": "POST /api/analyze",
             "builtwith": "POST /api/analyze-tech-stack",
-            "chat": "POST /api/chat"
+            "full_analysis": "POST /api/analyze-full",
+            "bulk_analysis": "POST /api/analyze/bulk (multipart CSV/NDJSON, streams NDJSON)",
+            "chat": "POST /api/chat",
+            "compare": "POST /api/compare",
+            "keywords": "GET /api/keywords/{overlap|unique/{domain}|gap/{domain}}",
+            "tech_domains": "GET /api/tech/domains?tech_all=...&tech_any=...",
+            "technologies": "GET /api/tech/technologies",
+            "similar_tech": "GET /api/similar/tech/{domain}",
+            "similar_traffic": "GET /api/similar/traffic/{domain}",
+            "domain_query": "GET /api/domains/query",
+            "domain_history": "GET /api/domains/{domain}/{trend|changes}",
+            "tracked_domains": "GET|POST /api/tracked, DELETE /api/tracked/{domain}, POST /api/tracked/refresh",
+            "competitor_crawl": "POST /api/crawl/competitors",
+            "history": "GET /api/history/{user_id}?stream=json|ndjson",
+            "export": "GET /api/export/{user_id}?table=...&format=csv|parquet|arrow",
+            "llm_metrics": "GET /api/metrics/llm"
         }
     }
 
 
+def _prefetch_tech_stack(websites: List[str]):
+    """Speculatively start Step 2's BuiltWith lookups in the background"""
+    if not config.builtwith_prefetch:
+        return
+    try:
+        tech_stack_cache.prefetch(websites)
+    except Exception as e:
+        logger.warning(f"[PREFETCH] Could not start BuiltWith prefetch: {e}")
+
+
 @router.post("/api/analyze", response_model=AnalysisResponse)
 async def analyze_websites(request: WebsiteAnalysisRequest):
     """Step 1: Analyze websites with SimilarWeb only"""
@@ -66,6 +158,9 @@ async def analyze_websites(request: WebsiteAnalysisRequest):
         for item in mock_data:
             item.builtwith_result = None
         
+        # Step 2 almost always follows for the same domains: start BuiltWith early
+        _prefetch_tech_stack(request.websites)
+        
         # Save to Supabase with session tracking
         session_id = await db_service.save_analysis_session(
             user_id=request.userId,
@@ -75,12 +170,13 @@ async def analyze_websites(request: WebsiteAnalysisRequest):
 
         logger.info("[SUCCESS] Step 1 (SimilarWeb) completed with mock data")
         print("[SUCCESS] Step 1 (SimilarWeb) completed with mock data")
-        return AnalysisResponse(
+        return json_response(AnalysisResponse(
             success=True,
             data=mock_data,
             count=len(mock_data),
-            note=f"Step 1 complete: SimilarWeb analysis ready. Session ID: {session_id}. Click 'Analyze Tech Stack' to continue."
-        )
+            note=f"Step 1 complete: SimilarWeb analysis ready. Session ID: {session_id}. Click 'Analyze Tech Stack' to continue.",
+            session_id=session_id
+        ))
 
     try:
         logger.info("[API] Fetching data from Apify API...")
@@ -92,6 +188,10 @@ async def analyze_websites(request: WebsiteAnalysisRequest):
         # Ensure no BuiltWith data is included yet
         for result in results:
             result.builtwith_result = None
+        snapshot_cache.put_many(results)
+        
+        # Step 2 almost always follows for the same domains: start BuiltWith early
+        _prefetch_tech_stack(request.websites)
         
         # Save to Supabase with session tracking
         session_id = await db_service.save_analysis_session(
@@ -102,12 +202,13 @@ async def analyze_websites(request: WebsiteAnalysisRequest):
 
         logger.info("[SUCCESS] Step 1 (SimilarWeb) completed successfully")
         print("[SUCCESS] Step 1 (SimilarWeb) completed successfully")
-        return AnalysisResponse(
+        return json_response(AnalysisResponse(
             success=True,
             data=results,
             count=len(results),
-            note=f"Step 1 complete: SimilarWeb analysis ready. Session ID: {session_id}. Click 'Analyze Tech Stack' to continue."
-        )
+            note=f"Step 1 complete: SimilarWeb analysis ready. Session ID: {session_id}. Click 'Analyze Tech Stack' to continue.",
+            session_id=session_id
+        ))
 
     except Exception as e:
         logger.error(f"[ERROR] Error with Apify API: {str(e)}")
@@ -122,6 +223,9 @@ async def analyze_websites(request: WebsiteAnalysisRequest):
         for item in mock_data:
             item.builtwith_result = None
         
+        # Step 2 almost always follows for the same domains: start BuiltWith early
+        _prefetch_tech_stack(request.websites)
+        
         # Save to Supabase with session tracking
         session_id = await db_service.save_analysis_session(
             user_id=request.userId,
@@ -131,12 +235,85 @@ async def analyze_websites(request: WebsiteAnalysisRequest):
             
         logger.info("[SUCCESS] Step 1 (SimilarWeb) completed with fallback data")
         print("[SUCCESS] Step 1 (SimilarWeb) completed with fallback data")
-        return AnalysisResponse(
+        return json_response(AnalysisResponse(
             success=True,
             data=mock_data,
             count=len(mock_data),
-            note=f"Step 1 complete (with fallback): SimilarWeb analysis ready. Session ID: {session_id}. API Error: {str(e)}"
+            note=f"Step 1 complete (with fallback): SimilarWeb analysis ready. Session ID: {session_id}. API Error: {str(e)}",
+            session_id=session_id
+        ))
+
+
+async def _analyze_tech_stack_for_session(request: WebsiteAnalysisRequest) -> AnalysisResponse:
+    """Step 2 for a known Step 1 session: join by normalized domain, look up only what is missing"""
+    session = await db_service.get_session_fields(request.session_id, ["user_id", "similarweb_data", "builtwith_data"])
+    if not session:
+        raise HTTPException(status_code=404, detail="Analysis session not found")
+    if session.get("user_id") != db_service.user_uuid(request.userId):
+        raise HTTPException(status_code=403, detail="Analysis session belongs to another user")
+    if not session.get("similarweb_data"):
+        raise HTTPException(status_code=409, detail="Session has no SimilarWeb data yet; run Step 1 first")
+
+    # BuiltWith results already stored for this session, by normalized domain
+    existing = {}
+    for item in session.get("builtwith_data") or []:
+        builtwith = item.get("builtwith_result")
+        if builtwith and builtwith.get("technologies"):
+            existing[normalize_domain(builtwith.get("domain") or item.get("name", ""))] = builtwith
+
+    items = {}
+    for item in session["similarweb_data"]:
+        domain = normalize_domain(item.get("name", ""))
+        if domain and domain not in items:
+            items[domain] = item
+
+    requested = unique_domains(request.websites)
+    if items and all(item.get("mock") for item in items.values()):
+        # A Step 1 fallback stored only mock rows, which never carry the requested names
+        targets = list(items)
+    else:
+        unknown = [domain for domain in requested if domain not in items]
+        if unknown:
+            raise HTTPException(
+                status_code=422, detail=f"Domains not in analysis session {request.session_id}: {', '.join(unknown)}"
+            )
+        targets = [domain for domain in items if domain in requested]
+    missing = [domain for domain in targets if domain not in existing]
+    print(f"[TECH] Session {request.session_id}: {len(targets)} domains, {len(missing)} need BuiltWith lookups")
+
+    looked_up = await tech_stack_cache.analyze_domains(missing) if missing else {}
+
+    results = []
+    for domain in targets:
+        try:
+            result = ApifyResult(**dict(items[domain], builtwith_result=None))
+        except Exception as e:
+            print(f"[ERROR] Error converting data item {domain}: {e}")
+            continue
+        builtwith = existing.get(domain) or looked_up.get(domain)
+        result.builtwith_result = (
+            BuiltWithResult(**builtwith) if isinstance(builtwith, dict)
+            else builtwith or BuiltWithResult(domain=domain, technologies=[])
         )
+        results.append(result)
+
+    if missing:
+        # Replace only the targets in the stored BuiltWith data; other domains keep theirs
+        merged = {}
+        for item in session.get("builtwith_data") or []:
+            try:
+                merged.setdefault(normalize_domain(item.get("name", "")), ApifyResult(**item))
+            except Exception as e:
+                print(f"[ERROR] Error converting stored item {item.get('name')}: {e}")
+        merged.update((normalize_domain(result.name), result) for result in results)
+        await db_service.update_analysis_session(session_id=request.session_id, builtwith_data=list(merged.values()))
+
+    total_technologies = sum(len(item.builtwith_result.technologies) for item in results)
+    note = (
+        f"Step 2 complete: BuiltWith analysis added. Found {total_technologies} technologies across "
+        f"{len(results)} websites ({len(missing)} looked up, {len(results) - len(missing)} reused)."
+    )
+    return AnalysisResponse(success=True, data=results, count=len(results), note=note, session_id=request.session_id)
 
 
 @router.post("/api/analyze-tech-stack", response_model=AnalysisResponse)
@@ -154,6 +331,9 @@ async def analyze_tech_stack(request: WebsiteAnalysisRequest):
     print("[TECH] Starting BuiltWith Tech Stack Analysis (Step 2)")
     print("=" * 60)
     
+    if request.session_id:
+        return json_response(await _analyze_tech_stack_for_session(request))
+    
     print(f"BUILTWITH_API_KEY: {'YES' if config.builtwith_key else 'NO'}")
     
     try:
@@ -185,21 +365,33 @@ async def analyze_tech_stack(request: WebsiteAnalysisRequest):
         print(f"[PROCESS] Starting BuiltWith analysis for {len(results)} websites...")
         print("-" * 60)
         
+        # Extract domain from website name or use the provided URL
+        website_urls = [
+            request.websites[i] if i < len(request.websites)
+            # Fallback: construct domain from website name
+            else website_result.name.lower().replace(" ", "") + ".com"
+            for i, website_result in enumerate(results)
+        ]
+        
+        # Look all domains up together; BuiltWith answers several per request
+        try:
+            builtwith_results = await tech_stack_cache.analyze_domains(website_urls)
+        except Exception as e:
+            print(f"[ERROR] Batched BuiltWith lookup failed: {e}")
+            builtwith_results = {}
+        
         # Add BuiltWith analysis for each domain
         for i, website_result in enumerate(results):
-            # Extract domain from website name or use the provided URL
-            if i < len(request.websites):
-                website_url = request.websites[i]
-            else:
-                # Fallback: construct domain from website name
-                website_url = website_result.name.lower().replace(" ", "") + ".com"
+            website_url = website_urls[i]
             
             print(f"\n[ANALYZE] Step 2.{i+1}: Analyzing {website_url}")
             print(f"   Website: {website_result.name}")
             print(f"   Global Rank: #{website_result.globalRank}")
             
             try:
-                builtwith_result = await builtwith_client.analyze_domain(website_url)
+                builtwith_result = builtwith_results.get(website_url)
+                if builtwith_result is None:
+                    builtwith_result = await builtwith_client.analyze_domain(website_url)
                 results[i].builtwith_result = builtwith_result
                 
                 tech_count = len(builtwith_result.technologies) if builtwith_result.technologies else 0
@@ -214,7 +406,6 @@ async def analyze_tech_stack(request: WebsiteAnalysisRequest):
             except Exception as e:
                 print(f"   [ERROR] Error analyzing {website_url}: {e}")
                 # Set empty BuiltWith result on error
-                from models import BuiltWithResult
                 results[i].builtwith_result = BuiltWithResult(domain=website_url, technologies=[])
         
         print("\n" + "=" * 60)
@@ -247,12 +438,12 @@ async def analyze_tech_stack(request: WebsiteAnalysisRequest):
         print(f"   Total technologies found: {total_technologies}")
         print("=" * 60)
 
-        return AnalysisResponse(
+        return json_response(AnalysisResponse(
             success=True,
             data=results,
             count=len(results),
             note=f"Step 2 complete: BuiltWith analysis added. Found {total_technologies} technologies across {len(results)} websites."
-        )
+        ))
 
     except Exception as e:
         print(f"\n[ERROR] Error in BuiltWith analysis: {str(e)}")
@@ -269,16 +460,75 @@ async def analyze_tech_stack(request: WebsiteAnalysisRequest):
             builtwith_data=mock_data
         )
             
-        return AnalysisResponse(
+        return json_response(AnalysisResponse(
             success=True,
             data=mock_data,
             count=len(mock_data),
             note=f"Step 2 complete (with fallback): BuiltWith analysis added. Error: {str(e)}"
-        )
+        ))
+
+
+@router.post("/api/analyze-full")
+async def analyze_full(request: WebsiteAnalysisRequest):
+    """SimilarWeb + BuiltWith in one call, running independent stages concurrently"""
+    if not request.websites:
+        raise HTTPException(status_code=400, detail="Please provide an array of websites to analyze")
+
+    logger.info(f"[PIPELINE] Full analysis for {len(request.websites)} websites")
+    ctx = {"websites": request.websites, "user_id": request.userId, "notes": []}
+    try:
+        run = await analysis_pipeline.run(ctx)
+    except PipelineError as e:
+        logger.error(f"[ERROR] Analysis pipeline failed at {e.stage}: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+    results = run["results"]["enrichment"]
+    total_technologies = sum(
+        len(item.builtwith_result.technologies) if item.builtwith_result else 0
+        for item in results
+    )
+    notes = ctx["notes"] + [f"{stage} failed: {error}" for stage, error in run["errors"].items()]
+    return json_response({
+        "success": True,
+        "data": results,
+        "count": len(results),
+        "session_id": run["results"]["persistence"],
+        "comparison": run["results"]["llm_context"],
+        "timings": run["timings"],
+        "note": " ".join(notes) or f"Full analysis complete: {total_technologies} technologies across {len(results)} websites."
+    })
+
+
+@router.post("/api/analyze/bulk")
+async def analyze_bulk(
+    file: UploadFile = File(...),
+    userId: str = Form(...),
+    format: str = Form(None),
+    save: bool = Form(False)
+):
+    """Analyze an uploaded CSV/NDJSON domain list, streaming one NDJSON line per domain"""
+    fmt = detect_format(file.filename, file.content_type, format)
+    if fmt not in ("csv", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be csv or ndjson")
+
+    logger.info(f"[BULK] Bulk analysis of {file.filename} ({fmt}) for user {userId}")
+    return StreamingResponse(
+        stream_bulk_analysis(
+            file,
+            fmt,
+            analysis_pipeline,
+            user_id=userId,
+            batch_size=config.bulk_batch_size,
+            concurrency=config.bulk_concurrency,
+            max_domains=config.bulk_max_domains,
+            persist=save
+        ),
+        media_type="application/x-ndjson"
+    )
 
 
 @router.post("/api/chat", response_model=ChatResponse)
-async def chat_with_analysis(request: ChatMessage):
+async def chat_with_analysis(request: ChatMessage, background_tasks: BackgroundTasks):
     """Chat endpoint with analysis data context"""
     logger.info(f"[CHAT] Received chat message: {request.message}")
     logger.info(f"   Analysis data size: {len(str(request.analysis_data))} characters")
@@ -288,19 +538,57 @@ async def chat_with_analysis(request: ChatMessage):
     print(f"OPENROUTER_API_KEY: {'YES' if config.openrouter_key else 'NO'}")
     
     try:
-        response = await openrouter_client.chat_completion(request.message, request.analysis_data)
+        # Load bounded conversation memory: last N turns verbatim plus running summary
+        history, summary = [], None
+        # Fairness lane in the LLM queue: the stored user UUID, as background summarization uses
+        lane = db_service.user_uuid(request.userId) if request.userId else request.session_id
+        if request.session_id:
+            session = await db_service.get_analysis_session(request.session_id)
+            if session:
+                lane = session.get("user_id") or lane
+                history, summary = conversation_memory.build_history(
+                    session.get("chat_discussion"),
+                    conversation_memory.load_summary(session)
+                )
+                logger.info(f"[MEMORY] Using {len(history)} history messages, summary: {'YES' if summary else 'NO'}")
+        
+        # Deterministic comparisons so the model quotes numbers instead of computing them
+        facts = metrics_engine.facts(openrouter_client.analyzed_sites(request.analysis_data))
+        response = await openrouter_client.chat_completion(
+            request.message,
+            request.analysis_data,
+            history=history,
+            summary=summary,
+            user_id=lane,
+            facts=facts
+        )
         
         # Save chat message to database if session_id is provided
-        if hasattr(request, 'session_id') and request.session_id:
-            await db_service.save_chat_message(
+        if request.session_id:
+            saved = await db_service.save_chat_message(
                 session_id=request.session_id,
                 message=request.message,
                 response=response.response
             )
+            # Fold turns that left the window into the summary after responding
+            if saved:
+                background_tasks.add_task(
+                    conversation_memory.fold,
+                    request.session_id,
+                    openrouter_client,
+                    db_service
+                )
         
         logger.info(f"[SUCCESS] Chat response generated successfully")
         print(f"[SUCCESS] Chat response generated successfully")
         return response
+    except (SchedulerQueueFullError, SchedulerTimeoutError) as e:
+        logger.warning(f"[BUSY] Chat request not scheduled: {e}")
+        raise HTTPException(status_code=503, detail="Chat is busy right now, please retry in a few seconds")
+    except LLMUnavailableError as e:
+        logger.error(f"[ERROR] No model answered the chat request: {e}")
+        print(f"[ERROR] No model answered the chat request: {e}")
+        raise HTTPException(status_code=503, detail="The AI models are unavailable right now, please retry later")
     except Exception as e:
         logger.error(f"[ERROR] Error in chat completion: {e}")
         print(f"[ERROR] Error in chat completion: {e}")
@@ -315,42 +603,361 @@ async def chat_with_analysis(request: ChatMessage):
         )
 
 
+@router.post("/api/compare")
+async def compare_websites(request: CompareRequest):
+    """Deterministic rankings, deltas, shares and z-scores across analyzed sites"""
+    sites = request.data
+    if not sites and request.session_id:
+        session = await db_service.get_analysis_session(request.session_id)
+        if not session:
+            raise HTTPException(status_code=404, detail="Analysis session not found")
+        sites = session.get("similarweb_data") or []
+
+    if not sites:
+        raise HTTPException(status_code=400, detail="Provide either data or a session_id to compare")
+
+    try:
+        comparison = metrics_engine.compare(sites)
+        logger.info(f"[COMPARE] Compared {len(comparison['domains'])} websites")
+        return {
+            "success": True,
+            "data": comparison,
+            "count": len(comparison["domains"])
+        }
+    except Exception as e:
+        logger.error(f"[ERROR] Error comparing websites: {e}")
+        raise HTTPException(status_code=500, detail=f"Error comparing websites: {str(e)}")
+
+
+async def _load_keyword_index(session_id: str = None, user_id: str = None):
+    """
+    (index, scope domains): a small index over one session's data, or the global
+    index restricted to every domain in the user's history
+    """
+    if session_id:
+        session = await db_service.get_session_fields(session_id, ["similarweb_data"])
+        if not session:
+            raise HTTPException(status_code=404, detail="Analysis session not found")
+        index = build_keyword_index([session])
+        return index, index.domains()
+    if user_id:
+        await keyword_index.ensure_loaded(db_service)
+        return keyword_index, keyword_index.user_domains(db_service.user_uuid(user_id))
+    raise HTTPException(status_code=400, detail="Provide either session_id or user_id")
+
+
+def _split_csv(value: str = None) -> List[str]:
+    return [d.strip() for d in value.split(",") if d.strip()] if value else []
+
+
+@router.get("/api/keywords/overlap")
+async def get_keyword_overlap(
+    session_id: str = None,
+    user_id: str = None,
+    domains: str = None,
+    min_domains: int = 2,
+    weight: float = 0.5,
+    limit: int = 50
+):
+    """Keywords shared by at least min_domains of the analyzed domains"""
+    index, scope = await _load_keyword_index(session_id, user_id)
+    if not scope:
+        return {"success": True, "data": [], "count": 0, "scope_domains": 0}
+    results = index.shared(_split_csv(domains) or scope, min_domains=min_domains, weight=weight, limit=limit)
+    return {"success": True, "data": results, "count": len(results), "scope_domains": len(scope)}
+
+
+@router.get("/api/keywords/unique/{domain}")
+async def get_unique_keywords(
+    domain: str,
+    session_id: str = None,
+    user_id: str = None,
+    among: str = None,
+    weight: float = 0.5,
+    limit: int = 50
+):
+    """Keywords only this domain ranks for"""
+    index, scope = await _load_keyword_index(session_id, user_id)
+    if not scope:
+        return {"success": True, "data": [], "count": 0, "scope_domains": 0}
+    results = index.unique(domain, _split_csv(among) or scope, weight=weight, limit=limit)
+    return {"success": True, "data": results, "count": len(results), "scope_domains": len(scope)}
+
+
+@router.get("/api/keywords/gap/{domain}")
+async def get_keyword_gap(
+    domain: str,
+    session_id: str = None,
+    user_id: str = None,
+    competitors: str = None,
+    weight: float = 0.5,
+    limit: int = 50
+):
+    """Keywords competitors rank for that this domain is missing, scored by volume/value"""
+    index, scope = await _load_keyword_index(session_id, user_id)
+    if not scope:
+        return {"success": True, "data": [], "count": 0, "scope_domains": 0}
+    results = index.gap(domain, _split_csv(competitors) or scope, weight=weight, limit=limit)
+    return {"success": True, "data": results, "count": len(results), "scope_domains": len(scope)}
+
+
+@router.get("/api/tech/domains")
+async def query_domains_by_technology(
+    tech_all: str = None,
+    tech_any: str = None,
+    tag_all: str = None,
+    tag_any: str = None,
+    user_id: str = None,
+    limit: int = 100
+):
+    """Analyzed domains using all of / any of the given technologies and tags"""
+    await tech_index.ensure_loaded(db_service)
+    try:
+        results = tech_index.query(
+            tech_all=_split_csv(tech_all),
+            tech_any=_split_csv(tech_any),
+            tag_all=_split_csv(tag_all),
+            tag_any=_split_csv(tag_any),
+            user_id=db_service.user_uuid(user_id) if user_id else None,
+            limit=limit
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"success": True, "data": results["domains"], "count": results["count"], "index": tech_index.stats()}
+
+
+@router.get("/api/tech/technologies")
+async def get_indexed_technologies(tag: str = None, limit: int = 50):
+    """Most widely used technologies across analyzed domains"""
+    await tech_index.ensure_loaded(db_service)
+    results = tech_index.technologies(limit=limit, tag=tag)
+    return {"success": True, "data": results, "count": len(results), "index": tech_index.stats()}
+
+
+@router.get("/api/similar/tech/{domain}")
+async def get_similar_tech_stacks(domain: str, k: int = 10, min_similarity: float = 0.0):
+    """Analyzed domains with the most similar technology stacks (MinHash estimate)"""
+    await tech_index.ensure_loaded(db_service)
+    try:
+        results = tech_lsh.similar(domain, k=k, min_similarity=min_similarity)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No technology data indexed for {domain}")
+    return {"success": True, "domain": domain, "data": results, "count": len(results), "index": tech_lsh.stats()}
+
+
+@router.get("/api/similar/traffic/{domain}")
+async def get_similar_traffic_profiles(domain: str, k: int = 10):
+    """Analyzed domains whose traffic sources, countries and engagement look most alike"""
+    await traffic_index.ensure_loaded(db_service)
+    try:
+        results = traffic_index.similar(domain, k=k)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No SimilarWeb data indexed for {domain}")
+    return {"success": True, "domain": domain, "data": results, "count": len(results), "index": traffic_index.stats()}
+
+
+@router.post("/api/similar/traffic/rebuild")
+async def rebuild_traffic_index():
+    """Rebuild the traffic-profile matrix from all stored sessions"""
+    count = await traffic_index.reload(db_service)
+    return {"success": True, "count": count, "index": traffic_index.stats()}
+
+
+def _parse_ranges(filters: List[str]) -> dict:
+    """["bounceRate:0.2:0.5", "totalVisits:1000000:"] -> {field: (min, max)}"""
+    ranges = {}
+    for value in filters or []:
+        field, _, bounds = value.partition(":")
+        low, _, high = bounds.partition(":")
+        try:
+            ranges[field.strip()] = (float(low) if low.strip() else None, float(high) if high.strip() else None)
+        except ValueError:
+            raise HTTPException(status_code=400, detail=f"Invalid filter '{value}'; use field:min:max")
+    return ranges
+
+
+@router.get("/api/domains/query")
+async def query_domains(
+    filter: List[str] = Query(None),
+    country: str = None,
+    sort: str = None,
+    limit: int = 50,
+    offset: int = 0
+):
+    """Range-filter, sort and page analyzed domains by their SimilarWeb metrics"""
+    await domain_metrics.ensure_loaded(db_service)
+    descending = bool(sort) and sort.startswith("-")
+    try:
+        results = domain_metrics.query(
+            ranges=_parse_ranges(filter),
+            countries=_split_csv(country),
+            sort=sort.lstrip("-+") if sort else None,
+            descending=descending,
+            limit=max(1, min(limit, 1000)),
+            offset=max(offset, 0)
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response({
+        "success": True,
+        "data": results["domains"],
+        "count": results["count"],
+        "index": domain_metrics.stats()
+    })
+
+
+@router.get("/api/domains/{domain}/trend")
+async def get_domain_trend(domain: str, fields: str = None, since: str = None, until: str = None):
+    """Metric time series and technology add/remove events of one domain"""
+    await domain_history.ensure_loaded(db_service)
+    try:
+        trend = domain_history.trend(domain, fields=_split_csv(fields), since=since, until=until)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No history for {domain}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response({"success": True, "data": trend, "count": len(trend["timestamps"])})
+
+
+@router.get("/api/domains/{domain}/changes")
+async def get_domain_changes(domain: str, since: str = None, until: str = None):
+    """Metric deltas, rank moves and technology changes between two snapshots of one domain"""
+    await domain_history.ensure_loaded(db_service)
+    try:
+        changes = domain_history.changes(domain, since=since, until=until)
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"No history for {domain}")
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return json_response({"success": True, "data": changes})
+
+
+@router.post("/api/crawl/competitors")
+async def crawl_competitor_graph(request: CompetitorCrawlRequest):
+    """Expand topSimilarityCompetitors breadth-first into a weighted competitor graph"""
+    if not request.websites:
+        raise HTTPException(status_code=400, detail="Please provide an array of seed websites")
+
+    max_depth = max(0, min(request.max_depth, config.crawl_max_depth))
+    max_nodes = max(1, min(request.max_nodes, config.crawl_max_nodes))
+    logger.info(f"[CRAWL] Crawling from {request.websites} (depth {max_depth}, budget {max_nodes})")
+
+    graph = await competitor_crawler.crawl(
+        request.websites,
+        max_depth=max_depth,
+        max_nodes=max_nodes,
+        min_affinity=request.min_affinity
+    )
+    note = None if apify_client else "APIFY_API_TOKEN not set: only cached snapshots were expanded"
+    return {"success": True, "data": graph, "count": len(graph["nodes"]), "note": note}
+
+
+@router.post("/api/tracked")
+async def track_domains(request: TrackDomainsRequest):
+    """Add domains to the user's scheduled re-analysis watchlist"""
+    if not request.websites:
+        raise HTTPException(status_code=400, detail="Please provide an array of websites to track")
+    if request.interval_hours is not None and request.interval_hours <= 0:
+        raise HTTPException(status_code=400, detail="interval_hours must be positive")
+    tracked = refresh_scheduler.track(request.userId, request.websites, request.interval_hours)
+    return {"success": True, "data": tracked, "count": len(tracked)}
+
+
+@router.get("/api/tracked")
+async def list_tracked_domains(user_id: str = None):
+    """Tracked domains with their next refresh time and last detected changes"""
+    tracked = refresh_scheduler.tracked(user_id)
+    return {"success": True, "data": tracked, "count": len(tracked), "scheduler": refresh_scheduler.stats()}
+
+
+@router.delete("/api/tracked/{domain}")
+async def untrack_domain(domain: str, user_id: str):
+    """Stop refreshing a domain for the user"""
+    if not refresh_scheduler.untrack(user_id, domain):
+        raise HTTPException(status_code=404, detail="Domain is not tracked")
+    return {"success": True, "message": f"{domain} is no longer tracked"}
+
+
+@router.post("/api/tracked/refresh")
+async def refresh_tracked_domains():
+    """Refresh due domains now, ignoring the off-peak window"""
+    result = await refresh_scheduler.run_once(force=True)
+    return {"success": True, "data": result}
+
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {
         "status": "healthy",
-        "services": config.get_health_status()
+        "services": config.get_health_status(),
+        "llm_models": openrouter_client.router.snapshot(),
+        "builtwith_cache": tech_stack_cache.stats(),
+        "refresh_scheduler": refresh_scheduler.stats()
+    }
+
+
+@router.get("/api/metrics/llm")
+async def get_llm_metrics():
+    """LLM queue depth, wait times and per-model latency"""
+    return {
+        "success": True,
+        "scheduler": llm_scheduler.metrics(),
+        "models": openrouter_client.router.snapshot()
     }
 
 
 @router.get("/api/history/{user_id}")
-async def get_user_history(user_id: str, limit: int = 50):
-    """Get user's analysis history"""
+async def get_user_history(user_id: str, request: Request, limit: int = 50, stream: str = None):
+    """Get user's analysis history (stream=json|ndjson encodes it page by page; limit=0 streams all)"""
+    if stream:
+        if stream not in ("json", "ndjson"):
+            raise HTTPException(status_code=400, detail="stream must be 'json' or 'ndjson'")
+        sessions = db_service.iter_user_history(user_id, limit=max(limit, 0), page_size=config.history_page_size)
+        if stream == "ndjson":
+            return StreamingResponse(stream_ndjson(sessions), media_type="application/x-ndjson")
+        return StreamingResponse(stream_json_array(sessions, extra={"success": True}), media_type="application/json")
+    
     try:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            versions = await db_service.get_history_versions(user_id, limit)
+            etag = history_etag("history", user_id, limit, versions)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        
         history = await db_service.get_user_history(user_id, limit)
-        return {
+        return json_response({
             "success": True,
             "data": history,
             "count": len(history)
-        }
+        }, headers=cache_headers(history_etag("history", user_id, limit, history)))
     except Exception as e:
         logger.error(f"[ERROR] Error retrieving user history: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving history: {str(e)}")
 
 
 @router.get("/api/session/{session_id}")
-async def get_analysis_session(session_id: str):
+async def get_analysis_session(session_id: str, request: Request):
     """Get a specific analysis session"""
     try:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            version = await db_service.get_session_version(session_id)
+            # An unknown session is a 404 even for "If-None-Match: *"
+            if version is not None:
+                etag = session_etag(session_id, version)
+                if etag_matches(if_none_match, etag):
+                    return not_modified(etag)
+        
         session = await db_service.get_analysis_session(session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Analysis session not found")
         
-        return {
+        return json_response({
             "success": True,
             "data": session
-        }
+        }, headers=cache_headers(session_etag(session_id, session["updated_at"])))
     except HTTPException:
         raise
     except Exception as e:
@@ -377,10 +984,36 @@ async def delete_analysis_session(session_id: str, user_id: str):
         raise HTTPException(status_code=500, detail=f"Error deleting session: {str(e)}")
 
 
+@router.get("/api/export/{user_id}")
+async def export_history(user_id: str, table: str = "domains", format: str = "csv"):
+    """Stream one flattened table (domains, keywords, technologies, ...) over all of a user's sessions"""
+    if table not in EXPORT_TABLES:
+        raise HTTPException(status_code=400, detail=f"table must be one of: {', '.join(EXPORT_TABLES)}")
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail=f"format must be one of: {', '.join(EXPORT_FORMATS)}")
+    if format != "csv" and not pyarrow_available():
+        raise HTTPException(status_code=501, detail=f"{format} export needs pyarrow on the server; use format=csv")
+    
+    media_type, extension = EXPORT_FORMATS[format]
+    sessions = db_service.iter_user_history(user_id, page_size=config.history_page_size)
+    return StreamingResponse(
+        stream_table(sessions, table, format, config.export_row_group_rows),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{table}.{extension}"'}
+    )
+
+
 @router.get("/api/history/{user_id}/domains")
-async def get_user_analyzed_domains(user_id: str):
+async def get_user_analyzed_domains(user_id: str, request: Request):
     """Get list of domains the user has analyzed"""
     try:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match:
+            versions = await db_service.get_history_versions(user_id)
+            etag = history_etag("domains", user_id, 50, versions)
+            if etag_matches(if_none_match, etag):
+                return not_modified(etag)
+        
         history = await db_service.get_user_history(user_id)
         
         # Extract unique domains from history
@@ -389,11 +1022,11 @@ async def get_user_analyzed_domains(user_id: str):
             if session.get('domains'):
                 domains.update(session['domains'])
         
-        return {
+        return json_response({
             "success": True,
             "data": list(domains),
             "count": len(domains)
-        }
+        }, headers=cache_headers(history_etag("domains", user_id, 50, history)))
     except Exception as e:
         logger.error(f"[ERROR] Error retrieving user domains: {e}")
         raise HTTPException(status_code=500, detail=f"Error retrieving domains: {str(e)}")
@@ -0,0 +1,78 @@
+"""
+In-memory cache of recent SimilarWeb snapshots per domain
+
+Apify actor runs are slow and billed per domain, so recently fetched
+ApifyResults are kept per normalized domain for a TTL. Features that fan out
+to many domains (like the competitor crawl) check the cache first and only
+send the misses upstream.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from domain_utils import normalize_domain
+from models import ApifyResult
+
+logger = logging.getLogger(__name__)
+
+
+class SnapshotCache:
+    """TTL + LRU cache of ApifyResult keyed by normalized domain"""
+
+    def __init__(self, ttl_seconds: float = 86400.0, max_entries: int = 5000):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[float, ApifyResult]]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, domain: str) -> Optional[ApifyResult]:
+        domain = normalize_domain(domain)
+        entry = self._entries.get(domain)
+        if entry is None or time.time() - entry[0] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[domain]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(domain)
+        self.hits += 1
+        return entry[1].model_copy(deep=True)
+
+    def get_many(self, domains: Iterable[str]) -> Tuple[Dict[str, ApifyResult], List[str]]:
+        """Split domains into cached snapshots and misses"""
+        found: Dict[str, ApifyResult] = {}
+        missing: List[str] = []
+        for domain in domains:
+            snapshot = self.get(domain)
+            if snapshot is None:
+                missing.append(domain)
+            else:
+                found[domain] = snapshot
+        return found, missing
+
+    def put(self, result: ApifyResult, domain: Optional[str] = None):
+        domain = normalize_domain(domain or result.name)
+        if not domain:
+            return
+        snapshot = result.model_copy(update={"builtwith_result": None}, deep=True)
+        self._entries[domain] = (time.time(), snapshot)
+        self._entries.move_to_end(domain)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def put_many(self, results: Iterable[ApifyResult]):
+        for result in results:
+            self.put(result)
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "ttl_seconds": self.ttl_seconds
+        }
@@ -0,0 +1,272 @@
+"""
+Inverted technology index: "which analyzed domains use X?"
+
+Maps normalized technology names and tags to the set of domains using them
+(and the sessions those domains were analyzed in). Domains are interned to
+integer ids and every posting list is an integer bitmap, so AND/OR queries
+are a handful of big-int `&` / `|` operations instead of a scan over every
+session's JSON. The index is kept up to date incrementally whenever BuiltWith
+data is stored.
+"""
+
+import asyncio
+import heapq
+import logging
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Set
+
+from domain_utils import normalize_domain, parse_timestamp
+from mock_data import observed_results
+from tech_similarity import tech_lsh
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_term(value: str) -> str:
+    """Lowercase and collapse whitespace so "Google  Analytics" == "google analytics" """
+    return " ".join((value or "").lower().split())
+
+
+class TechIndex:
+    """Technology/tag -> domain bitmaps with per-domain and per-user bookkeeping"""
+
+    def __init__(self, lsh=None):
+        self.lsh = lsh  # Optional TechLSHIndex kept in step with the postings
+        self._domain_ids: Dict[str, int] = {}
+        self._domains: List[str] = []
+        # technology / tag -> bitmap of domain ids
+        self._tech_postings: Dict[str, int] = defaultdict(int)
+        self._tag_postings: Dict[str, int] = defaultdict(int)
+        self._tech_names: Dict[str, str] = {}  # normalized -> display name
+        # domain id -> what it is currently indexed under
+        self._domain_techs: Dict[int, Set[str]] = {}
+        self._domain_tags: Dict[int, Set[str]] = {}
+        self._domain_updated: Dict[int, datetime] = {}
+        self._domain_sessions: Dict[int, Set[str]] = defaultdict(set)
+        self._session_users: Dict[str, str] = {}
+        self._user_domains: Dict[str, int] = defaultdict(int)
+        self.loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+
+    def __len__(self) -> int:
+        return len(self._domain_techs)
+
+    def _domain_id(self, domain: str) -> int:
+        if domain not in self._domain_ids:
+            self._domain_ids[domain] = len(self._domains)
+            self._domains.append(domain)
+        return self._domain_ids[domain]
+
+    def index_domain(
+        self,
+        domain: str,
+        technologies: Iterable[Any],
+        session_id: Optional[str] = None,
+        user_id: Optional[str] = None,
+        updated_at: Optional[str] = None
+    ) -> bool:
+        """Replace a domain's technologies unless a newer analysis is already indexed"""
+        domain = normalize_domain(domain)
+        if not domain:
+            return False
+        domain_id = self._domain_id(domain)
+        updated_at = parse_timestamp(updated_at)
+
+        if session_id:
+            self._domain_sessions[domain_id].add(session_id)
+            if user_id:
+                self._session_users[session_id] = user_id
+            user_id = user_id or self._session_users.get(session_id)
+        bit = 1 << domain_id
+        if user_id:
+            self._user_domains[user_id] |= bit
+
+        if self._domain_updated.get(domain_id, datetime.min) > updated_at:
+            return False
+        self._unindex(domain_id)
+
+        techs, tags = set(), set()
+        for tech in technologies or []:
+            if not isinstance(tech, dict):
+                tech = tech.model_dump()
+            name = normalize_term(tech.get("name", ""))
+            if not name:
+                continue
+            techs.add(name)
+            self._tech_names.setdefault(name, tech["name"].strip())
+            tag = normalize_term(tech.get("tag", ""))
+            if tag:
+                tags.add(tag)
+
+        for name in techs:
+            self._tech_postings[name] |= bit
+        for tag in tags:
+            self._tag_postings[tag] |= bit
+        self._domain_techs[domain_id] = techs
+        self._domain_tags[domain_id] = tags
+        self._domain_updated[domain_id] = updated_at
+        if self.lsh is not None:
+            self.lsh.update(domain, techs)
+        return True
+
+    def _unindex(self, domain_id: int):
+        clear = ~(1 << domain_id)
+        for name in self._domain_techs.pop(domain_id, ()):
+            self._tech_postings[name] &= clear
+        for tag in self._domain_tags.pop(domain_id, ()):
+            self._tag_postings[tag] &= clear
+        self._domain_updated.pop(domain_id, None)
+
+    def index_session(
+        self,
+        session_id: str,
+        builtwith_data: Iterable[Any],
+        user_id: Optional[str] = None,
+        updated_at: Optional[str] = None
+    ) -> int:
+        """Index every BuiltWith result stored in a session; returns domains indexed"""
+        indexed = 0
+        for item in builtwith_data or []:
+            if not isinstance(item, dict):
+                item = item.model_dump()
+            builtwith = item.get("builtwith_result")
+            if not builtwith:
+                continue
+            if self.index_domain(
+                builtwith.get("domain") or item.get("name", ""),
+                builtwith.get("technologies"),
+                session_id=session_id,
+                user_id=user_id,
+                updated_at=updated_at
+            ):
+                indexed += 1
+        return indexed
+
+    def remove_session(self, session_id: str) -> List[str]:
+        """
+        Forget a deleted session; domains left without any session are dropped.
+        The technologies of every domain it touched are unindexed, since they may have
+        come from this session; returns the domains other sessions still hold, which
+        reindex_domains restores from those sessions.
+        """
+        user_id = self._session_users.pop(session_id, None)
+        remaining = []
+        for domain_id, sessions in list(self._domain_sessions.items()):
+            if session_id not in sessions:
+                continue
+            sessions.discard(session_id)
+            clear = ~(1 << domain_id)
+            self._unindex(domain_id)
+            if self.lsh is not None:
+                self.lsh.remove(self._domains[domain_id])
+            if not sessions:
+                del self._domain_sessions[domain_id]
+                for user in self._user_domains:
+                    self._user_domains[user] &= clear
+                continue
+            remaining.append(self._domains[domain_id])
+            if user_id and not any(self._session_users.get(s) == user_id for s in sessions):
+                self._user_domains[user_id] &= clear
+        return remaining
+
+    async def reindex_domains(self, db, domains: Iterable[str]) -> int:
+        """Re-index the given domains from stored sessions (newest analysis wins)"""
+        wanted = {normalize_domain(domain) for domain in domains}
+        indexed = 0
+        async for session in db.iter_sessions():
+            builtwith_data = [
+                item for item in observed_results(session.get("builtwith_data"))
+                if normalize_domain((item.get("builtwith_result") or {}).get("domain") or item.get("name", "")) in wanted
+            ]
+            indexed += self.index_session(
+                session["id"], builtwith_data, user_id=session.get("user_id"), updated_at=session.get("created_at")
+            )
+        return indexed
+
+    def query(
+        self,
+        tech_all: Optional[Iterable[str]] = None,
+        tech_any: Optional[Iterable[str]] = None,
+        tag_all: Optional[Iterable[str]] = None,
+        tag_any: Optional[Iterable[str]] = None,
+        user_id: Optional[str] = None,
+        limit: int = 100
+    ) -> Dict[str, Any]:
+        """
+        Domains using every technology/tag in the *_all lists and at least one
+        from each non-empty *_any list, optionally restricted to one user.
+        """
+        masks = [self._tech_postings.get(normalize_term(t), 0) for t in tech_all or []]
+        masks += [self._tag_postings.get(normalize_term(t), 0) for t in tag_all or []]
+        for postings, terms in ((self._tech_postings, tech_any), (self._tag_postings, tag_any)):
+            if terms:
+                any_mask = 0
+                for term in terms:
+                    any_mask |= postings.get(normalize_term(term), 0)
+                masks.append(any_mask)
+        if not masks:
+            raise ValueError("Provide at least one technology or tag to filter on")
+        if user_id:
+            masks.append(self._user_domains.get(user_id, 0))
+
+        matches = masks[0]
+        for mask in masks[1:]:
+            matches &= mask
+
+        # Lowest bits first: domains come back in the order they were first analyzed
+        domain_ids = []
+        remaining = matches
+        while remaining and len(domain_ids) < limit:
+            low = remaining & -remaining
+            domain_ids.append(low.bit_length() - 1)
+            remaining ^= low
+
+        return {
+            "count": matches.bit_count(),
+            "domains": [
+                {"domain": self._domains[d], "sessions": sorted(self._domain_sessions.get(d, ()))}
+                for d in domain_ids
+            ]
+        }
+
+    def technologies(self, limit: int = 50, tag: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Most widely used technologies across indexed domains"""
+        wanted = self._tag_postings.get(normalize_term(tag), 0) if tag else -1
+        counts = ((name, (domains & wanted).bit_count()) for name, domains in self._tech_postings.items())
+        top = heapq.nlargest(limit, (c for c in counts if c[1]), key=lambda c: c[1])
+        return [{"technology": self._tech_names.get(name, name), "domains": count} for name, count in top]
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "domains": len(self._domain_techs),
+            "technologies": sum(1 for d in self._tech_postings.values() if d),
+            "tags": sum(1 for d in self._tag_postings.values() if d),
+            "sessions": len(self._session_users)
+        }
+
+    async def ensure_loaded(self, db):
+        """Build the index from stored sessions once per process"""
+        if self.loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if self.loaded:
+                return
+            sessions = 0
+            async for session in db.iter_sessions():
+                sessions += 1
+                self._session_users.setdefault(session["id"], session.get("user_id"))
+                self.index_session(
+                    session["id"],
+                    observed_results(session.get("builtwith_data")),
+                    user_id=session.get("user_id"),
+                    updated_at=session.get("created_at")
+                )
+            self.loaded = True
+            logger.info(f"[TECH INDEX] Indexed {len(self)} domains from {sessions} sessions")
+
+
+# Global technology index, filled lazily from the database and kept current on writes
+tech_index = TechIndex(lsh=tech_lsh)
@@ -0,0 +1,133 @@
+"""
+Tech-stack lookalike search with MinHash signatures and LSH banding
+
+Each domain's technology set is reduced to a fixed-size MinHash signature.
+Signatures are cut into bands and every band is hashed into a bucket, so a
+lookalike query only scores the domains that share at least one bucket with
+the target instead of computing Jaccard against every analyzed domain.
+"""
+
+import hashlib
+import heapq
+import logging
+from collections import defaultdict
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+import numpy as np
+
+from domain_utils import normalize_domain
+
+logger = logging.getLogger(__name__)
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+@lru_cache(maxsize=65536)
+def _token_hash(token: str) -> int:
+    """Stable 32-bit hash (Python's hash() is salted per process)"""
+    return int.from_bytes(hashlib.blake2b(token.encode("utf-8"), digest_size=4).digest(), "little")
+
+
+class TechLSHIndex:
+    """MinHash LSH index over domain technology sets"""
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        generator = np.random.RandomState(seed)
+        self._a = generator.randint(1, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._b = generator.randint(0, (1 << 61) - 1, size=num_perm, dtype=np.uint64)
+        self._signatures: Dict[str, np.ndarray] = {}
+        self._sizes: Dict[str, int] = {}
+        # band -> bucket key -> domains
+        self._buckets: List[Dict[bytes, Set[str]]] = [defaultdict(set) for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self._signatures)
+
+    @property
+    def threshold(self) -> float:
+        """Similarity at which a pair becomes a candidate with ~50% probability"""
+        return (1 / self.bands) ** (1 / self.rows)
+
+    def signature(self, technologies: Iterable[str]) -> np.ndarray:
+        hashes = np.array(sorted({_token_hash(t) for t in technologies}), dtype=np.uint64)
+        if not len(hashes):
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        # Universal hashing a*x+b mod p; uint64 wraparound in a*x is intended
+        with np.errstate(over="ignore"):
+            permuted = (np.outer(self._a, hashes) + self._b[:, None]) % MERSENNE_PRIME
+        return (permuted & MAX_HASH).min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+
+    def update(self, domain: str, technologies: Iterable[str]):
+        """Insert or replace a domain's technology set"""
+        domain = normalize_domain(domain)
+        technologies = set(technologies or ())
+        self.remove(domain)
+        if not domain or not technologies:
+            return
+        signature = self.signature(technologies)
+        self._signatures[domain] = signature
+        self._sizes[domain] = len(technologies)
+        for band, key in enumerate(self._band_keys(signature)):
+            self._buckets[band][key].add(domain)
+
+    def remove(self, domain: str):
+        domain = normalize_domain(domain)
+        signature = self._signatures.pop(domain, None)
+        if signature is None:
+            return
+        self._sizes.pop(domain, None)
+        for band, key in enumerate(self._band_keys(signature)):
+            bucket = self._buckets[band].get(key)
+            if bucket is not None:
+                bucket.discard(domain)
+                if not bucket:
+                    del self._buckets[band][key]
+
+    def _candidates(self, signature: np.ndarray) -> Set[str]:
+        candidates: Set[str] = set()
+        for band, key in enumerate(self._band_keys(signature)):
+            candidates |= self._buckets[band].get(key, set())
+        return candidates
+
+    def similar(self, domain: str, k: int = 10, min_similarity: float = 0.0) -> List[Dict[str, Any]]:
+        """Top-k lookalikes of an indexed domain with estimated Jaccard similarity"""
+        domain = normalize_domain(domain)
+        signature = self._signatures.get(domain)
+        if signature is None:
+            raise KeyError(domain)
+
+        candidates = [c for c in self._candidates(signature) if c != domain]
+        if not candidates:
+            return []
+        matrix = np.stack([self._signatures[c] for c in candidates])
+        scores = (matrix == signature).mean(axis=1)
+
+        ranked: List[Tuple[float, str]] = heapq.nlargest(
+            k, ((float(score), c) for score, c in zip(scores, candidates) if score >= min_similarity)
+        )
+        return [
+            {"domain": c, "similarity": round(score, 3), "technologies": self._sizes[c]}
+            for score, c in ranked
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "domains": len(self._signatures),
+            "num_perm": self.num_perm,
+            "bands": self.bands,
+            "threshold": round(self.threshold, 3)
+        }
+
+
+# Global lookalike index, fed by the technology index on every BuiltWith write
+tech_lsh = TechLSHIndex()
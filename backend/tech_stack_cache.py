@@ -0,0 +1,186 @@
+"""
+BuiltWith result cache with speculative prefetch
+
+Step 2 (/api/analyze-tech-stack) nearly always follows Step 1 for the same
+domains, so Step 1 kicks off low-priority BuiltWith lookups in the
+background. Finished results live in a TTL cache and lookups still running
+are shared as futures, so Step 2 mostly awaits work that is already done or
+under way. A domain is never looked up twice at the same time, and a
+prefetch still queued for a slot is promoted as soon as a foreground
+request waits on it. Mock results are never cached.
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from domain_utils import normalize_domain
+from models import BuiltWithResult
+
+logger = logging.getLogger(__name__)
+
+
+class TechStackCache:
+    """Single-flight, TTL-bounded cache in front of BuiltWithClientFixed.analyze_domains"""
+
+    def __init__(
+        self,
+        builtwith_client,
+        ttl_seconds: float = 86400.0,
+        max_entries: int = 5000,
+        prefetch_concurrency: int = 1
+    ):
+        self.client = builtwith_client
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.prefetch_concurrency = max(1, prefetch_concurrency)
+        self._results: "OrderedDict[str, Tuple[float, BuiltWithResult]]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self._background: Set[asyncio.Task] = set()
+        self._prefetch_slots: Optional[asyncio.Semaphore] = None
+        # domain -> event that lets its queued prefetch skip the prefetch slots
+        self._promotions: Dict[str, asyncio.Event] = {}
+        self.counters = {"hits": 0, "inflight_hits": 0, "misses": 0, "prefetched": 0, "promoted": 0}
+
+    def _cached(self, domain: str) -> Optional[BuiltWithResult]:
+        entry = self._results.get(domain)
+        if entry is None:
+            return None
+        if time.time() - entry[0] > self.ttl_seconds:
+            del self._results[domain]
+            return None
+        self._results.move_to_end(domain)
+        return entry[1]
+
+    def _store(self, domain: str, result: BuiltWithResult):
+        # Empty results mean the lookup failed and mock stacks are placeholders;
+        # let the next request retry either
+        if not result.technologies or result.mock:
+            return
+        self._results[domain] = (time.time(), result)
+        self._results.move_to_end(domain)
+        while len(self._results) > self.max_entries:
+            self._results.popitem(last=False)
+
+    def _start(self, domains: List[str], background: bool) -> asyncio.Task:
+        """Register futures for the domains and start one batched lookup for them"""
+        loop = asyncio.get_running_loop()
+        futures = {domain: loop.create_future() for domain in domains}
+        self._inflight.update(futures)
+
+        promoted = asyncio.Event()
+        if background:
+            self._promotions.update((domain, promoted) for domain in domains)
+
+        async def run():
+            try:
+                holds_slot = background and await self._wait_for_slot(promoted)
+                for domain in domains:
+                    if self._promotions.get(domain) is promoted:
+                        del self._promotions[domain]
+                try:
+                    results = await self.client.analyze_domains(domains)
+                finally:
+                    if holds_slot:
+                        self._prefetch_slots.release()
+                for domain, future in futures.items():
+                    result = results.get(domain) or BuiltWithResult(domain=domain, technologies=[])
+                    self._store(domain, result)
+                    if not future.done():
+                        future.set_result(result)
+            except BaseException as e:
+                for future in futures.values():
+                    if not future.done():
+                        future.set_exception(e)
+                        # Nobody may be waiting on a speculative lookup
+                        future.exception()
+                if not isinstance(e, Exception):
+                    raise
+            finally:
+                for domain, future in futures.items():
+                    if self._inflight.get(domain) is future:
+                        del self._inflight[domain]
+
+        task = asyncio.create_task(run())
+        self._background.add(task)
+        task.add_done_callback(self._background.discard)
+        return task
+
+    async def _wait_for_slot(self, promoted: asyncio.Event) -> bool:
+        """Wait for a prefetch slot; False when promoted first (the lookup then runs without one)"""
+        if self._prefetch_slots is None:
+            self._prefetch_slots = asyncio.Semaphore(self.prefetch_concurrency)
+        acquire = asyncio.ensure_future(self._prefetch_slots.acquire())
+        promote = asyncio.ensure_future(promoted.wait())
+        try:
+            await asyncio.wait({acquire, promote}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            promote.cancel()
+            if not acquire.done():
+                acquire.cancel()
+                await asyncio.wait({acquire})
+        # The acquire may have won the race with its cancellation: then the slot is held
+        return not acquire.cancelled()
+
+    def _pending(self, domains: Iterable[str]) -> List[str]:
+        seen = set()
+        pending = []
+        for domain in domains:
+            if domain and domain not in seen and self._cached(domain) is None and domain not in self._inflight:
+                seen.add(domain)
+                pending.append(domain)
+        return pending
+
+    def prefetch(self, domains: Iterable[str]) -> int:
+        """Start background lookups for domains not cached or already in flight"""
+        if not getattr(self.client, "api_key", None):
+            return 0  # Mock results are instant; nothing to gain
+        pending = self._pending(normalize_domain(d) for d in domains)
+        if pending:
+            self._start(pending, background=True)
+            self.counters["prefetched"] += len(pending)
+            print(f"[PREFETCH] Started speculative BuiltWith lookup for {len(pending)} domains")
+        return len(pending)
+
+    async def analyze_domains(self, domains: List[str]) -> Dict[str, BuiltWithResult]:
+        """Results keyed by the domains as passed in, reusing cached and in-flight lookups"""
+        keys = {domain: normalize_domain(domain) or domain for domain in domains}
+        pending = self._pending(keys.values())
+        if pending:
+            self._start(pending, background=False)
+
+        # Capture the futures now; finished lookups leave the in-flight map
+        cached = {key: self._cached(key) for key in keys.values()}
+        futures = {key: self._inflight.get(key) for key, result in cached.items() if result is None}
+
+        results: Dict[str, BuiltWithResult] = {}
+        for domain, key in keys.items():
+            if cached[key] is not None:
+                self.counters["hits"] += 1
+                results[domain] = cached[key]
+                continue
+
+            future = futures[key]
+            if key in pending:
+                self.counters["misses"] += 1
+            else:
+                self.counters["inflight_hits"] += 1
+                promotion = self._promotions.pop(key, None)
+                if promotion is not None and not promotion.is_set():
+                    # A foreground request must not wait behind other prefetch batches
+                    promotion.set()
+                    self.counters["promoted"] += 1
+            try:
+                results[domain] = await asyncio.shield(future)
+            except Exception as e:
+                # The shared lookup failed as a whole: look this domain up directly
+                print(f"[ERROR] Shared BuiltWith lookup failed for {domain}: {e}")
+                result = (await self.client.analyze_domains([domain]))[domain]
+                self._store(key, result)
+                results[domain] = result
+        return results
+
+    def stats(self) -> Dict[str, int]:
+        return dict(self.counters, entries=len(self._results), inflight=len(self._inflight))
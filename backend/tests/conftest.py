@@ -0,0 +1,32 @@
+"""
+Shared fixtures for the backend unit tests
+
+The backend is a flat set of modules imported by name (as uvicorn runs it
+from backend/), so put backend/ on sys.path before the tests import them.
+"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from mock_data import get_mock_data  # noqa: E402
+
+
+@pytest.fixture
+def make_result():
+    """ApifyResult dict for `name` built from the mock snapshot, with fields overridden"""
+    base = dict(get_mock_data()[0].model_dump(), mock=False)
+
+    def make(name, technologies=None, **fields):
+        data = dict(base, name=name, **fields)
+        if technologies is not None:
+            data["builtwith_result"] = {
+                "domain": name,
+                "technologies": [{"name": tech, "tag": "Other"} for tech in technologies],
+            }
+        return data
+
+    return make
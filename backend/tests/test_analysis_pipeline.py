@@ -0,0 +1,59 @@
+import asyncio
+
+from analysis_pipeline import build_analysis_pipeline
+from models import ApifyResult, BuiltWithResult, Technology
+
+
+class FakeSnapshots:
+    def __init__(self, found):
+        self.found = found
+
+    def get_many(self, domains):
+        return {d: self.found[d] for d in domains if d in self.found}, [d for d in domains if d not in self.found]
+
+    def put_many(self, results):
+        pass
+
+
+class FailingApify:
+    async def analyze_domains(self, domains):
+        raise RuntimeError("actor down")
+
+
+class FakeTech:
+    async def analyze_domains(self, domains):
+        return {d: BuiltWithResult(domain=d, technologies=[Technology(name=f"T-{d}", tag="x")]) for d in domains}
+
+
+class FakeDB:
+    def __init__(self):
+        self.saved = None
+
+    async def save_analysis_session(self, user_id, domains, similarweb_data, builtwith_data):
+        self.saved = similarweb_data
+        return "session"
+
+
+def run(make_result, allow_mock):
+    cached = ApifyResult(**make_result("cached.com"))
+    db = FakeDB()
+    pipeline = build_analysis_pipeline(FailingApify(), FakeTech(), FakeSnapshots({"cached.com": cached}), db)
+    ctx = {"websites": ["cached.com", "missing.com"], "user_id": "u", "notes": [], "allow_mock": allow_mock}
+    return asyncio.run(pipeline.run(ctx))["results"]["enrichment"], db.saved
+
+
+def test_cached_snapshots_survive_an_apify_failure(make_result):
+    rows, saved = run(make_result, allow_mock=True)
+    assert [(r.name, r.mock) for r in rows] == [("cached.com", False), ("ooredoo.tn", True)]
+    assert saved is rows
+
+
+def test_mock_rows_get_no_builtwith_data(make_result):
+    rows, _ = run(make_result, allow_mock=True)
+    assert rows[0].builtwith_result.technologies[0].name == "T-cached.com"
+    assert rows[1].builtwith_result is None
+
+
+def test_without_mock_only_real_rows_are_returned(make_result):
+    rows, _ = run(make_result, allow_mock=False)
+    assert [r.name for r in rows] == ["cached.com"]
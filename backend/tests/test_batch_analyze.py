@@ -0,0 +1,38 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+
+from batch_analyze import run_batches
+from models import ApifyResult, BuiltWithResult, Technology
+
+
+class FakePipeline:
+    def __init__(self, make_result):
+        self.make_result = make_result
+
+    async def run(self, ctx):
+        stacks = {
+            domain: BuiltWithResult(domain=domain, technologies=[Technology(name="React", tag="JS")],
+                                    mock=domain.startswith("mock"))
+            for domain in ctx["websites"]
+        }
+        return {"results": {"similarweb": [ApifyResult(**self.make_result(d)) for d in ctx["websites"]],
+                            "builtwith": stacks}}
+
+
+class ListWriter:
+    def __init__(self):
+        self.tables = []
+
+    def write(self, tables):
+        self.tables.append(tables)
+
+
+def test_mock_stacks_are_dropped_per_domain(make_result):
+    with ThreadPoolExecutor(max_workers=1) as pool:
+        result = asyncio.run(run_batches(
+            ["real.com", "mock.com", "real2.com"], FakePipeline(make_result), pool, ListWriter(),
+            batch_size=2, concurrency=2, run=("batch-1", "2026-01-01T00:00:00+00:00")
+        ))
+    assert result["stats"]["with_similarweb"] == 3
+    assert result["stats"]["with_technologies"] == 2
+    assert result["aggregates"]["technologies"] == {"React": 2}
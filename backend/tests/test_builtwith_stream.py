@@ -0,0 +1,69 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+from clients import builtwith_client_fixed
+from clients.builtwith_client_fixed import BuiltWithClientFixed
+from clients.builtwith_stream import BatchTechnologyStreamParser, BuiltWithStreamError, TechnologyStreamParser
+
+
+def response(paths):
+    return json.dumps({"Results": [{"Lookup": lookup, "Result": {"Paths": [
+        {"Domain": domain, "Technologies": [{"Name": name, "Tag": "cms"} for name in names]}
+        for domain, names in domains
+    ]}} for lookup, domains in paths]}, indent=1).encode("utf-8")
+
+
+def feed_in_chunks(parser, body, size):
+    items = []
+    for start in range(0, len(body), size):
+        items += parser.feed(body[start:start + size])
+    return items
+
+
+@pytest.mark.parametrize("size", [1, 7, 64, 100000])
+def test_technologies_survive_any_chunk_split(size):
+    body = response([("a.com", [("a.com", ["WordPress", "Ünïcode"]), ("blog.a.com", ["PHP"])])])
+    items = feed_in_chunks(TechnologyStreamParser(), body, size)
+    assert [item["Name"] for item in items] == ["WordPress", "Ünïcode", "PHP"]
+
+
+@pytest.mark.parametrize("size", [1, 13, 100000])
+def test_batch_parser_tracks_path_domain_and_lookups(size):
+    body = response([
+        ("a.com", [("a.com", ["React"])]),
+        ("b.com", [("b.com", ["Vue", "Stripe"])]),
+        ("c.com", []),
+    ])
+    parser = BatchTechnologyStreamParser()
+    pairs = [(domain, item["Name"]) for domain, item in feed_in_chunks(parser, body, size)]
+    assert pairs == [("a.com", "React"), ("b.com", "Vue"), ("b.com", "Stripe")]
+    assert parser.lookups == {"a.com", "b.com", "c.com"}
+
+
+def test_oversized_item_raises():
+    parser = TechnologyStreamParser(max_buffer_chars=100)
+    with pytest.raises(BuiltWithStreamError):
+        parser.feed(b'{"Technologies": [{"Name": "' + b"x" * 200)
+
+
+def test_single_lookup_stops_early_with_explicit_timeout(monkeypatch):
+    names = [f"Tech{i}" for i in range(100)]
+    body = response([("a.com", [("a.com", names)])])
+    timeouts = []
+
+    def handler(request):
+        return httpx.Response(200, stream=httpx.ByteStream(body))
+
+    real_client = httpx.AsyncClient
+
+    def client(**kwargs):
+        timeouts.append(kwargs.get("timeout"))
+        return real_client(transport=httpx.MockTransport(handler), **kwargs)
+
+    monkeypatch.setattr(builtwith_client_fixed.httpx, "AsyncClient", client)
+    result = asyncio.run(BuiltWithClientFixed("key").analyze_domain("a.com"))
+    assert [t.name for t in result.technologies] == names[:BuiltWithClientFixed.MAX_TECHNOLOGIES]
+    assert timeouts == [BuiltWithClientFixed.REQUEST_TIMEOUT]
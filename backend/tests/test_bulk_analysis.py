@@ -0,0 +1,79 @@
+import asyncio
+
+from bulk_analysis import detect_format, iter_upload_domains, iter_unique_domains, stream_bulk_analysis
+
+
+class FakeUpload:
+    """UploadFile stand-in that returns the body in tiny chunks"""
+
+    def __init__(self, text, chunk=7):
+        self.data = text.encode("utf-8")
+        self.chunk = chunk
+
+    async def read(self, size):
+        piece, self.data = self.data[:self.chunk], self.data[self.chunk:]
+        return piece
+
+
+def parse(text, fmt="csv", max_domains=100):
+    stats = {"rows": 0, "invalid": 0, "duplicates": 0, "truncated": 0}
+
+    async def main():
+        values = iter_upload_domains(FakeUpload(text), fmt, stats)
+        return [domain async for domain in iter_unique_domains(values, stats, max_domains)]
+
+    return asyncio.run(main()), stats
+
+
+def test_csv_header_picks_the_domain_column():
+    domains, stats = parse("name,Website\nAcme,https://www.acme.com/\r\nBeta,beta.io\n\nGamma,not a domain\n")
+    assert domains == ["acme.com", "beta.io"]
+    assert stats == {"rows": 3, "invalid": 1, "duplicates": 0, "truncated": 0}
+
+
+def test_quoted_fields_span_lines_and_chunks():
+    text = 'note,domain\n"line one\nline, two",a.com\n"say ""hi""",b.com\nplain,a.com\n'
+    domains, stats = parse(text)
+    assert domains == ["a.com", "b.com"]
+    assert stats["rows"] == 3
+    assert stats["duplicates"] == 1
+
+
+def test_headerless_csv_uses_first_column_and_truncates():
+    domains, stats = parse("﻿a.com,x\nb.com\nc.com\n", max_domains=2)
+    assert domains == ["a.com", "b.com"]
+    assert stats["truncated"] == 1
+
+
+def test_ndjson_records_and_bare_lines():
+    domains, _ = parse('{"url": "https://a.com"}\n{"Domain": "b.com"}\nc.com\n', fmt="ndjson")
+    assert domains == ["a.com", "b.com", "c.com"]
+    assert detect_format("list.jsonl", None) == "ndjson"
+    assert detect_format("list.txt", "text/csv") == "csv"
+
+
+def test_closing_the_stream_cancels_running_batches():
+    started, cancelled = [], []
+
+    class SlowPipeline:
+        async def run(self, ctx):
+            started.append(ctx["websites"])
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.append(ctx["websites"])
+                raise
+
+    async def main():
+        upload = FakeUpload("".join(f"site{i}.com\n" for i in range(6)))
+        stream = stream_bulk_analysis(upload, "csv", SlowPipeline(), "u1", batch_size=2, concurrency=3)
+        reader = asyncio.create_task(stream.__anext__())
+        while len(started) < 3:
+            await asyncio.sleep(0)
+        reader.cancel()
+        await asyncio.gather(reader, return_exceptions=True)
+        await stream.aclose()
+        await asyncio.sleep(0)
+        assert len(cancelled) == 3
+
+    asyncio.run(main())
@@ -0,0 +1,34 @@
+import asyncio
+
+from competitor_graph import CompetitorGraphCrawler
+from models import ApifyResult
+from snapshot_cache import SnapshotCache
+
+
+class SlowApify:
+    def __init__(self, make_result):
+        self.make_result = make_result
+        self.running = self.peak = 0
+
+    async def analyze_domains(self, domains):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.01)
+        self.running -= 1
+        return [ApifyResult(**self.make_result(domain)) for domain in domains]
+
+
+def test_concurrent_fetches_share_the_run_limit(make_result):
+    apify = SlowApify(make_result)
+    crawler = CompetitorGraphCrawler(apify, SnapshotCache(), batch_size=1, max_concurrency=2)
+
+    async def main():
+        stats = [dict(cache_hits=0, actor_runs=0, fetched=0, unresolved=0) for _ in range(3)]
+        await asyncio.gather(*(
+            crawler.fetch([f"site{i}-{j}.com" for j in range(3)], s) for i, s in enumerate(stats)
+        ))
+        return stats
+
+    stats = asyncio.run(main())
+    assert apify.peak == 2
+    assert sum(s["fetched"] for s in stats) == 9
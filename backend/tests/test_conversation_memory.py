@@ -0,0 +1,53 @@
+import asyncio
+
+from conversation_memory import ConversationMemory
+
+
+def turns(count):
+    return [{"message": f"q{i}", "response": f"a{i}"} for i in range(count)]
+
+
+def test_turns_to_fold_takes_only_turns_outside_the_window():
+    memory = ConversationMemory(window_turns=3, summary_max_chars=500)
+    summary = memory.empty_summary()
+    assert memory.turns_to_fold(turns(3), summary) == []
+    assert memory.turns_to_fold(turns(5), summary) == turns(5)[:2]
+    assert memory.turns_to_fold(turns(6), {"text": "s", "turns": 2}) == turns(6)[2:3]
+    assert memory.turns_to_fold(turns(6), {"text": "s", "turns": 3}) == []
+    # A summary counting more turns than exist (e.g. after chat was trimmed) folds nothing
+    assert memory.turns_to_fold(turns(4), {"text": "s", "turns": 10}) == []
+
+
+def test_history_keeps_window_verbatim_and_summary_separately():
+    memory = ConversationMemory(window_turns=2, summary_max_chars=500)
+    messages, summary = memory.build_history(turns(4), {"text": "earlier", "turns": 2})
+    assert [m["content"] for m in messages] == ["q2", "a2", "q3", "a3"]
+    assert summary == "earlier"
+
+
+def test_truncate_keeps_the_most_recent_text():
+    memory = ConversationMemory(window_turns=2, summary_max_chars=10)
+    assert memory.truncate("0123456789abc") == "...6789abc"
+
+
+def test_fold_falls_back_to_extractive_summary():
+    memory = ConversationMemory(window_turns=2, summary_max_chars=500)
+
+    class FakeDB:
+        saved = None
+
+        async def get_analysis_session(self, session_id):
+            return {"user_id": "u", "chat_discussion": turns(4), "chat_summary": {"text": "", "turns": 1}}
+
+        async def update_chat_summary(self, session_id, summary):
+            self.saved = summary
+            return True
+
+    class FailingLLM:
+        async def summarize_conversation(self, previous, pending, user_id=None):
+            raise RuntimeError("down")
+
+    db = FakeDB()
+    assert asyncio.run(memory.fold("s", FailingLLM(), db))
+    assert db.saved["turns"] == 2
+    assert db.saved["text"] == "- User asked: q1 | Answer: a1"
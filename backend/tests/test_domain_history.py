@@ -0,0 +1,64 @@
+import pytest
+
+from domain_history import DomainHistoryStore
+
+
+def test_trend_orders_out_of_order_snapshots(make_result):
+    history = DomainHistoryStore()
+    history.record(make_result("a.com", totalVisits=300), "2026-03-01")
+    history.record(make_result("a.com", totalVisits=100), "2026-01-01")
+    history.record(make_result("a.com", totalVisits=200), "2026-02-01")
+    trend = history.trend("a.com", fields=["totalVisits"])
+    assert trend["timestamps"] == ["2026-01-01T00:00:00", "2026-02-01T00:00:00", "2026-03-01T00:00:00"]
+    assert trend["series"]["totalVisits"] == [100, 200, 300]
+    assert history.trend("a.com", fields=["totalVisits"], since="2026-02-01")["series"]["totalVisits"] == [200, 300]
+
+
+def test_identical_snapshot_is_not_recorded_twice(make_result):
+    history = DomainHistoryStore()
+    assert history.record(make_result("a.com"), "2026-01-01")
+    assert not history.record(make_result("a.com"), "2026-01-02")
+    assert history.stats()["snapshots"] == 1
+
+
+def test_changes_between_latest_snapshots(make_result):
+    history = DomainHistoryStore()
+    history.record(make_result("a.com", globalRank=500, technologies=["React"]), "2026-01-01")
+    history.record(make_result("a.com", globalRank=400, technologies=["React", "Stripe"]), "2026-02-01")
+    changes = history.changes("a.com")
+    assert changes["metrics"]["globalRank"]["delta"] == -100
+    assert changes["rank_moves"]["globalRank"] == 100
+    assert changes["technologies_added"] == ["Stripe"]
+    assert changes["technologies_removed"] == []
+
+
+def test_out_of_order_technology_sets_keep_their_events(make_result):
+    history = DomainHistoryStore()
+    history.record(make_result("a.com", globalRank=3, technologies=["X"]), "2026-01-01")
+    history.record(make_result("a.com", globalRank=1, technologies=["X", "Y"]), "2026-03-01")
+    history.record(make_result("a.com", globalRank=2, technologies=["X"]), "2026-02-01")
+    events = history.trend("a.com")["technology_events"]
+    assert [(e["timestamp"], e["added"], e["removed"]) for e in events] == [
+        ("2026-01-01T00:00:00", ["X"], []),
+        ("2026-03-01T00:00:00", ["Y"], []),
+    ]
+    assert history.changes("a.com", since="2026-02-01")["technologies_added"] == ["Y"]
+    assert history.changes("a.com")["technologies"] == ["X", "Y"]
+
+
+def test_unknown_domain_and_field(make_result):
+    history = DomainHistoryStore()
+    history.record(make_result("a.com"), "2026-01-01")
+    with pytest.raises(KeyError):
+        history.trend("b.com")
+    with pytest.raises(ValueError):
+        history.trend("a.com", fields=["nope"])
+
+
+def test_offset_timestamps_and_bad_bounds(make_result):
+    history = DomainHistoryStore()
+    history.record(make_result("a.com", totalVisits=100), "2026-01-01T10:00:00+02:00")
+    history.record(make_result("a.com", totalVisits=200), "2026-01-01T09:00:00")
+    assert history.trend("a.com", fields=["totalVisits"])["timestamps"] == ["2026-01-01T08:00:00", "2026-01-01T09:00:00"]
+    with pytest.raises(ValueError):
+        history.changes("a.com", since="last tuesday")
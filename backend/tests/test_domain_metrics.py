@@ -0,0 +1,61 @@
+import pytest
+
+from domain_metrics import DomainMetricsStore
+
+
+@pytest.fixture
+def store(make_result):
+    store = DomainMetricsStore()
+    for i in range(50):
+        store.update(make_result(f"site{i}.com", globalRank=1000 - i, totalVisits=i * 10), "2026-01-01T00:00:00")
+    return store
+
+
+def test_range_filter_and_count(store):
+    result = store.query(ranges={"totalVisits": (100, 190)}, limit=100)
+    assert result["count"] == 10
+    assert {d["domain"] for d in result["domains"]} == {f"site{i}.com" for i in range(10, 20)}
+
+
+def test_top_k_pages_match_full_sort(store):
+    full = [d["domain"] for d in store.query(sort="totalVisits", limit=50)["domains"]]
+    assert full[:3] == ["site49.com", "site48.com", "site47.com"]
+    pages = []
+    for offset in range(0, 50, 7):
+        pages += [d["domain"] for d in store.query(sort="totalVisits", limit=7, offset=offset)["domains"]]
+    assert pages == full
+
+
+def test_ascending_sort_puts_missing_values_last(store, make_result):
+    store.update(make_result("unranked.com", globalRank=None), "2026-01-01T00:00:00")
+    domains = [d["domain"] for d in store.query(sort="globalRank", descending=False, limit=51)["domains"]]
+    assert domains[0] == "site49.com"
+    assert domains[-1] == "unranked.com"
+
+
+def test_newer_analysis_wins(make_result):
+    store = DomainMetricsStore()
+    assert store.update(make_result("a.com", totalVisits=200), "2026-02-01T00:00:00")
+    assert not store.update(make_result("a.com", totalVisits=100), "2026-01-01T00:00:00")
+    assert store.query(ranges={"totalVisits": (None, None)})["domains"][0]["totalVisits"] == 200
+
+
+def test_country_filter_and_remove(store, make_result):
+    store.update(make_result("fr.com", topCountries=[{"countryAlpha2Code": "FR", "visitsShare": 0.9}]), "2026-01-01")
+    assert [d["domain"] for d in store.query(countries=["fr"])["domains"]] == ["fr.com"]
+    store.remove("fr.com")
+    assert store.query(countries=["FR"])["count"] == 0
+    assert len(store) == 50
+
+
+def test_unknown_field_is_rejected(store):
+    with pytest.raises(ValueError):
+        store.query(sort="nope")
+
+
+def test_offset_timestamps_compare_as_times(make_result):
+    store = DomainMetricsStore()
+    # 08:00 UTC, which sorts after 09:00 as a string
+    assert store.update(make_result("a.com", totalVisits=100), "2026-01-01T10:00:00+02:00")
+    assert store.update(make_result("a.com", totalVisits=200), "2026-01-01T09:00:00")
+    assert store.query(ranges={"totalVisits": (None, None)})["domains"][0]["totalVisits"] == 200
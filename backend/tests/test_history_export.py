@@ -0,0 +1,64 @@
+import asyncio
+
+import pytest
+
+from history_export import TABLES, flatten_session, stream_table
+
+
+def session(make_result, **fields):
+    step1 = make_result("www.a.com", **fields)
+    step2 = make_result("a.com", technologies=["React", "react ", "Stripe"], **fields)
+    return {"id": "s1", "created_at": "2026-01-01T00:00:00", "similarweb_data": [step1], "builtwith_data": [step2]}
+
+
+async def sessions(*items):
+    for item in items:
+        yield item
+
+
+def test_one_row_per_domain_with_step2_technologies(make_result):
+    rows = flatten_session(session(make_result, totalVisits=1500))
+    assert len(rows["domains"]) == 1
+    domain = dict(zip([name for name, _ in TABLES["domains"]], rows["domains"][0]))
+    assert (domain["session_id"], domain["domain"], domain["total_visits"]) == ("s1", "a.com", 1500)
+    assert domain["technology_count"] == 2
+    assert [row[2] for row in rows["technologies"]] == ["React", "Stripe"]
+    for name, table_rows in rows.items():
+        assert all(len(row) == len(TABLES[name]) for row in table_rows)
+
+
+def test_bad_stored_values_become_nulls(make_result):
+    rows = flatten_session(session(
+        make_result, totalVisits="n/a", globalRank="12", pagesPerVisit=float("nan"),
+        topKeywords=[{"name": "shop", "volume": "lots", "estimatedValue": 3.0, "cpc": "0.5"}],
+    ))
+    domain = dict(zip([name for name, _ in TABLES["domains"]], rows["domains"][0]))
+    assert domain["total_visits"] is None
+    assert domain["global_rank"] == 12
+    assert domain["pages_per_visit"] is None
+    assert rows["keywords"] == [("s1", "a.com", "shop", None, 3, 0.5)]
+
+
+def test_csv_stream_has_header_and_rows(make_result):
+    async def main():
+        return b"".join([chunk async for chunk in stream_table(sessions(session(make_result)), "technologies", "csv", 1)])
+
+    lines = asyncio.run(main()).decode("utf-8").splitlines()
+    assert lines[0] == ",".join(name for name, _ in TABLES["technologies"])
+    assert len(lines) == 3
+
+
+def test_parquet_accepts_bad_values(make_result):
+    pytest.importorskip("pyarrow")
+    import io
+
+    import pyarrow.parquet as pq
+
+    bad = session(make_result, totalVisits="n/a", bounceRate="high")
+
+    async def main():
+        return b"".join([chunk async for chunk in stream_table(sessions(bad, bad), "domains", "parquet", 1)])
+
+    table = pq.read_table(io.BytesIO(asyncio.run(main())))
+    assert table.num_rows == 2
+    assert table.column("total_visits").to_pylist() == [None, None]
@@ -0,0 +1,85 @@
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from fast_json import FastJSONResponse
+from http_cache import cache_headers, etag_matches, history_etag, not_modified, session_etag
+from middleware import CompressionMiddleware, negotiate_encoding
+
+ETAG = session_etag("s1", "2026-01-01T00:00:00")
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+
+    @app.get("/doc")
+    async def doc(request: Request, size: int = 5000):
+        if etag_matches(request.headers.get("if-none-match"), ETAG):
+            return not_modified(ETAG)
+        return FastJSONResponse({"data": "x" * size}, headers=cache_headers(ETAG))
+
+    app.add_middleware(CompressionMiddleware, min_size=1000)
+    return TestClient(app)
+
+
+def test_etags_follow_versions():
+    assert session_etag("s1", "v1") != session_etag("s1", "v2")
+    sessions = [{"id": "a", "updated_at": "1"}, {"id": "b", "updated_at": "2"}]
+    assert history_etag("history", "u", 50, sessions) != history_etag("history", "u", 50, sessions[::-1])
+
+
+def test_if_none_match_comparison():
+    assert etag_matches(ETAG, ETAG)
+    assert etag_matches(f'"other", W/{ETAG[:-1]}-gzip"', ETAG)
+    assert etag_matches("*", ETAG)
+    assert not etag_matches(None, ETAG)
+    assert not etag_matches('"other"', ETAG)
+
+
+def test_negotiation():
+    assert negotiate_encoding("gzip, deflate") == "gzip"
+    assert negotiate_encoding("gzip;q=0") is None
+    assert negotiate_encoding("identity") is None
+
+
+def test_large_body_is_compressed_with_suffixed_etag(client):
+    response = client.get("/doc", headers={"accept-encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f'{ETAG[:-1]}-gzip"'
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json()["data"] == "x" * 5000
+
+
+def test_small_and_identity_bodies_are_not_compressed(client):
+    small = client.get("/doc?size=10", headers={"accept-encoding": "gzip"})
+    assert "content-encoding" not in small.headers and small.headers["etag"] == ETAG
+    identity = client.get("/doc", headers={"accept-encoding": "identity"})
+    assert "content-encoding" not in identity.headers
+    assert identity.headers["etag"] == ETAG and identity.headers["vary"] == "Accept-Encoding"
+
+
+def test_not_modified_repeats_the_cached_representation_tag(client):
+    encoded = client.get("/doc", headers={"accept-encoding": "gzip"}).headers["etag"]
+    response = client.get("/doc", headers={"accept-encoding": "gzip", "if-none-match": encoded})
+    assert response.status_code == 304
+    assert response.headers["etag"] == encoded
+    assert response.headers["vary"] == "Accept-Encoding"
+    plain = client.get("/doc", headers={"accept-encoding": "gzip", "if-none-match": ETAG})
+    assert plain.status_code == 304 and plain.headers["etag"] == ETAG
+
+
+def test_unknown_session_is_404_even_for_wildcard(monkeypatch):
+    import routes
+    from main_new import app
+
+    class FakeDB:
+        async def get_session_version(self, session_id):
+            return None
+
+        async def get_analysis_session(self, session_id):
+            return None
+
+    monkeypatch.setattr(routes, "db_service", FakeDB())
+    assert TestClient(app).get("/api/session/missing", headers={"if-none-match": "*"}).status_code == 404
+
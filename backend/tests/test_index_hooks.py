@@ -0,0 +1,126 @@
+import asyncio
+import json
+
+import pytest
+
+import database_service
+from domain_history import DomainHistoryStore
+from domain_metrics import DomainMetricsStore
+from keyword_index import KeywordIndex
+from models import ApifyResult
+from tech_index import TechIndex
+from tech_similarity import TechLSHIndex
+from traffic_similarity import TrafficProfileIndex
+
+
+@pytest.fixture
+def stores(monkeypatch):
+    stores = {
+        "traffic_index": TrafficProfileIndex(),
+        "keyword_index": KeywordIndex(),
+        "domain_metrics": DomainMetricsStore(),
+        "domain_history": DomainHistoryStore(),
+        "tech_index": TechIndex(lsh=TechLSHIndex()),
+    }
+    for name, store in stores.items():
+        monkeypatch.setattr(database_service, name, store)
+    return stores
+
+
+def results(make_result):
+    real = ApifyResult(**make_result("real.com", technologies=["React"]))
+    fake_stack = ApifyResult(**make_result("stack.com", technologies=["WordPress"]))
+    fake_stack.builtwith_result.mock = True
+    fake_row = ApifyResult(**dict(make_result("ooredoo.tn", technologies=["PHP"]), mock=True))
+    return [real, fake_stack, fake_row]
+
+
+def test_index_hooks_skip_mock_data(stores, make_result):
+    data = results(make_result)
+    database_service.db_service._index_results("s1", "u1", "2026-01-01T00:00:00", data, data)
+
+    assert [d["domain"] for d in stores["domain_metrics"].query(limit=10)["domains"]] == ["real.com", "stack.com"]
+    assert len(stores["traffic_index"]) == 2
+    assert sorted(stores["keyword_index"].user_domains("u1")) == ["real.com", "stack.com"]
+    assert stores["domain_history"].stats()["technology_events"] == 1
+    assert [d["domain"] for d in stores["tech_index"].query(tech_any=["react", "wordpress", "php"])["domains"]] == ["real.com"]
+    assert len(stores["tech_index"].lsh) == 1
+
+
+def test_reloads_skip_stored_mock_data(stores, make_result):
+    stored = [item.model_dump() for item in results(make_result)]
+
+    class FakeDB:
+        async def iter_sessions(self):
+            yield {"id": "s1", "user_id": "u1", "created_at": "2026-01-01T00:00:00",
+                   "similarweb_data": stored, "builtwith_data": stored}
+
+    async def main():
+        for name in ("traffic_index", "keyword_index", "domain_metrics", "domain_history"):
+            await stores[name].reload(FakeDB())
+        await stores["tech_index"].ensure_loaded(FakeDB())
+
+    asyncio.run(main())
+    assert len(stores["domain_metrics"]) == len(stores["traffic_index"]) == len(stores["keyword_index"]) == 2
+    assert len(stores["domain_history"]) == 2
+    assert stores["tech_index"].query(tech_any=["wordpress", "php"])["count"] == 0
+
+
+def test_writes_during_reload_survive_the_swap(stores, make_result):
+    stored = [make_result("old.com")]
+
+    class SlowDB:
+        async def iter_sessions(self):
+            yield {"id": "s1", "user_id": "u1", "created_at": "2026-01-01T00:00:00+00:00",
+                   "similarweb_data": stored, "builtwith_data": []}
+            # An analysis saved while the reload is still reading pages
+            fresh = [ApifyResult(**make_result("new.com"))]
+            database_service.db_service._index_results("s2", "u1", "2026-01-02T00:00:00", fresh, [])
+
+    async def main():
+        for name in ("traffic_index", "keyword_index", "domain_metrics", "domain_history"):
+            await stores[name].reload(SlowDB())
+
+    asyncio.run(main())
+    assert sorted(d["domain"] for d in stores["domain_metrics"].query(limit=10)["domains"]) == ["new.com", "old.com"]
+    assert sorted(stores["keyword_index"].user_domains("u1")) == ["new.com", "old.com"]
+    assert len(stores["traffic_index"]) == len(stores["domain_history"]) == 2
+
+
+def test_deleting_a_session_purges_every_index(stores, make_result, monkeypatch):
+    db = database_service.db_service
+    kept = [make_result("shared.com", totalVisits=10, technologies=["Vue"])]
+    deleted = [make_result("shared.com", totalVisits=20, technologies=["React"]), make_result("gone.com")]
+    db._index_results("s1", "u1", "2026-01-01T00:00:00", kept, kept)
+    db._index_results("s2", "u1", "2026-02-01T00:00:00", deleted, deleted)
+
+    class Query:
+        def __getattr__(self, name):
+            return lambda *args: self
+
+        def execute(self):
+            return type("Result", (), {"data": [{
+                "id": "s2", "domains": ["shared.com", "gone.com"],
+                "similarweb_jsonb": json.dumps(deleted), "builtwith_jsonb": json.dumps(deleted),
+            }]})
+
+    async def iter_sessions():
+        yield {"id": "s1", "user_id": "u1", "created_at": "2026-01-01T00:00:00",
+               "similarweb_data": kept, "builtwith_data": kept}
+
+    monkeypatch.setattr(db, "supabase", type("Supabase", (), {"table": lambda self, name: Query()})())
+    monkeypatch.setattr(db, "iter_sessions", iter_sessions)
+
+    async def main():
+        assert await db.delete_analysis_session("s2", "u1")
+        assert "gone.com" not in stores["keyword_index"].user_domains("u1")
+        await db._reindex_task
+
+    asyncio.run(main())
+    metrics = stores["domain_metrics"].query(limit=10)["domains"]
+    assert [(d["domain"], d["totalVisits"]) for d in metrics] == [("shared.com", 10)]
+    assert stores["keyword_index"].user_domains("u1") == ["shared.com"]
+    assert len(stores["traffic_index"]) == len(stores["domain_history"]) == 1
+    assert stores["domain_history"].stats()["snapshots"] == 1
+    assert stores["tech_index"].query(tech_any=["react"])["count"] == 0
+    assert stores["tech_index"].query(tech_any=["vue"])["count"] == 1
@@ -0,0 +1,68 @@
+import asyncio
+
+import pytest
+
+from clients.llm_scheduler import LLMScheduler, SchedulerQueueFullError, SchedulerTimeoutError
+
+
+def test_concurrency_is_capped():
+    scheduler = LLMScheduler(max_concurrency=2)
+    peak = 0
+    running = 0
+
+    async def call():
+        nonlocal peak, running
+        async with scheduler.slot("user"):
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+
+    async def main():
+        await asyncio.gather(*(call() for _ in range(10)))
+
+    asyncio.run(main())
+    assert peak == 2
+    assert scheduler.metrics()["in_flight"] == 0
+
+
+def test_interactive_first_then_users_round_robin():
+    scheduler = LLMScheduler(max_concurrency=1)
+    order = []
+
+    async def call(user, priority):
+        async with scheduler.slot(user, priority):
+            order.append(user)
+
+    async def main():
+        await scheduler.acquire("holder")
+        tasks = [asyncio.create_task(call(user, priority)) for user, priority in [
+            ("bg", LLMScheduler.BACKGROUND), ("a", 0), ("a", 0), ("a", 0), ("b", 0),
+        ]]
+        await asyncio.sleep(0)
+        scheduler.release()
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    assert order == ["a", "b", "a", "a", "bg"]
+
+
+def test_queue_limit_deadline_and_try_acquire():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1)
+
+    async def main():
+        await scheduler.acquire("holder")
+        assert not scheduler.try_acquire()
+        waiter = asyncio.create_task(scheduler.acquire("a", deadline=0.01))
+        await asyncio.sleep(0)
+        with pytest.raises(SchedulerQueueFullError):
+            await scheduler.acquire("b")
+        with pytest.raises(SchedulerTimeoutError):
+            await waiter
+        scheduler.release()
+        assert scheduler.try_acquire()
+        scheduler.release()
+
+    asyncio.run(main())
+    assert scheduler.metrics()["in_flight"] == 0
+    assert scheduler.timed_out == 1 and scheduler.rejected == 1
@@ -0,0 +1,75 @@
+import asyncio
+
+import pytest
+
+from clients.llm_scheduler import LLMScheduler
+from clients.model_router import LLMUnavailableError, ModelRouter
+from clients.openrouter_client import OpenRouterClient
+
+
+def test_falls_through_to_next_model_on_error():
+    async def call(model):
+        if model == "a":
+            raise RuntimeError("down")
+        return f"answer from {model}"
+
+    router = ModelRouter(["a", "b"], hedge_after=10)
+    assert asyncio.run(router.run(call)) == ("b", "answer from b")
+    assert router.stats["a"].consecutive_failures == 1
+
+
+def test_slow_primary_is_hedged():
+    async def call(model):
+        await asyncio.sleep(1.0 if model == "slow" else 0.01)
+        return model
+
+    router = ModelRouter(["slow", "fast"], hedge_after=0.05, min_hedge_after=0.01)
+    assert asyncio.run(router.run(call)) == ("fast", "fast")
+
+
+def test_hedge_gate_stops_hedging():
+    started = []
+
+    async def call(model):
+        started.append(model)
+        await asyncio.sleep(0.1)
+        return model
+
+    router = ModelRouter(["a", "b"], hedge_after=0.01, min_hedge_after=0.01)
+    assert asyncio.run(router.run(call, hedge_gate=lambda: False)) == ("a", "a")
+    assert started == ["a"]
+
+
+def test_all_failures_raise_and_failing_model_cools_down():
+    async def call(model):
+        raise RuntimeError("down")
+
+    router = ModelRouter(["a", "b"], failure_threshold=1, cooldown=60)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(router.run(call))
+    assert router.ordered_models() == ["a", "b"]  # Both cooling: configured order
+
+    async def only_b_fails(model):
+        if model == "b":
+            raise RuntimeError("down")
+        return model
+
+    router = ModelRouter(["b", "a"], failure_threshold=1, cooldown=60)
+    asyncio.run(router.run(only_b_fails))
+    assert router.ordered_models() == ["a", "b"]
+
+
+def test_hedge_reuses_the_slot_of_a_failed_hedge():
+    scheduler = LLMScheduler(max_concurrency=2)
+    client = OpenRouterClient(models=["slow", "broken", "fast"], hedge_after=0.02, scheduler=scheduler)
+    client.router.min_hedge_after = 0.01
+
+    async def request(model, messages, max_tokens, temperature):
+        if model == "broken":
+            raise RuntimeError("down")
+        await asyncio.sleep(0.5 if model == "slow" else 0.01)
+        return model
+
+    client._request_completion = request
+    assert asyncio.run(client._complete([], max_tokens=10)) == ("fast", "fast")
+    assert scheduler._in_flight == 0
@@ -0,0 +1,55 @@
+import asyncio
+import time
+
+import pytest
+
+from pipeline import Pipeline, PipelineError, Stage
+
+
+def test_independent_stages_run_concurrently():
+    async def fetch(ctx):
+        await asyncio.sleep(0.2)
+        return ctx["name"]
+
+    async def combine(ctx, left, right):
+        return f"{left}+{right}"
+
+    pipeline = Pipeline([
+        Stage("combine", combine, inputs=["left", "right"]),
+        Stage("left", fetch),
+        Stage("right", fetch),
+    ])
+    started = time.perf_counter()
+    run = asyncio.run(pipeline.run({"name": "x"}))
+    assert run["results"]["combine"] == "x+x"
+    assert time.perf_counter() - started < 0.35
+    assert pipeline.order.index("combine") == 2
+
+
+def test_optional_stage_failure_yields_none():
+    async def broken(ctx):
+        raise RuntimeError("boom")
+
+    async def use(ctx, broken):
+        return broken is None
+
+    run = asyncio.run(Pipeline([Stage("broken", broken, optional=True), Stage("use", use, ["broken"])]).run({}))
+    assert run["results"]["use"] is True
+    assert run["errors"] == {"broken": "boom"}
+
+
+def test_required_stage_failure_and_invalid_graphs():
+    async def broken(ctx):
+        raise RuntimeError("boom")
+
+    with pytest.raises(PipelineError) as error:
+        asyncio.run(Pipeline([Stage("broken", broken)]).run({}))
+    assert error.value.stage == "broken"
+
+    async def noop(ctx, **inputs):
+        return None
+
+    with pytest.raises(PipelineError):
+        Pipeline([Stage("a", noop, ["missing"])])
+    with pytest.raises(PipelineError):
+        Pipeline([Stage("a", noop, ["b"]), Stage("b", noop, ["a"])])
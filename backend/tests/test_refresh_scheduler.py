@@ -0,0 +1,130 @@
+import asyncio
+from datetime import datetime, time as dtime, timedelta
+
+from models import ApifyResult, BuiltWithResult, Technology
+from refresh_scheduler import RefreshScheduler, fingerprints, in_window, parse_window
+
+
+class FakeSnapshots:
+    def get_many(self, domains):
+        return {}, list(domains)
+
+
+class FakeCrawler:
+    def __init__(self, results):
+        self.results = results
+        self.fetched = []
+
+    async def fetch(self, domains, stats):
+        self.fetched.append(list(domains))
+        return {d: ApifyResult(**self.results[d]) for d in domains if d in self.results}
+
+
+class FakeTech:
+    async def analyze_domains(self, domains):
+        return {d: BuiltWithResult(domain=d, technologies=[Technology(name="React", tag="JS")]) for d in domains}
+
+
+class FakeDB:
+    def __init__(self):
+        self.saved = []
+
+    async def save_analysis_session(self, user_id, domains, similarweb_data, builtwith_data):
+        self.saved.append((user_id, domains))
+        return f"session-{len(self.saved)}"
+
+
+def make_scheduler(tmp_path, results, db=None):
+    return RefreshScheduler(
+        FakeCrawler(results), FakeTech(), FakeSnapshots(), db or FakeDB(),
+        state_path=str(tmp_path / "tracked.json"), retry_base_minutes=60
+    )
+
+
+def test_window_parsing_and_wraparound():
+    assert parse_window("") is None
+    assert parse_window("always") is None
+    window = parse_window("23:00-02:00")
+    assert window == (dtime(23), dtime(2))
+    assert in_window(datetime(2026, 1, 1, 23, 30), window)
+    assert in_window(datetime(2026, 1, 1, 1, 59), window)
+    assert not in_window(datetime(2026, 1, 1, 2, 0), window)
+    assert not in_window(datetime(2026, 1, 1, 12, 0), parse_window("01:00-05:00"))
+
+
+def test_fingerprints_compare_technologies_as_a_set(make_result):
+    a = ApifyResult(**make_result("a.com", technologies=["React", "Stripe"]))
+    b = ApifyResult(**make_result("a.com", technologies=["stripe ", "react"]))
+    c = ApifyResult(**make_result("a.com", technologies=["React"], totalVisits=1))
+    assert fingerprints(a) == fingerprints(b)
+    changed = {f for f, h in fingerprints(c).items() if fingerprints(a)[f] != h}
+    assert changed == {"technologies", "totalVisits"}
+
+
+def test_only_changed_domains_are_saved(tmp_path, make_result):
+    results = {"a.com": make_result("a.com")}
+    db = FakeDB()
+    scheduler = make_scheduler(tmp_path, results, db)
+    scheduler.track("user", ["a.com"], interval_hours=24)
+    now = datetime.utcnow() + timedelta(minutes=1)
+
+    assert asyncio.run(scheduler.run_once(force=True, now=now))["changed"] == 1
+    assert asyncio.run(scheduler.run_once(force=True, now=now + timedelta(days=1)))["unchanged"] == 1
+    results["a.com"] = make_result("a.com", totalVisits=1)
+    stats = asyncio.run(scheduler.run_once(force=True, now=now + timedelta(days=2)))
+    assert stats["changed"] == 1
+    assert db.saved == [("user", ["a.com"]), ("user", ["a.com"])]
+    assert scheduler.tracked("user")[0]["last_changes"] == ["totalVisits"]
+
+
+def test_unresolved_domains_back_off(tmp_path):
+    scheduler = make_scheduler(tmp_path, {})
+    scheduler.track("user", ["dead.com"], interval_hours=24)
+    now = datetime.utcnow() + timedelta(minutes=1)
+    delays = []
+    for _ in range(7):
+        asyncio.run(scheduler.run_once(force=True, now=now))
+        entry = scheduler.tracked()[0]
+        due = datetime.fromisoformat(entry["next_due"])
+        delays.append((due - now) / timedelta(hours=1))
+        now = due
+    assert delays == [1, 2, 4, 8, 16, 24, 24]
+    assert entry["failures"] == 7
+
+
+def test_outside_window_skips_unless_forced(tmp_path):
+    scheduler = make_scheduler(tmp_path, {})
+    scheduler.window = parse_window("01:00-02:00")
+    assert "skipped" in asyncio.run(scheduler.run_once(now=datetime(2026, 1, 1, 12)))
+
+
+def test_failed_save_keeps_changes_pending(tmp_path, make_result):
+    class FailingDB(FakeDB):
+        async def save_analysis_session(self, **kwargs):
+            return None
+
+    scheduler = make_scheduler(tmp_path, {"a.com": make_result("a.com")}, FailingDB())
+    scheduler.track("user", ["a.com"], interval_hours=24)
+    now = datetime.utcnow() + timedelta(minutes=1)
+    assert asyncio.run(scheduler.run_once(force=True, now=now))["sessions"] == 0
+    entry = scheduler.tracked()[0]
+    assert entry["last_changed"] is None
+    assert datetime.fromisoformat(entry["next_due"]) == now + timedelta(hours=1)
+
+    scheduler.db = FakeDB()
+    assert asyncio.run(scheduler.run_once(force=True, now=now + timedelta(hours=1)))["changed"] == 1
+
+
+def test_mock_stack_is_not_a_change(tmp_path, make_result):
+    class MockTech(FakeTech):
+        async def analyze_domains(self, domains):
+            return {d: BuiltWithResult(domain=d, technologies=[Technology(name="WordPress", tag="CMS")], mock=True) for d in domains}
+
+    db = FakeDB()
+    scheduler = make_scheduler(tmp_path, {"a.com": make_result("a.com")}, db)
+    scheduler.track("user", ["a.com"], interval_hours=24)
+    now = datetime.utcnow() + timedelta(minutes=1)
+    asyncio.run(scheduler.run_once(force=True, now=now))
+    scheduler.tech_stack_cache = MockTech()
+    assert asyncio.run(scheduler.run_once(force=True, now=now + timedelta(days=1)))["unchanged"] == 1
+    assert len(db.saved) == 1
@@ -0,0 +1,43 @@
+import pytest
+
+from tech_index import TechIndex
+
+
+def tech(name, tag="Other"):
+    return {"name": name, "tag": tag}
+
+
+@pytest.fixture
+def index():
+    index = TechIndex()
+    index.index_domain("a.com", [tech("React", "JS"), tech("Stripe", "Payments")], "s1", "u1", "2026-01-01")
+    index.index_domain("b.com", [tech("Vue", "JS"), tech("Stripe", "Payments")], "s2", "u2", "2026-01-01")
+    index.index_domain("c.com", [tech("React", "JS")], "s2", "u2", "2026-01-01")
+    return index
+
+
+def domains(result):
+    return [d["domain"] for d in result["domains"]]
+
+
+def test_all_any_and_tag_filters(index):
+    assert domains(index.query(tech_all=["stripe"])) == ["a.com", "b.com"]
+    assert domains(index.query(tech_all=["Stripe"], tech_any=["react", "angular"])) == ["a.com"]
+    assert domains(index.query(tag_all=["js"], tech_any=["vue"])) == ["b.com"]
+    assert index.query(tech_all=["react"], user_id="u2")["count"] == 1
+    with pytest.raises(ValueError):
+        index.query()
+
+
+def test_newer_analysis_replaces_older(index):
+    assert index.index_domain("a.com", [tech("Angular")], "s3", "u1", "2026-02-01")
+    assert not index.index_domain("a.com", [tech("React")], "s4", "u1", "2026-01-15")
+    assert domains(index.query(tech_all=["angular"])) == ["a.com"]
+    assert domains(index.query(tech_all=["react"])) == ["c.com"]
+
+
+def test_removing_a_session_drops_orphaned_domains(index):
+    index.remove_session("s2")
+    assert domains(index.query(tech_all=["stripe"])) == ["a.com"]
+    assert index.query(tech_any=["react", "vue"], user_id="u2")["count"] == 0
+    assert sorted(t["technology"] for t in index.technologies()) == ["React", "Stripe"]
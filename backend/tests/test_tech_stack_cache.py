@@ -0,0 +1,70 @@
+import asyncio
+
+from models import BuiltWithResult, Technology
+from tech_stack_cache import TechStackCache
+
+
+class SlowClient:
+    api_key = "key"
+
+    def __init__(self, delays, mock=()):
+        self.delays = delays
+        self.mock = set(mock)
+        self.calls = []
+
+    async def analyze_domains(self, domains):
+        self.calls.append(list(domains))
+        await asyncio.sleep(max(self.delays.get(d, 0.0) for d in domains))
+        return {
+            d: BuiltWithResult(domain=d, technologies=[Technology(name="React", tag="JS")], mock=d in self.mock)
+            for d in domains
+        }
+
+
+def test_foreground_request_promotes_a_queued_prefetch():
+    client = SlowClient({"slow.com": 1.0, "next.com": 0.01})
+    cache = TechStackCache(client, prefetch_concurrency=1)
+
+    async def main():
+        cache.prefetch(["slow.com"])
+        cache.prefetch(["next.com"])  # Queued behind slow.com for the only prefetch slot
+        await asyncio.sleep(0.01)
+        started = asyncio.get_running_loop().time()
+        results = await cache.analyze_domains(["next.com"])
+        return results, asyncio.get_running_loop().time() - started
+
+    results, elapsed = asyncio.run(main())
+    assert results["next.com"].technologies[0].name == "React"
+    assert elapsed < 0.5
+    assert cache.counters["promoted"] == 1
+    assert client.calls == [["slow.com"], ["next.com"]]  # Promoted, not looked up twice
+
+
+def test_prefetches_share_the_slot_when_nobody_waits():
+    client = SlowClient({"a.com": 0.05, "b.com": 0.05})
+    cache = TechStackCache(client, prefetch_concurrency=1)
+
+    async def main():
+        cache.prefetch(["a.com"])
+        cache.prefetch(["b.com"])
+        await asyncio.sleep(0.07)
+        first = dict(cache._results)
+        await asyncio.sleep(0.07)
+        return first
+
+    first = asyncio.run(main())
+    assert list(first) == ["a.com"]
+    assert cache._prefetch_slots._value == 1
+
+
+def test_mock_results_are_returned_but_never_cached():
+    client = SlowClient({}, mock={"m.com"})
+    cache = TechStackCache(client)
+
+    async def main():
+        await cache.analyze_domains(["m.com", "r.com"])
+        return await cache.analyze_domains(["m.com", "r.com"])
+
+    results = asyncio.run(main())
+    assert results["m.com"].mock
+    assert client.calls == [["m.com", "r.com"], ["m.com"]]
@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from fastapi import HTTPException
+
+import routes
+from models import WebsiteAnalysisRequest
+
+
+class FakeDB:
+    def __init__(self, similarweb_data, builtwith_data):
+        self.session = {"user_id": self.user_uuid("u1"), "similarweb_data": similarweb_data,
+                        "builtwith_data": builtwith_data}
+
+    def user_uuid(self, user_id):
+        return f"uuid-{user_id}"
+
+    async def get_session_fields(self, session_id, fields):
+        return self.session
+
+
+@pytest.fixture
+def run(monkeypatch, make_result):
+    stored = [make_result("a.com", technologies=["React"]), make_result("b.com", technologies=["Vue"])]
+
+    def run(websites, rows=stored):
+        monkeypatch.setattr(routes, "db_service", FakeDB(rows, rows))
+        request = WebsiteAnalysisRequest(websites=websites, userId="u1", session_id="s1")
+        return asyncio.run(routes._analyze_tech_stack_for_session(request))
+
+    return run
+
+
+def test_requested_domains_are_joined_by_name(run):
+    response = run(["https://www.B.com/"])
+    assert [r.name for r in response.data] == ["b.com"]
+    assert [t.name for t in response.data[0].builtwith_result.technologies] == ["Vue"]
+
+
+def test_unknown_domains_are_rejected(run):
+    with pytest.raises(HTTPException) as error:
+        run(["a.com", "c.com"])
+    assert error.value.status_code == 422
+    assert "c.com" in error.value.detail
+
+
+def test_mock_sessions_cover_every_stored_row(run, make_result):
+    rows = [dict(make_result("mock.tn", technologies=["PHP"]), mock=True)]
+    response = run(["anything.com"], rows)
+    assert [r.name for r in response.data] == ["mock.tn"]
@@ -0,0 +1,208 @@
+"""
+Traffic-profile nearest-neighbor search over SimilarWeb features
+
+Every analyzed domain becomes one row of a NumPy matrix: traffic-source
+shares, the top-countries distribution and a few engagement metrics (bounce
+rate, pages per visit, visit duration). Rows are L2-normalized, so k-nearest
+lookalikes by cosine similarity are a single matrix-vector product plus
+argpartition. Rows are appended or replaced as new ApifyResults arrive, and
+the whole matrix can be rebuilt from stored sessions.
+"""
+
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from domain_utils import normalize_domain, parse_timestamp
+from metrics_engine import TRAFFIC_CHANNELS, parse_duration
+from mock_data import observed_results
+
+logger = logging.getLogger(__name__)
+
+# Engagement features squashed to roughly [0, 1] before weighting
+ENGAGEMENT_SCALES = {
+    "bounceRate": 1.0,
+    "pagesPerVisit": float(np.log1p(20)),
+    "avgVisitDuration": float(np.log1p(1800)),
+}
+
+
+class TrafficProfileIndex:
+    """Cosine k-NN index over per-domain traffic feature vectors"""
+
+    def __init__(self, channel_weight: float = 1.0, country_weight: float = 1.0, engagement_weight: float = 1.0):
+        self.weights = (channel_weight, country_weight, engagement_weight)
+        self.loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+        self._replay: Optional[List[tuple]] = None  # Writes made while a reload runs
+        self._reset()
+
+    def _reset(self):
+        self._countries: Dict[str, int] = {}
+        self._rows: Dict[str, int] = {}
+        self._domains: List[Optional[str]] = []
+        self._updated: Dict[str, datetime] = {}
+        self._free: List[int] = []
+        self._matrix = np.zeros((0, self.dimensions), dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    @property
+    def dimensions(self) -> int:
+        return len(TRAFFIC_CHANNELS) + len(ENGAGEMENT_SCALES) + len(self._countries)
+
+    def _country_column(self, code: str) -> int:
+        """Column of a country, widening the matrix the first time it is seen"""
+        if code not in self._countries:
+            self._countries[code] = len(self._countries)
+            self._matrix = np.pad(self._matrix, ((0, 0), (0, 1)))
+        return len(TRAFFIC_CHANNELS) + len(ENGAGEMENT_SCALES) + self._countries[code]
+
+    def features(self, result: Any) -> np.ndarray:
+        """Weighted, unit-length feature vector for one ApifyResult (model or dict)"""
+        if not isinstance(result, dict):
+            result = result.model_dump()
+
+        traffic = result.get("trafficSources") or {}
+        channels = np.array([float(traffic.get(c) or 0.0) for c in TRAFFIC_CHANNELS])
+
+        engagement = np.array([
+            float(result.get("bounceRate") or 0.0),
+            np.log1p(max(float(result.get("pagesPerVisit") or 0.0), 0.0)),
+            np.log1p(max(np.nan_to_num(parse_duration(result.get("avgVisitDuration"))), 0.0)),
+        ]) / np.array(list(ENGAGEMENT_SCALES.values()))
+
+        country_shares: List[Tuple[int, float]] = []
+        for country in result.get("topCountries") or []:
+            code = (country.get("countryAlpha2Code") or "").upper()
+            if code:
+                country_shares.append((self._country_column(code), float(country.get("visitsShare") or 0.0)))
+
+        vector = np.zeros(self.dimensions)
+        offset = len(TRAFFIC_CHANNELS)
+        channel_weight, country_weight, engagement_weight = self.weights
+        vector[:offset] = self._unit(channels) * channel_weight
+        vector[offset:offset + len(ENGAGEMENT_SCALES)] = self._unit(engagement) * engagement_weight
+        if country_shares:
+            columns, shares = zip(*country_shares)
+            vector[list(columns)] = self._unit(np.array(shares)) * country_weight
+        return self._unit(vector).astype(np.float32)
+
+    @staticmethod
+    def _unit(vector: np.ndarray) -> np.ndarray:
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm > 0 else vector
+
+    def update(self, result: Any, updated_at: Optional[str] = None) -> bool:
+        """Insert or replace one domain's row unless a newer one is already stored"""
+        if self._replay is not None:
+            self._replay.append((result, updated_at))
+        data = result if isinstance(result, dict) else result.model_dump()
+        domain = normalize_domain(data.get("name", ""))
+        if not domain:
+            return False
+        updated_at = parse_timestamp(updated_at)
+        if self._updated.get(domain, datetime.min) > updated_at:
+            return False
+
+        vector = self.features(data)
+        row = self._rows.get(domain)
+        if row is None:
+            row = self._free.pop() if self._free else self._append_row()
+            self._rows[domain] = row
+            self._domains[row] = domain
+        self._matrix[row] = vector
+        self._updated[domain] = updated_at
+        return True
+
+    def _append_row(self) -> int:
+        row = len(self._domains)
+        if row >= len(self._matrix):
+            # Grow geometrically so incremental inserts stay amortized O(1)
+            capacity = max(64, 2 * len(self._matrix))
+            self._matrix = np.pad(self._matrix, ((0, capacity - len(self._matrix)), (0, 0)))
+        self._domains.append(None)
+        return row
+
+    def update_many(self, results: Iterable[Any], updated_at: Optional[str] = None) -> int:
+        return sum(1 for result in results or [] if self.update(result, updated_at))
+
+    def remove(self, domain: str):
+        domain = normalize_domain(domain)
+        row = self._rows.pop(domain, None)
+        if row is None:
+            return
+        self._matrix[row] = 0.0
+        self._domains[row] = None
+        self._updated.pop(domain, None)
+        self._free.append(row)
+
+    def rebuild(self, sessions: Iterable[Dict[str, Any]]) -> int:
+        """Batch rebuild from stored sessions (newest data per domain wins)"""
+        self._reset()
+        for session in sessions:
+            self.update_many(observed_results(session.get("similarweb_data")), updated_at=session.get("created_at"))
+        self.loaded = True
+        return len(self)
+
+    async def reload(self, db) -> int:
+        """
+        Rebuild from the database into a fresh matrix, then swap it in. Writes that
+        arrive while the sessions are being read are recorded and replayed after the swap.
+        """
+        fresh = TrafficProfileIndex(*self.weights)
+        sessions = 0
+        self._replay = []
+        try:
+            async for session in db.iter_sessions():
+                sessions += 1
+                fresh.update_many(observed_results(session.get("similarweb_data")), updated_at=session.get("created_at"))
+        finally:
+            replay, self._replay = self._replay, None
+        for name in ("_countries", "_rows", "_domains", "_updated", "_free", "_matrix"):
+            setattr(self, name, getattr(fresh, name))
+        for result, updated_at in replay:
+            self.update(result, updated_at)
+        self.loaded = True
+        logger.info(f"[TRAFFIC INDEX] Indexed {len(self)} domains from {sessions} sessions")
+        return len(self)
+
+    def similar(self, domain: str, k: int = 10) -> List[Dict[str, Any]]:
+        """k nearest domains by cosine similarity of traffic profiles"""
+        row = self._rows.get(normalize_domain(domain))
+        if row is None:
+            raise KeyError(domain)
+
+        used = len(self._domains)
+        scores = self._matrix[:used] @ self._matrix[row]
+        scores[row] = -np.inf
+        for free in self._free:
+            scores[free] = -np.inf
+
+        k = min(k, len(self._rows) - 1)
+        if k <= 0:
+            return []
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [{"domain": self._domains[i], "similarity": round(float(scores[i]), 4)} for i in top]
+
+    def stats(self) -> Dict[str, int]:
+        return {"domains": len(self._rows), "dimensions": self.dimensions, "countries": len(self._countries)}
+
+    async def ensure_loaded(self, db):
+        """Build the matrix from stored sessions once per process"""
+        if self.loaded:
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+        async with self._load_lock:
+            if not self.loaded:
+                await self.reload(db)
+
+
+# Global traffic-profile index, kept current on every SimilarWeb write
+traffic_index = TrafficProfileIndex()